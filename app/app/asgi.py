@@ -9,8 +9,18 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
 application = get_asgi_application()
+
+from core import events  # noqa: E402
+
+application = events.route(application)
+
+if settings.STARTUP_WARM_UP:
+    from core.startup import warm_up
+
+    warm_up()
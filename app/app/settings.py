@@ -48,6 +48,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.MetricsMiddleware",
+    "core.middleware.RequestTimingMiddleware",
+    "core.middleware.SlowQueryMiddleware",
+    "core.middleware.CompressionMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -55,10 +59,16 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "core.middleware.ProfilingMiddleware",
 ]
 
 ROOT_URLCONF = "app.urls"
 
+# Every token authenticated API route lives under this prefix. The
+# API-only profile in app/settings_api.py skips browser oriented
+# middleware for requests that start with it.
+API_URL_PREFIX = "/api/"
+
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
@@ -89,6 +99,7 @@ DATABASES = {
         "USER": os.environ.get("DB_USER"),
         "PASSWORD": os.environ.get("DB_PASS"),
         "PORT": os.environ.get("DB_PORT"),
+        "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", 0)),
     }
 }
 
@@ -140,3 +151,250 @@ MEDIA_ROOT = "/vol/web/media"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 AUTH_USER_MODEL = "core.user"
+
+PASSWORD_HASHERS = [
+    "core.hashers.ConfigurablePBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+]
+
+
+# Django REST framework
+# JSON is rendered and parsed with orjson when it is installed, with the
+# same output as the stdlib based DRF classes. Anonymous clients are
+# throttled by address: set NUM_PROXIES to the number of reverse proxies
+# in front of the app to use the address they add to X-Forwarded-For.
+# With the default of 0 the header is ignored, since clients can set it.
+
+REST_FRAMEWORK = {
+    "DEFAULT_RENDERER_CLASSES": (
+        "core.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "core.parsers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
+    "DEFAULT_THROTTLE_CLASSES": (
+        "core.throttling.UserThrottle",
+        "core.throttling.AnonThrottle",
+        "core.throttling.ScopedThrottle",
+    ),
+    "DEFAULT_PAGINATION_CLASS": "core.pagination.EstimatedPageNumberPagination",
+    "PAGE_SIZE": 100,
+    "NUM_PROXIES": int(os.environ.get("NUM_PROXIES", 0)),
+}
+
+
+# Cache
+# Throttle counters must be shared by every worker process, so set
+# CACHE_LOCATION to a memcached server (host:port) when running several.
+# Without it each process uses its own in-memory cache.
+
+CACHE_LOCATION = os.environ.get("CACHE_LOCATION") or None
+
+if CACHE_LOCATION:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.memcached.PyMemcacheCache",
+            "LOCATION": CACHE_LOCATION,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+
+# Recipe cache
+# Serialized recipes are cached for RECIPE_CACHE_TIMEOUT seconds in the
+# RECIPE_CACHE cache, empty to disable, and served by the detail endpoint
+# and paginated lists until the recipe or its tags and ingredients
+# change. It is off unless CACHE_LOCATION is set: with per-process caches
+# the other worker processes would never see a change and serve stale
+# recipes.
+
+RECIPE_CACHE = os.environ.get(
+    "RECIPE_CACHE", "default" if CACHE_LOCATION else ""
+)
+RECIPE_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+# Rate limits
+# Requests per period (s, min, hour or day) for each throttle scope of
+# core.throttling. "user" and "anon" limit every authenticated user and
+# anonymous client address, with login, sign up and image uploads
+# counting as several requests. The other scopes limit single endpoints.
+# Set THROTTLE_RATE_<SCOPE> to change a rate, or to an empty string to stop
+# limiting the scope, e.g. THROTTLE_RATE_LOGIN= for a load test where every
+# virtual user shares one address.
+
+THROTTLE_CACHE = "default"
+THROTTLE_RATES = {
+    "user": os.environ.get("THROTTLE_RATE_USER", "1200/min"),
+    "anon": os.environ.get("THROTTLE_RATE_ANON", "300/min"),
+    "login": os.environ.get("THROTTLE_RATE_LOGIN", "30/min"),
+    "signup": os.environ.get("THROTTLE_RATE_SIGNUP", "20/hour"),
+    "recipe_list": os.environ.get("THROTTLE_RATE_RECIPE_LIST", "300/min"),
+    "image_upload": os.environ.get("THROTTLE_RATE_IMAGE_UPLOAD", "120/hour"),
+}
+
+
+# Response compression
+# Text and JSON responses of at least COMPRESSION_MIN_SIZE bytes are
+# compressed with the first of COMPRESSION_ENCODINGS the client accepts.
+# br needs the brotli package and is skipped without it.
+
+COMPRESSION_ENCODINGS = ("br", "gzip")
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", 1024))
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 4
+COMPRESSION_CONTENT_TYPES = ("application/json", "text/")
+
+
+# Idempotency keys
+# Responses to POSTs with an Idempotency-Key header are kept in the cache
+# for IDEMPOTENCY_KEY_TTL seconds and replayed for retries. A retry waits
+# for at most IDEMPOTENCY_LOCK_TIMEOUT seconds of a first request that
+# never finished before it runs again.
+
+IDEMPOTENCY_CACHE = "default"
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+IDEMPOTENCY_LOCK_TIMEOUT = 60
+
+
+# Password hashing
+# API token logins check passwords on PASSWORD_HASH_WORKERS threads per
+# process with at most PASSWORD_HASH_QUEUE more waiting; further logins get
+# a 503. Hashes with another PBKDF2 iteration count are upgraded on the next
+# login.
+
+PASSWORD_HASH_ITERATIONS = int(
+    os.environ.get("PASSWORD_HASH_ITERATIONS", 260000)
+)
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", 2))
+PASSWORD_HASH_QUEUE = int(os.environ.get("PASSWORD_HASH_QUEUE", 16))
+
+
+# Estimated counts
+# Admin changelists and API lists requested with ?page= report the
+# planner's row estimate instead of counting every row once it reaches
+# ESTIMATED_COUNT_THRESHOLD.
+
+ESTIMATED_COUNT_THRESHOLD = int(
+    os.environ.get("ESTIMATED_COUNT_THRESHOLD", 100000)
+)
+
+
+# Request instrumentation
+# Fraction of requests (0 to 1) that get query counts, DB, serializer and
+# view timings reported in a Server-Timing header and a log line.
+
+REQUEST_TIMING_SAMPLE_RATE = float(
+    os.environ.get("REQUEST_TIMING_SAMPLE_RATE", 0)
+)
+
+# Sampled requests that run more queries than the budget of their view
+# (keyed like "RecipeViewSet.list") are logged as warnings.
+REQUEST_QUERY_BUDGETS = {
+    "RecipeViewSet.list": 5,
+    "RecipeViewSet.retrieve": 5,
+    "TagViewSet.list": 2,
+    "IngredientViewSet.list": 2,
+}
+REQUEST_QUERY_BUDGET_DEFAULT = 20
+
+# Queries slower than SLOW_QUERY_THRESHOLD_MS (empty or 0 disables) are
+# stored as SlowQuery rows and shown in the admin. A sample of the SELECTs
+# among them also get an EXPLAIN (ANALYZE, BUFFERS) plan, captured on a
+# background thread unless SLOW_QUERY_ASYNC is off.
+
+SLOW_QUERY_THRESHOLD_MS = (
+    int(os.environ.get("SLOW_QUERY_THRESHOLD_MS", 250) or 0) or None
+)
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = 0.1
+SLOW_QUERY_ASYNC = True
+
+
+# Metrics
+# With several pre-forked workers, point METRICS_MULTIPROC_DIR at a
+# directory shared by them (and emptied on start) so /metrics aggregates
+# every process. When METRICS_TOKEN is set, scrapers must send it as a
+# bearer token.
+
+METRICS_MULTIPROC_DIR = os.environ.get("METRICS_MULTIPROC_DIR") or None
+METRICS_FLUSH_INTERVAL = 1.0
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN") or None
+
+
+# Profiling
+# When enabled, ProfilingRule rows (admin or the profile_endpoint command)
+# select view actions whose requests are sampled and profiled with
+# cProfile. Stats files are written to PROFILING_DIR/<view>/ and can be
+# opened with pstats, snakeviz or flameprof.
+
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "0") == "1"
+PROFILING_DIR = os.environ.get("PROFILING_DIR", "/vol/web/profiles")
+PROFILING_RULES_REFRESH = 10
+
+
+# Task queue
+# Tasks are queued in the database and run by `manage.py run_worker`. A
+# claimed task is retried when its worker has not finished it within
+# TASK_VISIBILITY_TIMEOUT seconds, so it must exceed the slowest task.
+# Failed attempts are retried after TASK_RETRY_BACKOFF seconds, doubled
+# per attempt up to TASK_RETRY_BACKOFF_MAX.
+
+TASK_WORKER_CONCURRENCY = int(os.environ.get("TASK_WORKER_CONCURRENCY", 2))
+TASK_VISIBILITY_TIMEOUT = int(os.environ.get("TASK_VISIBILITY_TIMEOUT", 600))
+TASK_POLL_INTERVAL = 1.0
+TASK_MAX_ATTEMPTS = 5
+TASK_RETRY_BACKOFF = 10
+TASK_RETRY_BACKOFF_MAX = 3600
+
+
+# Change events
+# The ASGI application streams the changes of the user's recipes, tags and
+# ingredients as Server-Sent Events at EVENTS_PATH. Each process buffers
+# the last EVENTS_BUFFER_SIZE events to resume reconnecting streams, and
+# restarts a stream that falls EVENTS_QUEUE_SIZE events behind.
+
+EVENTS_PATH = "/api/events/"
+EVENTS_CHANNEL = "core_change_events"
+EVENTS_BUFFER_SIZE = 10000
+EVENTS_QUEUE_SIZE = 1000
+EVENTS_HEARTBEAT = 15
+EVENTS_RETRY_MS = 3000
+
+
+# Startup
+# The WSGI and ASGI entry points import every view and serializer before
+# serving when STARTUP_WARM_UP is on, so the first request is not slower
+# than the rest. Database connections are still opened by the first
+# request of each thread, and only kept when DB_CONN_MAX_AGE is set.
+# Use the startup command instead of wait_for_db and migrate to skip
+# migrate when nothing is pending.
+
+STARTUP_WARM_UP = os.environ.get("STARTUP_WARM_UP", "1") == "1"
+
+
+# Logging
+# https://docs.djangoproject.com/en/3.2/topics/logging/
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "core": {
+            "handlers": ["console"],
+            "level": os.environ.get("CORE_LOG_LEVEL", "INFO"),
+        },
+    },
+}
@@ -0,0 +1,44 @@
+"""
+API-only settings profile.
+
+Select it with DJANGO_SETTINGS_MODULE=app.settings_api for workers that
+mostly serve the token authenticated API. Session, CSRF, messages and
+clickjacking middleware are skipped for routes under API_URL_PREFIX while
+the admin keeps them, and DRF only renders JSON so API requests never
+touch the template engine.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import MIDDLEWARE, REST_FRAMEWORK
+
+API_EXEMPT_MIDDLEWARE = {
+    "django.contrib.sessions.middleware.SessionMiddleware": (
+        "core.middleware.ApiExemptSessionMiddleware"
+    ),
+    "django.middleware.csrf.CsrfViewMiddleware": (
+        "core.middleware.ApiExemptCsrfViewMiddleware"
+    ),
+    "django.contrib.auth.middleware.AuthenticationMiddleware": (
+        "core.middleware.ApiExemptAuthenticationMiddleware"
+    ),
+    "django.contrib.messages.middleware.MessageMiddleware": (
+        "core.middleware.ApiExemptMessageMiddleware"
+    ),
+    "django.middleware.clickjacking.XFrameOptionsMiddleware": (
+        "core.middleware.ApiExemptXFrameOptionsMiddleware"
+    ),
+}
+
+MIDDLEWARE = [API_EXEMPT_MIDDLEWARE.get(name, name) for name in MIDDLEWARE]
+
+# The admin checks look for the session, auth and messages middleware by
+# class. The ApiExempt wrappers still run them for the admin, so the
+# checks would fail for middleware that is in place.
+SILENCED_SYSTEM_CHECKS = ["admin.E408", "admin.E409", "admin.E410"]
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    "DEFAULT_AUTHENTICATION_CLASSES": (
+        "rest_framework.authentication.TokenAuthentication",
+    ),
+    "DEFAULT_RENDERER_CLASSES": ("core.renderers.FastJSONRenderer",),
+}
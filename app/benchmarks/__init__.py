@@ -0,0 +1,7 @@
+"""Benchmark suites
+
+Most modules in this package expose ``run(iterations)``, return a JSON
+serialisable dict of results and are run with
+``python manage.py benchmark <suite>``. The HTTP load test in http_load
+needs a running server and is driven by ``python manage.py loadtest``.
+"""
@@ -0,0 +1,82 @@
+"""Memory of idle event streams and the cost of fanning an event out
+
+Opens streams of one user's devices on an in-process Broadcaster, without
+the database listener, and reports the memory each idle stream holds and
+the time from publishing an event to every stream having sent it.
+"""
+import asyncio
+import time
+import tracemalloc
+
+from benchmarks.utils import summarize
+from core.events import Broadcaster, EventStream
+
+
+class _Offline:
+    async def start(self):
+        pass
+
+
+async def _fan_out(streams, iterations):
+    stream = EventStream(Broadcaster(), _Offline())
+    stream.broadcaster.reset()
+    disconnect = asyncio.Event()
+    sent = [0]
+    delivered = asyncio.Event()
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            sent[0] += 1
+            if sent[0] == streams:
+                delivered.set()
+
+    async def receive():
+        await disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    tasks = [
+        asyncio.ensure_future(
+            stream._stream(
+                stream.broadcaster.subscribe(1), None, receive, send
+            )
+        )
+        for _ in range(streams)
+    ]
+    await delivered.wait()
+    # Let every stream reach its wait for the next event
+    await asyncio.sleep(0)
+    memory = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    samples = []
+    for _ in range(iterations):
+        sent[0] = 0
+        delivered.clear()
+        start = time.perf_counter()
+        stream.broadcaster.publish(
+            {
+                "user": 1,
+                "model": "recipe",
+                "pk": 1,
+                "action": "updated",
+            }
+        )
+        await delivered.wait()
+        samples.append(time.perf_counter() - start)
+
+    disconnect.set()
+    await asyncio.gather(*tasks)
+    return memory, samples
+
+
+def run(iterations=20, streams=5000):
+    """Open streams idle connections and publish iterations events"""
+    memory, samples = asyncio.run(_fan_out(streams, iterations))
+    return {
+        "streams": streams,
+        "idle_bytes_per_stream": round(memory / streams),
+        "fan_out": summarize(samples),
+        "per_stream_us": round(sum(samples) / len(samples) / streams * 1e6, 2),
+    }
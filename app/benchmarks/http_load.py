@@ -0,0 +1,336 @@
+"""HTTP load test of the recipe and user APIs, driven by manage.py loadtest
+
+Every virtual user logs in as one of the seeded users, then runs a
+weighted mix of scenarios against a running server until the duration is
+over. Results hold throughput, error counts, throttled counts and
+p50/p95/p99 latency per scenario. Requests answered with a 429 are counted
+as throttled rather than as errors, since they measure the server's rate
+limits instead of the API.
+"""
+import http.client
+import io
+import json
+import random
+import threading
+import time
+import uuid
+from urllib.parse import urlencode, urlsplit
+
+from PIL import Image
+
+from benchmarks.utils import percentile
+
+
+TOKEN_URL = "/api/user/token/"
+TAGS_URL = "/api/recipe/tags/"
+INGREDIENTS_URL = "/api/recipe/ingredients/"
+RECIPES_URL = "/api/recipe/recipes/"
+
+DEFAULT_MIX = {
+    "login": 5,
+    "recipe_list": 10,
+    "recipe_list_filtered": 30,
+    "recipe_detail": 35,
+    "recipe_create": 15,
+    "image_upload": 5,
+}
+
+
+def _jpeg():
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), (200, 120, 40)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+class ApiClient:
+    """Keep-alive HTTP client for one virtual user"""
+
+    def __init__(self, base_url, timeout=30):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port
+        self.https = parts.scheme == "https"
+        self.timeout = timeout
+        self.token = None
+        self.connection = None
+        self.throttled = 0
+
+    def _connect(self):
+        cls = (
+            http.client.HTTPSConnection
+            if self.https
+            else http.client.HTTPConnection
+        )
+        self.connection = cls(self.host, self.port, timeout=self.timeout)
+
+    def request(self, method, path, body=None, content_type=None):
+        """Send a request and return the status code and decoded body"""
+        headers = {"Accept": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Token {self.token}"
+        if content_type:
+            headers["Content-Type"] = content_type
+        for attempt in range(2):
+            if self.connection is None:
+                self._connect()
+            try:
+                self.connection.request(method, path, body, headers)
+                response = self.connection.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, OSError):
+                self.connection.close()
+                self.connection = None
+                if attempt:
+                    raise
+        if response.status == 429:
+            self.throttled += 1
+        if response.getheader("Content-Type", "").startswith(
+            "application/json"
+        ):
+            data = json.loads(data or b"null")
+        return response.status, data
+
+    def post_json(self, path, payload):
+        return self.request(
+            "POST", path, json.dumps(payload), "application/json"
+        )
+
+    def post_file(self, path, field, filename, content):
+        boundary = uuid.uuid4().hex
+        body = (
+            (
+                f"--{boundary}\r\n"
+                f'Content-Disposition: form-data; name="{field}"; '
+                f'filename="{filename}"\r\n'
+                "Content-Type: image/jpeg\r\n\r\n"
+            ).encode()
+            + content
+            + f"\r\n--{boundary}--\r\n".encode()
+        )
+        return self.request(
+            "POST", path, body, f"multipart/form-data; boundary={boundary}"
+        )
+
+
+class VirtualUser(threading.Thread):
+    """Run weighted scenarios as one seeded user until the deadline"""
+
+    def __init__(self, load_test, email, password, seed):
+        super().__init__(daemon=True)
+        self.load_test = load_test
+        self.email = email
+        self.password = password
+        self.rng = random.Random(seed)
+        self.client = ApiClient(load_test.base_url)
+        self.tag_ids = []
+        self.ingredient_ids = []
+        self.recipe_ids = []
+        self.created_ids = []
+
+    def run(self):
+        try:
+            self.login()
+            self.load_ids()
+        except Exception as exc:
+            self.load_test.record(
+                "setup", 0, False, repr(exc), self.client.throttled > 0
+            )
+            return
+        scenarios = list(self.load_test.mix)
+        weights = list(self.load_test.mix.values())
+        while time.monotonic() < self.load_test.deadline:
+            name = self.rng.choices(scenarios, weights)[0]
+            throttled = self.client.throttled
+            start = time.perf_counter()
+            try:
+                ok = getattr(self, name)()
+                error = None
+            except Exception as exc:
+                ok, error = False, repr(exc)
+            self.load_test.record(
+                name,
+                time.perf_counter() - start,
+                ok,
+                error,
+                self.client.throttled > throttled,
+            )
+
+    def load_ids(self):
+        """Fetch ids used to build filters and detail requests"""
+        _, tags = self.client.request("GET", TAGS_URL)
+        _, ingredients = self.client.request("GET", INGREDIENTS_URL)
+        _, recipes = self.client.request("GET", RECIPES_URL)
+        self.tag_ids = [tag["id"] for tag in tags]
+        self.ingredient_ids = [item["id"] for item in ingredients]
+        self.recipe_ids = [recipe["id"] for recipe in recipes]
+
+    def _sample(self, ids, most):
+        return self.rng.sample(ids, min(len(ids), self.rng.randint(1, most)))
+
+    def login(self):
+        status, data = self.client.post_json(
+            TOKEN_URL, {"email": self.email, "password": self.password}
+        )
+        if status == 200:
+            self.client.token = data["token"]
+        return status == 200
+
+    def recipe_list(self):
+        status, _ = self.client.request("GET", RECIPES_URL)
+        return status == 200
+
+    def recipe_list_filtered(self):
+        params = {}
+        if self.tag_ids and self.rng.random() < 0.7:
+            params["tags"] = ",".join(
+                str(pk) for pk in self._sample(self.tag_ids, 3)
+            )
+        if self.ingredient_ids and (not params or self.rng.random() < 0.5):
+            params["ingredients"] = ",".join(
+                str(pk) for pk in self._sample(self.ingredient_ids, 3)
+            )
+        status, _ = self.client.request(
+            "GET", f"{RECIPES_URL}?{urlencode(params)}"
+        )
+        return status == 200
+
+    def recipe_detail(self):
+        ids = self.recipe_ids or self.created_ids
+        if not ids:
+            return self.recipe_list()
+        pk = self.rng.choice(ids)
+        status, _ = self.client.request("GET", f"{RECIPES_URL}{pk}/")
+        return status == 200
+
+    def recipe_create(self):
+        payload = {
+            "title": f"Load test recipe {self.rng.getrandbits(32)}",
+            "time_minutes": self.rng.randint(5, 120),
+            "price": f"{self.rng.uniform(1, 50):.2f}",
+            "tags": self._sample(self.tag_ids, 3) if self.tag_ids else [],
+            "ingredients": (
+                self._sample(self.ingredient_ids, 8)
+                if self.ingredient_ids
+                else []
+            ),
+        }
+        status, data = self.client.post_json(RECIPES_URL, payload)
+        if status == 201:
+            self.created_ids.append(data["id"])
+        return status == 201
+
+    def image_upload(self):
+        if not self.created_ids and not self.recipe_create():
+            return False
+        pk = self.rng.choice(self.created_ids)
+        status, _ = self.client.post_file(
+            f"{RECIPES_URL}{pk}/upload-image/",
+            "image",
+            "load.jpg",
+            self.load_test.image,
+        )
+        return status == 200
+
+
+class LoadTest:
+    """Drive concurrent virtual users and aggregate their timings"""
+
+    def __init__(
+        self, base_url, credentials, concurrency, duration, mix=None, seed=0
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.credentials = credentials
+        self.concurrency = concurrency
+        self.duration = duration
+        self.mix = {name: w for name, w in (mix or DEFAULT_MIX).items() if w}
+        self.seed = seed
+        self.image = _jpeg()
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._errors = {}
+        self._throttled = {}
+
+    def record(self, name, duration, ok, error=None, throttled=False):
+        with self._lock:
+            if ok:
+                self._samples.setdefault(name, []).append(duration)
+            elif throttled:
+                self._throttled[name] = self._throttled.get(name, 0) + 1
+            else:
+                errors = self._errors.setdefault(name, {})
+                key = error or "unexpected status"
+                errors[key] = errors.get(key, 0) + 1
+
+    def run(self):
+        """Run the load test and return the results"""
+        self.deadline = time.monotonic() + self.duration
+        start = time.monotonic()
+        users = [
+            VirtualUser(
+                self,
+                *self.credentials[index % len(self.credentials)],
+                seed=self.seed + index,
+            )
+            for index in range(self.concurrency)
+        ]
+        for user in users:
+            user.start()
+        for user in users:
+            user.join()
+        elapsed = time.monotonic() - start
+        return self.results(elapsed)
+
+    def results(self, elapsed):
+        endpoints = {}
+        names = set(self._samples) | set(self._errors) | set(self._throttled)
+        for name in sorted(names):
+            samples = sorted(self._samples.get(name, []))
+            errors = self._errors.get(name, {})
+            endpoints[name] = {
+                "requests": len(samples),
+                "errors": sum(errors.values()),
+                "error_types": errors,
+                "throttled": self._throttled.get(name, 0),
+                "throughput_rps": round(len(samples) / elapsed, 2),
+                "p50_ms": round(percentile(samples, 50) * 1000, 2),
+                "p95_ms": round(percentile(samples, 95) * 1000, 2),
+                "p99_ms": round(percentile(samples, 99) * 1000, 2),
+            }
+        total = sum(len(samples) for samples in self._samples.values())
+        return {
+            "base_url": self.base_url,
+            "concurrency": self.concurrency,
+            "duration_s": round(elapsed, 2),
+            "mix": self.mix,
+            "throughput_rps": round(total / elapsed, 2),
+            "throttled": sum(self._throttled.values()),
+            "endpoints": endpoints,
+        }
+
+
+def compare(baseline, current, tolerance):
+    """Return the regressions of current against baseline results
+
+    A scenario regresses when its p95 latency grows, or its throughput
+    drops, by more than tolerance percent.
+    """
+    regressions = []
+    for name, before in baseline["endpoints"].items():
+        after = current["endpoints"].get(name)
+        if not after or not before["requests"]:
+            continue
+        if before["p95_ms"] and (
+            after["p95_ms"] > before["p95_ms"] * (1 + tolerance / 100)
+        ):
+            regressions.append(
+                f"{name}: p95 {before['p95_ms']}ms -> {after['p95_ms']}ms"
+            )
+        if after["throughput_rps"] < before["throughput_rps"] * (
+            1 - tolerance / 100
+        ):
+            regressions.append(
+                f"{name}: throughput {before['throughput_rps']}/s -> "
+                f"{after['throughput_rps']}/s"
+            )
+    return regressions
@@ -0,0 +1,106 @@
+"""JSON codec and compression cost of a 5000 recipe list response
+
+Renders the list the way RecipeViewSet does with the stdlib and orjson
+backed renderers, parses it back with both parsers, and compresses it
+with each available codec. Timings are CPU time, fixtures are rolled
+back at the end.
+"""
+import io
+import time
+
+from django.db import transaction
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from benchmarks.serializers import Rollback, create_recipes
+from benchmarks.utils import measure
+from core import compression
+from core.models import Recipe
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer, orjson
+from recipe.serializers import RecipeReadSerializer
+
+
+RECIPES = 5000
+
+
+def _measure_codec(data, iterations):
+    results = {}
+    bodies = {}
+    for name, renderer in (
+        ("stdlib", JSONRenderer()),
+        ("orjson" if orjson else "fallback", FastJSONRenderer()),
+    ):
+        bodies[name] = renderer.render(data)
+        results[name] = {
+            "render": measure(
+                lambda: renderer.render(data),
+                iterations,
+                warmup=2,
+                timer=time.process_time,
+            ),
+            "bytes": len(bodies[name]),
+        }
+    body = bodies["stdlib"]
+    results["identical_json"] = len(set(bodies.values())) == 1
+    for name, parser in (
+        ("stdlib", JSONParser()),
+        ("orjson" if orjson else "fallback", FastJSONParser()),
+    ):
+        results[name]["parse"] = measure(
+            lambda: parser.parse(io.BytesIO(body)),
+            iterations,
+            warmup=2,
+            timer=time.process_time,
+        )
+    return results, body
+
+
+def _measure_compression(body, iterations):
+    results = {"identity": {"bytes": len(body)}}
+    for codec in compression.available_codecs():
+        compressed = codec.compress(body)
+        results[codec.name] = {
+            "bytes": len(compressed),
+            "ratio": round(len(compressed) / len(body), 4),
+            "compress": measure(
+                lambda: codec.compress(body),
+                iterations,
+                warmup=2,
+                timer=time.process_time,
+            ),
+        }
+    return results
+
+
+def run(iterations=20, recipes=RECIPES):
+    """Measure rendering, parsing and compressing a recipe list"""
+    try:
+        with transaction.atomic():
+            user = create_recipes(recipes)
+            queryset = Recipe.objects.filter(user=user).order_by("-id")
+            data = RecipeReadSerializer(queryset, many=True).data
+            codec, body = _measure_codec(data, iterations)
+            compressed = _measure_compression(body, iterations)
+            fast = codec.get("orjson", codec.get("fallback"))
+            results = {
+                "recipes": recipes,
+                "codec": codec,
+                "compression": compressed,
+                "saved": {
+                    "render_cpu_us": round(
+                        codec["stdlib"]["render"]["mean_us"]
+                        - fast["render"]["mean_us"],
+                        2,
+                    ),
+                    "bytes": {
+                        name: len(body) - result["bytes"]
+                        for name, result in compressed.items()
+                        if name != "identity"
+                    },
+                },
+            }
+            raise Rollback
+    except Rollback:
+        pass
+    return results
@@ -0,0 +1,44 @@
+"""Per-request overhead of the default and API-only middleware stacks"""
+from django.conf import settings
+from django.core.handlers.base import BaseHandler
+from django.test import RequestFactory, override_settings
+
+from app import settings_api
+from benchmarks.utils import measure
+
+
+def _measure_stack(middleware, path, iterations):
+    """Time a request to path through the given middleware stack"""
+    factory = RequestFactory()
+    with override_settings(
+        MIDDLEWARE=middleware,
+        ROOT_URLCONF="benchmarks.urls",
+        ALLOWED_HOSTS=["testserver"],
+    ):
+        handler = BaseHandler()
+        handler.load_middleware()
+        response = handler.get_response(factory.get(path))
+        assert response.status_code == 200, response.status_code
+        return measure(
+            lambda: handler.get_response(factory.get(path)), iterations
+        )
+
+
+def run(iterations=5000):
+    """Compare the default middleware stack with the API-only profile"""
+    results = {}
+    stacks = {
+        "default": settings.MIDDLEWARE,
+        "api_only": settings_api.MIDDLEWARE,
+    }
+    for name, middleware in stacks.items():
+        results[name] = {
+            "api": _measure_stack(middleware, "/api/ping/", iterations),
+            "admin": _measure_stack(middleware, "/admin/ping/", iterations),
+        }
+    results["saved_per_api_request_us"] = round(
+        results["default"]["api"]["mean_us"]
+        - results["api_only"]["api"]["mean_us"],
+        2,
+    )
+    return results
@@ -0,0 +1,142 @@
+"""Serializer throughput at several collection sizes
+
+Compares the model serializers, with and without prefetching, to the
+read-only serializers used by the list and detail views. Fixtures are
+created inside a transaction that is rolled back at the end.
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from rest_framework.renderers import JSONRenderer
+
+from benchmarks.utils import summarize
+from core import denormalization
+from core.middleware import QueryCounter
+from core.models import Ingredient, Recipe, Tag
+from recipe import serializers
+
+
+SIZES = (10, 100, 1000, 5000)
+
+
+class Rollback(Exception):
+    """Raised to roll back the fixtures once measured"""
+
+
+def _positions(start, count, total):
+    return sorted(offset % total for offset in range(start, start + count))
+
+
+def create_recipes(count):
+    """Create a user with count recipes linked to tags and ingredients"""
+    user = get_user_model().objects.create_user(
+        f"serializer-bench-{count}@example.com", "benchpass"
+    )
+    tags = Tag.objects.bulk_create(
+        Tag(user=user, name=f"Tag {index}") for index in range(20)
+    )
+    ingredients = Ingredient.objects.bulk_create(
+        Ingredient(user=user, name=f"Ingredient {index}")
+        for index in range(50)
+    )
+    recipes = Recipe.objects.bulk_create(
+        Recipe(
+            user=user,
+            title=f"Recipe {index}",
+            time_minutes=5 + index % 120,
+            price=f"{1 + index % 50}.{index % 100:02d}",
+        )
+        for index in range(count)
+    )
+    # Links are inserted in id order, which is the order the unordered
+    # relations of the model serializers come back in on a fresh table.
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe_id=recipe.id, tag_id=tags[position].id)
+        for index, recipe in enumerate(recipes)
+        for position in _positions(index, 3, len(tags))
+    )
+    Recipe.ingredients.through.objects.bulk_create(
+        Recipe.ingredients.through(
+            recipe_id=recipe.id, ingredient_id=ingredients[position].id
+        )
+        for index, recipe in enumerate(recipes)
+        for position in _positions(index, 6, len(ingredients))
+    )
+    denormalization.refresh(recipe.id for recipe in recipes)
+    return user
+
+
+def _measure(serializer_class, queryset, iterations):
+    """Serialize and render queryset, returning timings and the body"""
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        queries = QueryCounter()
+        with connection.execute_wrapper(queries):
+            body = JSONRenderer().render(
+                serializer_class(queryset.all(), many=True).data
+            )
+        samples.append(time.perf_counter() - start)
+    result = summarize(samples)
+    result["queries"] = queries.count
+    result["items_per_s"] = round(
+        queryset.count() / (result["mean_us"] / 1e6), 1
+    )
+    return result, body
+
+
+def _compare(candidates, iterations):
+    """Measure each candidate and check its JSON against the first one
+
+    The model serializers do not order the related ids, so with prefetching
+    they may come back in a different order than the per-recipe queries.
+    """
+    results, reference = {}, None
+    for name, serializer_class, queryset in candidates:
+        results[name], body = _measure(serializer_class, queryset, iterations)
+        reference = reference or body
+        results[name]["identical_json"] = body == reference
+    return results
+
+
+def run(iterations=5, sizes=SIZES):
+    """Time recipe and tag list serialization for each of sizes"""
+    results = {}
+    try:
+        with transaction.atomic():
+            for size in sizes:
+                user = create_recipes(size)
+                recipes = Recipe.objects.filter(user=user).order_by("-id")
+                tags = Tag.objects.filter(user=user).order_by("-name")
+                results[size] = {
+                    "recipes": _compare(
+                        (
+                            ("model", serializers.RecipeSerializer, recipes),
+                            (
+                                "model_prefetched",
+                                serializers.RecipeSerializer,
+                                recipes.prefetch_related(
+                                    "tags", "ingredients"
+                                ),
+                            ),
+                            (
+                                "read",
+                                serializers.RecipeReadSerializer,
+                                recipes,
+                            ),
+                        ),
+                        iterations,
+                    ),
+                    "tags": _compare(
+                        (
+                            ("model", serializers.TagSerializer, tags),
+                            ("read", serializers.TagReadSerializer, tags),
+                        ),
+                        iterations,
+                    ),
+                }
+            raise Rollback
+    except Rollback:
+        pass
+    return results
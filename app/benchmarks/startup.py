@@ -0,0 +1,98 @@
+"""Service start and first request latency, cold and warmed up
+
+Times wait_for_db followed by migrate against the startup command on an
+up to date database, then the import of the WSGI application and its
+first two requests with STARTUP_WARM_UP off and on. Every sample runs in
+a fresh interpreter, pointed at the database of the current connection.
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from benchmarks.utils import summarize
+
+
+FIRST_REQUEST = """
+import json, os, sys, time
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+import django
+django.setup()
+from django.test import RequestFactory
+start = time.perf_counter()
+from app.wsgi import application
+timings = {"import_s": time.perf_counter() - start}
+environ = RequestFactory().get(
+    "/api/recipe/recipes/",
+    HTTP_HOST="localhost",
+    HTTP_AUTHORIZATION="Token invalid",
+).environ
+for name in ("first_request_s", "second_request_s"):
+    start = time.perf_counter()
+    response = application(dict(environ), lambda status, headers: None)
+    response.close()
+    timings[name] = time.perf_counter() - start
+print(json.dumps(timings))
+"""
+
+
+def _environ(**extra):
+    environ = dict(os.environ)
+    environ.update(
+        DB_NAME=connection.settings_dict["NAME"],
+        METRICS_MULTIPROC_DIR="",
+        **extra,
+    )
+    return environ
+
+
+def _run(args, **extra):
+    """Run a command in a fresh interpreter and return its wall time"""
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, *args],
+        cwd=settings.BASE_DIR,
+        env=_environ(**extra),
+        check=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    return time.perf_counter() - start
+
+
+def _first_request(warm_up):
+    output = subprocess.run(
+        [sys.executable, "-c", FIRST_REQUEST],
+        cwd=settings.BASE_DIR,
+        env=_environ(STARTUP_WARM_UP="1" if warm_up else "0"),
+        check=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def run(iterations=3):
+    """Compare migrate on every start with the startup command"""
+    migrate = []
+    for _ in range(iterations):
+        migrate.append(
+            _run(["manage.py", "wait_for_db"])
+            + _run(["manage.py", "migrate", "--no-input"])
+        )
+    startup = [_run(["manage.py", "startup"]) for _ in range(iterations)]
+    results = {
+        "wait_for_db_and_migrate": summarize(migrate),
+        "startup_command": summarize(startup),
+    }
+    for label, warm_up in (("cold", False), ("warm", True)):
+        samples = [_first_request(warm_up) for _ in range(iterations)]
+        for name in samples[0]:
+            results[f"{label}_{name[:-2]}"] = summarize(
+                [sample[name] for sample in samples]
+            )
+    return results
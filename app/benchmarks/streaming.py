@@ -0,0 +1,62 @@
+"""Peak memory of regular and streamed recipe list responses
+
+Calls RecipeViewSet.list for users with growing numbers of recipes and
+records the peak traced Python memory while the response body is built
+or streamed. Fixtures are rolled back at the end.
+"""
+import time
+import tracemalloc
+
+from django.db import transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from benchmarks.serializers import Rollback, create_recipes
+from recipe.views import RecipeViewSet
+
+
+SIZES = (1000, 5000, 20000)
+
+
+def _list(user, params):
+    """Return the time and peak memory of fetching the whole list body"""
+    request = APIRequestFactory().get("/api/recipe/recipes/", params)
+    force_authenticate(request, user)
+    view = RecipeViewSet.as_view({"get": "list"})
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = view(request)
+    if response.streaming:
+        size = sum(len(chunk) for chunk in response.streaming_content)
+    else:
+        size = len(response.render().content)
+    duration = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "bytes": size,
+        "duration_ms": round(duration * 1000, 2),
+        "peak_memory_kb": round(peak / 1024, 1),
+    }
+
+
+def run(iterations=1, sizes=SIZES):
+    """Compare regular and streamed lists for each of sizes"""
+    results = {}
+    try:
+        with transaction.atomic():
+            for size in sizes:
+                user = create_recipes(size)
+                results[size] = {
+                    mode: min(
+                        (_list(user, params) for _ in range(iterations)),
+                        key=lambda result: result["peak_memory_kb"],
+                    )
+                    for mode, params in (
+                        ("regular", {}),
+                        ("streamed", {"stream": "1"}),
+                    )
+                }
+            raise Rollback
+    except Rollback:
+        pass
+    return results
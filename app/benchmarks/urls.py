@@ -0,0 +1,13 @@
+from django.http import HttpResponse
+from django.urls import path
+
+
+def ping(request):
+    """Trivial view so benchmarks only measure the surrounding stack"""
+    return HttpResponse(b"{}", content_type="application/json")
+
+
+urlpatterns = [
+    path("api/ping/", ping),
+    path("admin/ping/", ping),
+]
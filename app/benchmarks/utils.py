@@ -0,0 +1,37 @@
+import statistics
+import time
+
+
+def percentile(samples, pct):
+    """Return the pct percentile of an already sorted list of samples"""
+    if not samples:
+        return 0.0
+    index = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+    return samples[index]
+
+
+def summarize(samples):
+    """Summarize a list of durations in seconds as microsecond statistics"""
+    samples = sorted(samples)
+    return {
+        "iterations": len(samples),
+        "mean_us": round(statistics.mean(samples) * 1e6, 2),
+        "p50_us": round(percentile(samples, 50) * 1e6, 2),
+        "p95_us": round(percentile(samples, 95) * 1e6, 2),
+        "p99_us": round(percentile(samples, 99) * 1e6, 2),
+    }
+
+
+def measure(func, iterations, warmup=10, timer=time.perf_counter):
+    """Call func repeatedly and return the summarized timings
+
+    Pass timer=time.process_time to measure CPU instead of wall time.
+    """
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(iterations):
+        start = timer()
+        func()
+        samples.append(timer() - start)
+    return summarize(samples)
@@ -1,13 +1,73 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.utils import timezone
 from django.utils.translation import gettext as _
 
 from core import models
+from core.pagination import EstimatedCountPaginator
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist without exact counts of large tables"""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class BucketListFilter(admin.SimpleListFilter):
+    """Filter on fixed ranges of a field, without querying its values
+
+    Subclasses list buckets as (value, label, lower, upper) tuples, with
+    None for an open end.
+    """
+
+    field = None
+    buckets = ()
+
+    def lookups(self, request, model_admin):
+        return [(bucket[0], bucket[1]) for bucket in self.buckets]
+
+    def queryset(self, request, queryset):
+        for value, label, lower, upper in self.buckets:
+            if self.value() != value:
+                continue
+            if lower is not None:
+                queryset = queryset.filter(**{f"{self.field}__gte": lower})
+            if upper is not None:
+                queryset = queryset.filter(**{f"{self.field}__lt": upper})
+        return queryset
+
+
+class TimeListFilter(BucketListFilter):
+    title = _("time")
+    parameter_name = "time"
+    field = "time_minutes"
+    buckets = (
+        ("quick", _("Under 15 minutes"), None, 15),
+        ("medium", _("15 to 30 minutes"), 15, 30),
+        ("long", _("30 to 60 minutes"), 30, 60),
+        ("slow", _("Over an hour"), 60, None),
+    )
+
+
+class PriceListFilter(BucketListFilter):
+    title = _("price")
+    parameter_name = "price"
+    field = "price"
+    buckets = (
+        ("cheap", _("Under 5"), None, 5),
+        ("moderate", _("5 to 10"), 5, 10),
+        ("pricey", _("10 to 20"), 10, 20),
+        ("expensive", _("20 and over"), 20, None),
+    )
 
 
 class UserAdmin(BaseUserAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     ordering = ["id"]
     list_display = ["email", "name"]
+    search_fields = ["^email"]
     fieldsets = (
         (None, {"fields": ("email", "password")}),
         (_("Personal Info"), {"fields": ("name",)}),
@@ -32,7 +92,98 @@ class UserAdmin(BaseUserAdmin):
     )
 
 
+class RecipeAttrAdmin(LargeTableAdmin):
+    list_display = ["name", "user"]
+    list_select_related = ["user"]
+    raw_id_fields = ["user"]
+    search_fields = ["^name"]
+    ordering = ["-id"]
+
+
+class RecipeAdmin(LargeTableAdmin):
+    list_display = ["title", "user", "time_minutes", "price"]
+    list_select_related = ["user"]
+    list_filter = [TimeListFilter, PriceListFilter]
+    raw_id_fields = ["user"]
+    autocomplete_fields = ["tags", "ingredients"]
+    search_fields = ["^title"]
+    ordering = ["-id"]
+
+
+class ProfilingRuleAdmin(admin.ModelAdmin):
+    list_display = [
+        "view",
+        "sample_rate",
+        "enabled",
+        "expires_at",
+        "profiles_taken",
+        "max_profiles",
+    ]
+    list_editable = ["sample_rate", "enabled"]
+    readonly_fields = ["profiles_taken", "created_at"]
+
+
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = [
+        "view",
+        "filters",
+        "duration_ms",
+        "fingerprint",
+        "has_plan",
+        "created_at",
+    ]
+    list_filter = ["view", "filters"]
+    search_fields = ["=fingerprint", "normalized_sql"]
+    date_hierarchy = "created_at"
+    readonly_fields = [field.name for field in models.SlowQuery._meta.fields]
+
+    @admin.display(boolean=True, description=_("EXPLAIN"))
+    def has_plan(self, obj):
+        return bool(obj.explain)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class AccountPurgeAdmin(admin.ModelAdmin):
+    list_display = ["email", "state", "files_deleted", "created_at"]
+    list_filter = ["state"]
+    search_fields = ["email"]
+    readonly_fields = [
+        field.name for field in models.AccountPurge._meta.fields
+    ]
+
+    def has_add_permission(self, request):
+        return False
+
+
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ["name", "state", "attempts", "available_at"]
+    list_filter = ["state"]
+    search_fields = ["^name"]
+    readonly_fields = [field.name for field in models.Task._meta.fields]
+    actions = ["retry"]
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description=_("Retry the selected failed tasks"))
+    def retry(self, request, queryset):
+        queryset.filter(state=models.Task.FAILED).update(
+            state=models.Task.QUEUED,
+            attempts=0,
+            available_at=timezone.now(),
+        )
+
+
 admin.site.register(models.User, UserAdmin)
-admin.site.register(models.Tag)
-admin.site.register(models.Ingredient)
-admin.site.register(models.Recipe)
+admin.site.register(models.Tag, RecipeAttrAdmin)
+admin.site.register(models.Ingredient, RecipeAttrAdmin)
+admin.site.register(models.Recipe, RecipeAdmin)
+admin.site.register(models.ProfilingRule, ProfilingRuleAdmin)
+admin.site.register(models.SlowQuery, SlowQueryAdmin)
+admin.site.register(models.AccountPurge, AccountPurgeAdmin)
+admin.site.register(models.Task, TaskAdmin)
@@ -0,0 +1,29 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from core import hashing
+
+
+class PooledHashingBackend(ModelBackend):
+    """Model backend that checks passwords on the bounded hashing pool
+
+    Raises HashingUnavailable, a 503 for the API, when the pool is full, so
+    it is used by the token login only and not installed in
+    AUTHENTICATION_BACKENDS, where the admin login would fail with it.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        user_model = get_user_model()
+        if username is None:
+            username = kwargs.get(user_model.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = user_model._default_manager.get_by_natural_key(username)
+        except user_model.DoesNotExist:
+            user = None
+        if hashing.check_password(user, password) and (
+            self.user_can_authenticate(user)
+        ):
+            return user
+        return None
@@ -0,0 +1,91 @@
+"""Response body codecs used by CompressionMiddleware"""
+import gzip
+import zlib
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+
+class GzipCodec:
+    """gzip content coding"""
+
+    name = "gzip"
+
+    def __init__(self, level):
+        self.level = level
+
+    def compress(self, data):
+        return gzip.compress(data, compresslevel=self.level, mtime=0)
+
+    def compress_stream(self, chunks):
+        """Compress an iterable, flushing after each chunk"""
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            data += compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+        yield compressor.flush()
+
+
+class BrotliCodec:
+    """br content coding, available when the brotli package is installed"""
+
+    name = "br"
+
+    def __init__(self, quality):
+        self.quality = quality
+
+    def compress(self, data):
+        return brotli.compress(data, quality=self.quality)
+
+    def compress_stream(self, chunks):
+        """Compress an iterable, flushing after each chunk"""
+        compressor = brotli.Compressor(quality=self.quality)
+        for chunk in chunks:
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+
+
+def available_codecs():
+    """Return the usable codecs of COMPRESSION_ENCODINGS in order"""
+    codecs = []
+    for name in settings.COMPRESSION_ENCODINGS:
+        if name == "br" and brotli is not None:
+            codecs.append(BrotliCodec(settings.COMPRESSION_BROTLI_QUALITY))
+        elif name == "gzip":
+            codecs.append(GzipCodec(settings.COMPRESSION_GZIP_LEVEL))
+    return codecs
+
+
+def accepted_encodings(header):
+    """Return the content codings an Accept-Encoding header allows"""
+    accepted = set()
+    for item in header.split(","):
+        coding, *params = item.split(";")
+        quality = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key.lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0 and coding.strip():
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def select_codec(codecs, header):
+    """Return the first codec accepted by an Accept-Encoding header"""
+    accepted = accepted_encodings(header)
+    for codec in codecs:
+        if codec.name in accepted or "*" in accepted:
+            return codec
+    return None
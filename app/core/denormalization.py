@@ -0,0 +1,183 @@
+"""
+Tag and ingredient id arrays on recipes.
+
+Recipe.tag_ids and Recipe.ingredient_ids mirror the recipe's links in the
+M2M through tables, sorted, so filters can use GIN indexed array overlap
+and containment instead of joining the through tables. Signal handlers
+add and remove the changed ids in the arrays, and backfill() and
+find_mismatches() repair and check them in bulk, for example after links
+were written with raw SQL.
+
+The handlers change the arrays in place rather than rebuilding them from
+the through tables: an UPDATE waits for the row lock of a concurrent one
+and then applies its change to the newest array, while a rebuild would
+read the links from its own snapshot and drop those of a transaction
+that committed meanwhile.
+"""
+from django.db import connection
+from django.db.models.signals import m2m_changed, post_delete
+
+from core.models import Ingredient, Recipe, Tag
+
+
+def _table():
+    return connection.ops.quote_name(Recipe._meta.db_table)
+
+
+def _arrays_sql():
+    quote = connection.ops.quote_name
+    return {
+        field: (
+            f"ARRAY(SELECT {quote(column)} "
+            f"FROM {quote(through._meta.db_table)} "
+            f"WHERE recipe_id = recipe.id ORDER BY {quote(column)})"
+        )
+        for field, through, column in (
+            ("tag_ids", Recipe.tags.through, "tag_id"),
+            ("ingredient_ids", Recipe.ingredients.through, "ingredient_id"),
+        )
+    }
+
+
+def _update(where, params):
+    """Rebuild the arrays of the recipes matching where"""
+    assignments = ", ".join(
+        f"{field} = {sql}" for field, sql in _arrays_sql().items()
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {_table()} AS recipe SET {assignments} "
+            f"WHERE {where} RETURNING id, tag_ids, ingredient_ids",
+            params,
+        )
+        return cursor.fetchall()
+
+
+def refresh(recipe_ids):
+    """Rebuild the arrays of some recipes, returning (id, tags, ingredients)"""
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return []
+    placeholders = ", ".join(["%s"] * len(recipe_ids))
+    return _update(f"recipe.id IN ({placeholders})", recipe_ids)
+
+
+def _id_ranges(batch_size):
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT MIN(id), MAX(id) FROM {_table()}")
+        low, high = cursor.fetchone()
+    if low is None:
+        return
+    for start in range(low, high + 1, batch_size):
+        yield start, min(start + batch_size - 1, high)
+
+
+def backfill(batch_size=10000, progress=None):
+    """Rebuild the arrays of every recipe, a range of ids per statement"""
+    updated = 0
+    for start, end in _id_ranges(batch_size):
+        updated += len(_update("recipe.id BETWEEN %s AND %s", [start, end]))
+        if progress:
+            progress(end, updated)
+    return updated
+
+
+def find_mismatches(batch_size=10000, limit=100):
+    """Return the ids of up to limit recipes with stale arrays"""
+    mismatches = []
+    comparisons = " OR ".join(
+        f"recipe.{field} IS DISTINCT FROM {sql}"
+        for field, sql in _arrays_sql().items()
+    )
+    for start, end in _id_ranges(batch_size):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT id FROM {_table()} AS recipe "
+                f"WHERE recipe.id BETWEEN %s AND %s AND ({comparisons}) "
+                f"ORDER BY id LIMIT %s",
+                [start, end, limit - len(mismatches)],
+            )
+            mismatches.extend(row[0] for row in cursor.fetchall())
+        if len(mismatches) >= limit:
+            break
+    return mismatches
+
+
+def _change(field, value_sql, where, params):
+    """Set the array field of the recipes matching where, in place"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {_table()} SET {field} = {value_sql} "
+            f"WHERE {where} RETURNING tag_ids, ingredient_ids",
+            params,
+        )
+        return cursor.fetchall()
+
+
+def _added(field):
+    return (
+        f"ARRAY(SELECT DISTINCT x FROM unnest({field} || %s::bigint[]) "
+        f"AS x ORDER BY x)"
+    )
+
+
+def _removed(field):
+    return (
+        f"ARRAY(SELECT x FROM unnest({field}) AS x "
+        f"WHERE x <> ALL(%s::bigint[]) ORDER BY x)"
+    )
+
+
+def _remove_everywhere(field, pk):
+    """Remove an id from the array field of every recipe holding it"""
+    _change(
+        field,
+        f"array_remove({field}, %s)",
+        f"{field} @> ARRAY[%s]::bigint[]",
+        [pk, pk],
+    )
+
+
+def _links_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    field = "tag_ids" if sender is Recipe.tags.through else "ingredient_ids"
+    if action == "post_clear":
+        if reverse:
+            _remove_everywhere(field, instance.pk)
+            return
+        rows = _change(field, "'{}'", "id = %s", [instance.pk])
+    elif action in ("post_add", "post_remove") and pk_set:
+        change = _added if action == "post_add" else _removed
+        if reverse:
+            _change(
+                field,
+                change(field),
+                "id = ANY(%s::bigint[])",
+                [[instance.pk], list(pk_set)],
+            )
+            return
+        rows = _change(
+            field, change(field), "id = %s", [list(pk_set), instance.pk]
+        )
+    else:
+        return
+    for tag_ids, ingredient_ids in rows:
+        instance.tag_ids = tag_ids
+        instance.ingredient_ids = ingredient_ids
+
+
+def _linked_deleted(sender, instance, **kwargs):
+    # Deleting a tag removes its links without sending m2m_changed
+    field = "tag_ids" if sender is Tag else "ingredient_ids"
+    _remove_everywhere(field, instance.pk)
+
+
+def connect():
+    """Connect the handlers that keep the arrays in sync"""
+    for through in (Recipe.tags.through, Recipe.ingredients.through):
+        m2m_changed.connect(
+            _links_changed, sender=through, dispatch_uid=through._meta.label
+        )
+    for model in (Tag, Ingredient):
+        post_delete.connect(
+            _linked_deleted, sender=model, dispatch_uid=model._meta.label
+        )
@@ -0,0 +1,452 @@
+"""
+Change events of recipes, tags and ingredients, streamed to their owner.
+
+Saving or deleting one of them sends a PostgreSQL NOTIFY on EVENTS_CHANNEL
+with a JSON payload. NOTIFY is delivered when the transaction commits, and
+not at all when it rolls back. Bulk operations that skip the model signals,
+such as QuerySet.update(), send no events unless they call notify_many()
+themselves.
+
+Every ASGI process LISTENs on one database connection and hands the
+payloads to a Broadcaster, which queues them for the Server-Sent Events
+streams of their user and keeps the last EVENTS_BUFFER_SIZE of them. The
+Broadcaster numbers events in the order they arrive, which is the commit
+order, so a transaction that commits late is not mistaken for an event the
+stream already sent. Ids start with a random epoch of the Broadcaster. A
+client reconnecting with Last-Event-ID gets the events it missed from the
+buffer. When they are no longer there, or the id is from another process,
+it gets a reset event and should reload its lists. An idle stream is a
+coroutine waiting on its queue, with no thread or database connection of
+its own.
+"""
+import asyncio
+import collections
+import json
+import uuid
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from core.models import Ingredient, Recipe, Tag
+
+
+CREATED = "created"
+UPDATED = "updated"
+DELETED = "deleted"
+RESET = object()
+HEARTBEAT = object()
+DISCONNECTED = object()
+
+
+def notify_many(user_id, model, pks, action, using=DEFAULT_DB_ALIAS):
+    """Send an event per primary key of a model owned by a user"""
+    pks = list(pks)
+    if not pks:
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_notify(%s, json_build_object("
+            "'user', %s::bigint, 'model', %s, 'pk', pk, 'action', %s)::text) "
+            "FROM unnest(%s::bigint[]) AS pk",
+            [settings.EVENTS_CHANNEL, user_id, model, action, pks],
+        )
+
+
+def _saved(sender, instance, created, raw, using, **kwargs):
+    if raw:
+        return
+    action = CREATED if created else UPDATED
+    notify_many(
+        instance.user_id,
+        sender._meta.model_name,
+        [instance.pk],
+        action,
+        using,
+    )
+
+
+def _deleted(sender, instance, using, **kwargs):
+    notify_many(
+        instance.user_id,
+        sender._meta.model_name,
+        [instance.pk],
+        DELETED,
+        using,
+    )
+
+
+def _links_changed(sender, instance, action, reverse, pk_set, using, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        pks = [instance.pk]
+    elif action == "post_clear":
+        # The recipes are unknown, clients refetch those of the tag
+        notify_many(
+            instance.user_id,
+            instance._meta.model_name,
+            [instance.pk],
+            UPDATED,
+            using,
+        )
+        return
+    else:
+        pks = pk_set
+    notify_many(instance.user_id, "recipe", pks, UPDATED, using)
+
+
+def connect():
+    """Connect the handlers that send the change events"""
+    for model in (Recipe, Tag, Ingredient):
+        uid = f"events.{model._meta.label}"
+        post_save.connect(_saved, sender=model, dispatch_uid=uid)
+        post_delete.connect(_deleted, sender=model, dispatch_uid=uid)
+    for through in (Recipe.tags.through, Recipe.ingredients.through):
+        m2m_changed.connect(
+            _links_changed,
+            sender=through,
+            dispatch_uid=f"events.{through._meta.label}",
+        )
+
+
+class Subscription:
+    """The queue of events of one stream"""
+
+    def __init__(self, user_id, size):
+        self.user_id = user_id
+        self.size = size
+        self.queue = asyncio.Queue()
+        self.closed = False
+
+    def put(self, event):
+        if self.closed:
+            return
+        if event is RESET or self.queue.qsize() >= self.size:
+            # A stream too slow to keep up starts over
+            self.closed = True
+            event = RESET
+        self.queue.put_nowait(event)
+
+    def heartbeat(self):
+        if not self.closed and self.queue.empty():
+            self.queue.put_nowait(HEARTBEAT)
+
+    def disconnect(self):
+        self.closed = True
+        self.queue.put_nowait(DISCONNECTED)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class Broadcaster:
+    """Fan events out to the streams of their user, keep the latest ones
+
+    Events are numbered from 1 as they are published. Events after
+    resumable_after are all in the buffer, or were evicted before
+    resumable_after moved past them. None means nothing can be replayed,
+    as when the listener is not connected.
+    """
+
+    def __init__(self, buffer_size=None, queue_size=None):
+        self.recent = collections.deque(
+            maxlen=buffer_size or settings.EVENTS_BUFFER_SIZE
+        )
+        self.queue_size = queue_size or settings.EVENTS_QUEUE_SIZE
+        self.subscriptions = collections.defaultdict(set)
+        self.resumable_after = None
+        self.last_id = 0
+        # Ids of other processes and earlier runs are not resumed
+        self.epoch = uuid.uuid4().hex[:8]
+
+    def event_id(self, number):
+        """Return the Server-Sent Events id of an event number"""
+        return f"{self.epoch}-{number}"
+
+    def parse_event_id(self, event_id):
+        """Return the event number of an id of this Broadcaster, or None"""
+        epoch, _, number = event_id.partition("-")
+        if epoch != self.epoch or not number.isdigit():
+            return None
+        return int(number)
+
+    def subscribe(self, user_id):
+        subscription = Subscription(user_id, self.queue_size)
+        self.subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscriptions = self.subscriptions.get(subscription.user_id)
+        if subscriptions is None:
+            return
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self.subscriptions[subscription.user_id]
+
+    def reset(self, resumable=True):
+        """Forget the buffer, resume after the reset or not at all
+
+        The reset takes a number of its own, so streams that saw the events
+        before it cannot resume past the events missed meanwhile.
+        """
+        self.recent.clear()
+        self.last_id += 1
+        self.resumable_after = self.last_id if resumable else None
+        for subscriptions in self.subscriptions.values():
+            for subscription in subscriptions:
+                subscription.put(RESET)
+
+    def heartbeat(self):
+        """Wake every idle stream to send a keep-alive comment"""
+        for subscriptions in self.subscriptions.values():
+            for subscription in subscriptions:
+                subscription.heartbeat()
+
+    def publish(self, event):
+        """Number an event and queue it for the streams of its user"""
+        self.last_id += 1
+        event["id"] = self.last_id
+        if len(self.recent) == self.recent.maxlen:
+            evicted = self.recent[0]["id"]
+            if self.resumable_after is not None:
+                self.resumable_after = max(self.resumable_after, evicted)
+        self.recent.append(event)
+        for subscription in self.subscriptions.get(event["user"], ()):
+            subscription.put(event)
+
+    def replay(self, user_id, last_id):
+        """Return the buffered events of a user after last_id, or None"""
+        if (
+            last_id is None
+            or self.resumable_after is None
+            or last_id < self.resumable_after
+        ):
+            return None
+        return [
+            event
+            for event in self.recent
+            if event["id"] > last_id and event["user"] == user_id
+        ]
+
+
+class Listener:
+    """One connection LISTENing on EVENTS_CHANNEL, feeding a Broadcaster"""
+
+    def __init__(self, broadcaster, using=DEFAULT_DB_ALIAS):
+        self.broadcaster = broadcaster
+        self.using = using
+        self.connection = None
+        self.loop = None
+        self._lock = None
+
+    async def start(self):
+        """Connect unless connected, from the event loop serving streams"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self.connection is not None:
+                return
+            self.connection = await sync_to_async(
+                self._connect, thread_sensitive=False
+            )()
+            self.loop = asyncio.get_running_loop()
+            self.loop.add_reader(self.connection.fileno(), self._read)
+            self.broadcaster.reset()
+
+    def _connect(self):
+        wrapper = connections[self.using]
+        connection = wrapper.get_new_connection(
+            wrapper.get_connection_params()
+        )
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {settings.EVENTS_CHANNEL}")
+        return connection
+
+    def _read(self):
+        try:
+            self.connection.poll()
+        except connections[self.using].Database.Error:
+            self.stop()
+            return
+        while self.connection.notifies:
+            notify = self.connection.notifies.pop(0)
+            self.broadcaster.publish(json.loads(notify.payload))
+
+    def stop(self):
+        """Disconnect, the streams restart and the next one reconnects"""
+        if self.connection is None:
+            return
+        self.loop.remove_reader(self.connection.fileno())
+        self.connection.close()
+        self.connection = None
+        self.broadcaster.reset(resumable=False)
+
+
+def _authenticate(key):
+    close_old_connections()
+    try:
+        user, _ = TokenAuthentication().authenticate_credentials(key)
+        return user.pk
+    except AuthenticationFailed:
+        return None
+    finally:
+        close_old_connections()
+
+
+def format_event(event_id, name, data):
+    """Return an event in the text/event-stream format"""
+    return (
+        f"id: {event_id}\nevent: {name}\ndata: {json.dumps(data)}\n\n"
+    ).encode()
+
+
+class EventStream:
+    """ASGI application streaming the change events of the user
+
+    The token is read from the Authorization header, or from the token
+    query parameter for EventSource clients that cannot set headers. The
+    last event id is read from the Last-Event-ID header or the
+    last_event_id query parameter.
+    """
+
+    def __init__(self, broadcaster=None, listener=None):
+        self.broadcaster = broadcaster or Broadcaster()
+        self.listener = listener or Listener(self.broadcaster)
+        self._heartbeat = None
+
+    async def __call__(self, scope, receive, send):
+        headers = dict(scope["headers"])
+        query = parse_qs(scope["query_string"].decode())
+        if scope["method"] != "GET":
+            await self._error(send, 405, "Method not allowed.")
+            return
+        keyword, _, key = headers.get(b"authorization", b"").partition(b" ")
+        if keyword == b"Token":
+            key = key.decode()
+        else:
+            key = query.get("token", [""])[0]
+        user_id = await sync_to_async(_authenticate)(key) if key else None
+        if user_id is None:
+            await self._error(send, 401, "Invalid or missing token.")
+            return
+        last_id = (
+            headers.get(b"last-event-id", b"").decode()
+            or query.get("last_event_id", [""])[0]
+            or None
+        )
+
+        await self.listener.start()
+        self._start_heartbeat()
+        subscription = self.broadcaster.subscribe(user_id)
+        try:
+            await self._stream(subscription, last_id, receive, send)
+        finally:
+            self.broadcaster.unsubscribe(subscription)
+
+    def _start_heartbeat(self):
+        # One timer for every stream, instead of a timeout per stream
+        loop = asyncio.get_running_loop()
+        beating = self._heartbeat and not self._heartbeat.done()
+        if beating and self._heartbeat.get_loop() is loop:
+            return
+        self._heartbeat = loop.create_task(self._beat())
+
+    async def _beat(self):
+        while True:
+            await asyncio.sleep(settings.EVENTS_HEARTBEAT)
+            # Keeps proxies from closing idle streams
+            self.broadcaster.heartbeat()
+
+    async def _error(self, send, status, detail):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [(b"content-type", b"application/json")],
+            }
+        )
+        body = json.dumps({"detail": detail}).encode()
+        await send({"type": "http.response.body", "body": body})
+
+    def _reset(self):
+        event_id = self.broadcaster.event_id(self.broadcaster.last_id)
+        return format_event(event_id, "reset", {})
+
+    def _message(self, event):
+        data = {"action": event["action"], "id": event["pk"]}
+        event_id = self.broadcaster.event_id(event["id"])
+        return format_event(event_id, event["model"], data)
+
+    async def _stream(self, subscription, last_id, receive, send):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"text/event-stream"),
+                    (b"cache-control", b"no-cache"),
+                    (b"x-accel-buffering", b"no"),
+                ],
+            }
+        )
+        chunks = [f"retry: {settings.EVENTS_RETRY_MS}\n\n".encode()]
+        seen = 0
+        if last_id is not None:
+            seen = self.broadcaster.parse_event_id(last_id)
+            missed = self.broadcaster.replay(subscription.user_id, seen)
+            if missed is None:
+                chunks.append(self._reset())
+                seen = self.broadcaster.last_id
+            for event in missed or ():
+                chunks.append(self._message(event))
+                seen = event["id"]
+        await self._send(send, b"".join(chunks))
+
+        watcher = asyncio.ensure_future(
+            self._watch_disconnect(receive, subscription)
+        )
+        try:
+            while True:
+                event = await subscription.get()
+                if event is DISCONNECTED:
+                    return
+                if event is HEARTBEAT:
+                    await self._send(send, b": keep-alive\n\n")
+                elif event is RESET:
+                    await self._send(send, self._reset(), more=False)
+                    return
+                elif event["id"] > seen:
+                    seen = event["id"]
+                    await self._send(send, self._message(event))
+        finally:
+            watcher.cancel()
+
+    async def _send(self, send, body, more=True):
+        await send(
+            {"type": "http.response.body", "body": body, "more_body": more}
+        )
+
+    async def _watch_disconnect(self, receive, subscription):
+        while (await receive())["type"] != "http.disconnect":
+            pass
+        subscription.disconnect()
+
+
+def route(application, path=None):
+    """Wrap an ASGI application to serve the event stream at path"""
+    path = path or settings.EVENTS_PATH
+    stream = EventStream()
+
+    async def router(scope, receive, send):
+        if scope["type"] == "http" and scope["path"] == path:
+            await stream(scope, receive, send)
+        else:
+            await application(scope, receive, send)
+
+    return router
@@ -0,0 +1,131 @@
+"""
+Password checks on a bounded pool of hashing threads.
+
+PBKDF2 releases the GIL while hashing, so a few hashing threads keep
+logins from starving the threads that serve other requests. Checks wait
+in a bounded queue and are refused with a 503 when it is full, instead of
+piling up CPU work during a login storm.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from core import metrics
+
+
+hash_duration = metrics.registry.histogram(
+    "password_hash_duration_seconds",
+    "Time spent hashing passwords, per operation (check or make).",
+    ("operation",),
+)
+hash_queue_duration = metrics.registry.histogram(
+    "password_hash_queue_seconds",
+    "Time password hashing waited for a free hashing thread.",
+)
+hash_rejected_total = metrics.registry.counter(
+    "password_hash_rejected_total",
+    "Password hashing refused because the hashing queue was full.",
+)
+
+
+class HashingUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many logins in progress, try again shortly."
+    default_code = "hashing_unavailable"
+
+    def __init__(self, detail=None, code=None, wait=1):
+        super().__init__(detail, code)
+        self.wait = wait
+
+
+class HashingExecutor:
+    """Thread pool that refuses work beyond its workers and queue limit"""
+
+    def __init__(self, workers, queue_size):
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="passwordhash"
+        )
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+
+    def submit(self, operation, func, *args):
+        """Run func in the pool and return its future
+
+        Raises HashingUnavailable when every worker is busy and the queue
+        is full.
+        """
+        if not self._slots.acquire(blocking=False):
+            hash_rejected_total.inc()
+            raise HashingUnavailable()
+        queued = time.perf_counter()
+
+        def run():
+            start = time.perf_counter()
+            hash_queue_duration.observe(start - queued)
+            try:
+                return func(*args)
+            finally:
+                hash_duration.observe(
+                    time.perf_counter() - start, operation=operation
+                )
+
+        future = self._executor.submit(run)
+        future.add_done_callback(lambda future: self._slots.release())
+        return future
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the process wide hashing executor"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = HashingExecutor(
+                settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_QUEUE
+            )
+        return _executor
+
+
+def _check(password, encoded):
+    """Return whether password matches and the hash must be upgraded"""
+    outdated = []
+    valid = hashers.check_password(password, encoded, outdated.append)
+    return valid, bool(outdated)
+
+
+def _submit_check(user, password):
+    if user is None:
+        # Take as long to refuse an unknown user as a wrong password
+        return get_executor().submit("check", hashers.make_password, password)
+    return get_executor().submit("check", _check, password, user.password)
+
+
+def _rehash(user, password):
+    """Store a hash made with the current hasher settings"""
+    user.password = (
+        get_executor().submit("make", hashers.make_password, password).result()
+    )
+    user.save(update_fields=["password"])
+
+
+def check_password(user, password):
+    """Check the password of user, or of no user, on the hashing pool
+
+    When the stored hash was made with other hasher settings, such as a
+    different PBKDF2 iteration count, the user gets a new hash. Only the
+    hashing runs on the pool; database work stays on the calling thread.
+    """
+    result = _submit_check(user, password).result()
+    if user is None:
+        return False
+    valid, outdated = result
+    if valid and outdated:
+        _rehash(user, password)
+    return valid
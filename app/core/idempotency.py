@@ -0,0 +1,167 @@
+"""
+Idempotency-Key support for DRF views.
+
+The first response to a POST with an Idempotency-Key header is stored in
+the shared cache per user and key, and replayed for retries with the same
+key and body. A retry that arrives while the first request is still
+running gets a 409, and reusing a key for another endpoint or body gets a
+422.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.uploadedfile import UploadedFile
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+
+from core import metrics
+
+
+PENDING = "pending"
+DONE = "done"
+
+
+def data_digest(data):
+    """Return a SHA-256 hex digest of parsed request data
+
+    The raw body is not read since request.body refuses multipart bodies
+    over DATA_UPLOAD_MAX_MEMORY_SIZE. Uploaded files are hashed in chunks.
+    """
+    digest = hashlib.sha256()
+    if not hasattr(data, "lists"):
+        digest.update(json.dumps(data, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+    for key, values in sorted(data.lists()):
+        digest.update(json.dumps(key).encode())
+        for value in values:
+            if isinstance(value, UploadedFile):
+                digest.update(json.dumps([value.name, value.size]).encode())
+                for chunk in value.chunks():
+                    digest.update(chunk)
+                value.seek(0)
+            else:
+                digest.update(json.dumps(str(value)).encode())
+    return digest.hexdigest()
+
+
+class IdempotencyConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = (
+        "A request with this Idempotency-Key is still being processed."
+    )
+    default_code = "idempotency_conflict"
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = "This Idempotency-Key was used for another request."
+    default_code = "idempotency_key_reused"
+
+
+class _Replay(Exception):
+    """Raised from initial() to answer with a stored response"""
+
+    def __init__(self, entry):
+        self.entry = entry
+
+
+class IdempotencyMixin:
+    """Store and replay the responses of POSTs with an Idempotency-Key
+
+    Keys are checked after authentication, permissions and throttling.
+    Responses with a status below 500 are kept for IDEMPOTENCY_KEY_TTL
+    seconds. Server errors release the key so the request can be retried.
+    """
+
+    idempotency_header = "HTTP_IDEMPOTENCY_KEY"
+    idempotent_methods = ("POST",)
+    replay_headers = ("Location",)
+
+    def initial(self, request, *args, **kwargs):
+        self._idempotency = None
+        super().initial(request, *args, **kwargs)
+        key = request.META.get(self.idempotency_header)
+        if (
+            key is None
+            or request.method not in self.idempotent_methods
+            or not request.user.is_authenticated
+        ):
+            return
+        if not key or len(key) > 255:
+            raise ValidationError(
+                {"Idempotency-Key": ["Must be 1 to 255 characters long."]}
+            )
+
+        cache = caches[settings.IDEMPOTENCY_CACHE]
+        cache_key = "idempotency:{}:{}".format(
+            request.user.pk, hashlib.sha256(key.encode()).hexdigest()
+        )
+        body = data_digest(request.data)
+        fingerprint = f"{request.method} {request.path} {body}"
+        pending = {"state": PENDING, "fingerprint": fingerprint}
+        if cache.add(cache_key, pending, settings.IDEMPOTENCY_LOCK_TIMEOUT):
+            metrics.record_cache_lookup("idempotency", False)
+            self._idempotency = (cache, cache_key, fingerprint)
+            return
+
+        entry = cache.get(cache_key)
+        if entry is None:
+            raise IdempotencyConflict()
+        if entry["fingerprint"] != fingerprint:
+            raise IdempotencyKeyReused()
+        if entry["state"] == PENDING:
+            raise IdempotencyConflict()
+        metrics.record_cache_lookup("idempotency", True)
+        raise _Replay(entry)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, _Replay):
+            entry = exc.entry
+            response = Response(
+                entry["data"], status=entry["status"], headers=entry["headers"]
+            )
+            response["Idempotent-Replayed"] = "true"
+            return response
+        try:
+            return super().handle_exception(exc)
+        except Exception:
+            self._release_idempotency_key()
+            raise
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        if getattr(self, "_idempotency", None) is None:
+            return response
+        if response.status_code >= 500 or not isinstance(response, Response):
+            self._release_idempotency_key()
+            return response
+
+        cache, cache_key, fingerprint = self._idempotency
+        cache.set(
+            cache_key,
+            {
+                "state": DONE,
+                "fingerprint": fingerprint,
+                "status": response.status_code,
+                "data": response.data,
+                "headers": {
+                    name: response[name]
+                    for name in self.replay_headers
+                    if response.has_header(name)
+                },
+            },
+            settings.IDEMPOTENCY_KEY_TTL,
+        )
+        self._idempotency = None
+        return response
+
+    def _release_idempotency_key(self):
+        if getattr(self, "_idempotency", None) is not None:
+            cache, cache_key, _ = self._idempotency
+            cache.delete(cache_key)
+            self._idempotency = None
@@ -0,0 +1,88 @@
+import contextvars
+import time
+from contextlib import contextmanager
+
+
+_current_metrics = contextvars.ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    """Timings collected while a single sampled request is handled"""
+
+    __slots__ = (
+        "view",
+        "view_start",
+        "queries",
+        "db_time",
+        "serializer_time",
+        "_serializer_depth",
+    )
+
+    def __init__(self):
+        self.view = None
+        self.view_start = None
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self._serializer_depth = 0
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        """Count and time every query, for connection.execute_wrapper"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - start
+
+
+def current_metrics():
+    """Return the metrics of the request being handled, if it is sampled"""
+    return _current_metrics.get()
+
+
+@contextmanager
+def collect_metrics():
+    """Collect RequestMetrics for everything run inside the block"""
+    metrics = RequestMetrics()
+    token = _current_metrics.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current_metrics.reset(token)
+
+
+def view_label(view_func, method):
+    """Return a readable name such as RecipeViewSet.list for a view"""
+    cls = getattr(view_func, "cls", None) or getattr(
+        view_func, "view_class", None
+    )
+    if cls is None:
+        return getattr(view_func, "__qualname__", repr(view_func))
+    actions = getattr(view_func, "actions", None)
+    if actions and method.lower() in actions:
+        return f"{cls.__name__}.{actions[method.lower()]}"
+    return cls.__name__
+
+
+class TimedSerializerMixin:
+    """Add the time spent in to_representation to the request metrics
+
+    Only the outermost serializer call is timed, so nested serializers are
+    not counted twice, and queries run while serializing are excluded.
+    """
+
+    def to_representation(self, instance):
+        metrics = _current_metrics.get()
+        if metrics is None or metrics._serializer_depth:
+            return super().to_representation(instance)
+
+        metrics._serializer_depth += 1
+        db_time = metrics.db_time
+        start = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.serializer_time += elapsed - (metrics.db_time - db_time)
+            metrics._serializer_depth -= 1
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import denormalization
+
+
+class Command(BaseCommand):
+    """Django command to rebuild or check the tag and ingredient arrays"""
+
+    help = (
+        "Rebuild Recipe.tag_ids and Recipe.ingredient_ids from the link "
+        "tables, or with --verify only report recipes whose arrays differ."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--verify", action="store_true")
+        parser.add_argument("--batch-size", type=int, default=10000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size must be positive")
+        start = time.monotonic()
+
+        if options["verify"]:
+            mismatches = denormalization.find_mismatches(batch_size)
+            if mismatches:
+                raise CommandError(
+                    f"{len(mismatches)} recipes with stale arrays, first ids: "
+                    + ", ".join(str(pk) for pk in mismatches[:10])
+                )
+            self.stdout.write(self.style.SUCCESS("All recipe arrays match"))
+            return
+
+        def progress(last_id, updated):
+            elapsed = time.monotonic() - start
+            self.stdout.write(
+                f"core_recipe: {updated} up to id {last_id} ({elapsed:.1f}s)"
+            )
+
+        updated = denormalization.backfill(batch_size, progress)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt the arrays of {updated} recipes "
+                f"in {time.monotonic() - start:.1f}s"
+            )
+        )
@@ -0,0 +1,37 @@
+import importlib
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    """Django command to run one of the suites in the benchmarks package"""
+
+    help = "Run a benchmark suite and print its results as JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("suite", help="Module name in benchmarks/")
+        parser.add_argument("--iterations", type=int, default=None)
+        parser.add_argument(
+            "--output", help="Also write the JSON results to this file"
+        )
+
+    def handle(self, *args, **options):
+        module = f"benchmarks.{options['suite']}"
+        try:
+            suite = importlib.import_module(module)
+        except ModuleNotFoundError as exc:
+            if exc.name != module:
+                raise
+            raise CommandError(f"Unknown benchmark suite {options['suite']}")
+
+        kwargs = {}
+        if options["iterations"]:
+            kwargs["iterations"] = options["iterations"]
+        results = {"suite": options["suite"], "results": suite.run(**kwargs)}
+
+        output = json.dumps(results, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                fh.write(output)
+        self.stdout.write(output)
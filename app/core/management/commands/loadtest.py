@@ -0,0 +1,101 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.http_load import DEFAULT_MIX, LoadTest, compare
+from core.seeding import SEED_EMAIL, SEED_PASSWORD
+
+
+def parse_mix(value):
+    """Parse a scenario mix such as login=5,recipe_detail=30"""
+    mix = dict.fromkeys(DEFAULT_MIX, 0)
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        if name not in mix:
+            raise CommandError(f"Unknown scenario {name}")
+        mix[name] = int(weight or 1)
+    return mix
+
+
+class Command(BaseCommand):
+    """Django command to load test a running server with seeded users"""
+
+    help = (
+        "Drive a realistic traffic mix against a running server backed by "
+        "a seed_dataset database and report per scenario latency. Every "
+        "virtual user shares one address, so clear or raise the server's "
+        "THROTTLE_RATE_<SCOPE> settings to keep the rate limits out of "
+        "the results."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://localhost:8000")
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--duration", type=float, default=30)
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=50,
+            help="Number of random seeded users to log in as",
+        )
+        parser.add_argument("--password", default=SEED_PASSWORD)
+        parser.add_argument(
+            "--mix",
+            type=parse_mix,
+            default=DEFAULT_MIX,
+            help="Scenario weights, e.g. recipe_detail=30,login=5",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--label", help="Name of the branch or build")
+        parser.add_argument("--output", help="Write JSON results here")
+        parser.add_argument("--compare", help="Baseline JSON results")
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=10,
+            help="Allowed p95/throughput regression in percent",
+        )
+
+    def handle(self, *args, **options):
+        prefix, _, suffix = SEED_EMAIL.partition("{index}")
+        emails = (
+            get_user_model()
+            .objects.filter(email__startswith=prefix, email__endswith=suffix)
+            .order_by("?")
+            .values_list("email", flat=True)[: options["users"]]
+        )
+        credentials = [(email, options["password"]) for email in emails]
+        if not credentials:
+            raise CommandError("No seeded users, run seed_dataset first")
+
+        results = LoadTest(
+            options["base_url"],
+            credentials,
+            concurrency=options["concurrency"],
+            duration=options["duration"],
+            mix=options["mix"],
+            seed=options["seed"],
+        ).run()
+        results["label"] = options["label"]
+
+        output = json.dumps(results, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                fh.write(output)
+        self.stdout.write(output)
+        if results["throttled"]:
+            self.stderr.write(
+                f"{results['throttled']} requests were throttled, clear or "
+                "raise the server's THROTTLE_RATE_<SCOPE> settings"
+            )
+
+        if options["compare"]:
+            with open(options["compare"]) as fh:
+                baseline = json.load(fh)
+            regressions = compare(baseline, results, options["tolerance"])
+            if regressions:
+                raise CommandError(
+                    "Regressions against baseline:\n" + "\n".join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS("No regressions"))
@@ -0,0 +1,71 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.models import ProfilingRule
+
+
+class Command(BaseCommand):
+    """Django command to control request profiling at runtime"""
+
+    help = "Start, stop or list profiling of a view action"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "view", nargs="?", help="View label such as RecipeViewSet.list"
+        )
+        parser.add_argument("--rate", type=float, default=0.01)
+        parser.add_argument(
+            "--minutes",
+            type=int,
+            default=30,
+            help="Stop profiling after this many minutes, 0 for never",
+        )
+        parser.add_argument("--max-profiles", type=int, default=100)
+        parser.add_argument("--disable", action="store_true")
+        parser.add_argument("--list", action="store_true")
+
+    def handle(self, *args, **options):
+        if options["list"]:
+            for rule in ProfilingRule.objects.order_by("view"):
+                self.stdout.write(
+                    f"{rule.view} rate={rule.sample_rate} "
+                    f"enabled={rule.enabled} expires_at={rule.expires_at} "
+                    f"profiles={rule.profiles_taken}/{rule.max_profiles}"
+                )
+            return
+
+        view = options["view"]
+        if not view:
+            raise CommandError("A view label is required")
+
+        if options["disable"]:
+            updated = ProfilingRule.objects.filter(view=view).update(
+                enabled=False
+            )
+            if not updated:
+                raise CommandError(f"No profiling rule for {view}")
+            self.stdout.write(self.style.SUCCESS(f"Stopped profiling {view}"))
+            return
+
+        if not 0 < options["rate"] <= 1:
+            raise CommandError("--rate must be between 0 and 1")
+        expires_at = None
+        if options["minutes"]:
+            expires_at = timezone.now() + timedelta(minutes=options["minutes"])
+        ProfilingRule.objects.update_or_create(
+            view=view,
+            defaults={
+                "sample_rate": options["rate"],
+                "enabled": True,
+                "expires_at": expires_at,
+                "max_profiles": options["max_profiles"],
+                "profiles_taken": 0,
+            },
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Profiling {options['rate']:.0%} of {view} requests"
+            )
+        )
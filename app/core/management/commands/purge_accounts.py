@@ -0,0 +1,49 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.purging import AccountPurger, pending_purges, schedule_purge
+
+
+class Command(BaseCommand):
+    """Django command to delete user accounts in batches"""
+
+    help = (
+        "Queue the purge of the given users, then run every unfinished "
+        "purge. Purges that stopped half way carry on where they were."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("emails", nargs="*", help="Users to purge")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive")
+        User = get_user_model()
+        for email in options["emails"]:
+            try:
+                user = User.objects.get(email=email)
+            except User.DoesNotExist:
+                raise CommandError(f"No user with email {email}")
+            schedule_purge(user)
+
+        for purge in pending_purges():
+            start = time.monotonic()
+
+            def progress(label, deleted):
+                elapsed = time.monotonic() - start
+                self.stdout.write(
+                    f"{purge.email} {label}: {deleted} ({elapsed:.1f}s)"
+                )
+
+            purger = AccountPurger(purge, options["batch_size"], progress)
+            if purger.run() is None:
+                self.stdout.write(f"Skipped {purge.email}, already running")
+                continue
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Purged {purge.email} in {time.monotonic() - start:.1f}s"
+                )
+            )
@@ -0,0 +1,56 @@
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.taskqueue import Worker
+
+
+class Command(BaseCommand):
+    """Django command to run queued background tasks"""
+
+    help = (
+        "Claim and run queued tasks until interrupted. SIGTERM and SIGINT "
+        "let the running tasks finish before exiting."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            help="Tasks run at the same time, one thread each",
+        )
+        parser.add_argument(
+            "--visibility-timeout",
+            type=int,
+            help="Seconds before a claimed task is handed to another worker",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            help="Seconds between checks of an empty queue",
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Exit once no task is ready instead of polling",
+        )
+
+    def handle(self, *args, **options):
+        for name in ("concurrency", "visibility_timeout", "poll_interval"):
+            if options[name] is not None and options[name] <= 0:
+                option = name.replace("_", "-")
+                raise CommandError(f"--{option} must be positive")
+        worker = Worker(
+            concurrency=options["concurrency"],
+            visibility_timeout=options["visibility_timeout"],
+            poll_interval=options["poll_interval"],
+            burst=options["burst"],
+        )
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *args: worker.stop())
+
+        self.stdout.write(f"Worker started with {worker.concurrency} threads")
+        processed = worker.run()
+        self.stdout.write(
+            self.style.SUCCESS(f"Worker stopped after {processed} tasks")
+        )
@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.seeding import SEED_EMAIL, SEED_PASSWORD, DatasetSeeder
+
+
+class Command(BaseCommand):
+    """Django command to generate a synthetic dataset for load testing"""
+
+    help = (
+        "Generate users, tags, ingredients and recipes. Seeded users log in "
+        f"as {SEED_EMAIL.format(index='<id>')} with --password."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=1000)
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=None,
+            help="Defaults to one user per 100 recipes",
+        )
+        parser.add_argument("--tags-per-user", type=int, default=20)
+        parser.add_argument("--ingredients-per-user", type=int, default=50)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=50000)
+        parser.add_argument("--password", default=SEED_PASSWORD)
+
+    def handle(self, *args, **options):
+        users = options["users"] or max(1, options["recipes"] // 100)
+        if options["recipes"] < 0 or users < 0:
+            raise CommandError("--recipes and --users must be positive")
+
+        seeder = DatasetSeeder(
+            recipes=options["recipes"],
+            users=users,
+            tags_per_user=options["tags_per_user"],
+            ingredients_per_user=options["ingredients_per_user"],
+            seed=options["seed"],
+            batch_size=options["batch_size"],
+            password=options["password"],
+        )
+        start = time.monotonic()
+
+        def progress(table, done, total):
+            elapsed = time.monotonic() - start
+            self.stdout.write(f"{table}: {done}/{total} ({elapsed:.1f}s)")
+
+        seeder.run(progress)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Seeded {options['recipes']} recipes for {users} users "
+                f"in {time.monotonic() - start:.1f}s"
+            )
+        )
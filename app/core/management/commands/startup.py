@@ -0,0 +1,55 @@
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db.utils import OperationalError
+
+from core import metrics, startup
+
+
+class Command(BaseCommand):
+    """Django command preparing the database and process state on start"""
+
+    help = (
+        "Wait for the database, migrate only when migrations are pending, "
+        "empty the metrics directory and warm up the app"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=60,
+            help="Seconds to wait for the database",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        self.stdout.write("Waiting for database...")
+        try:
+            startup.wait_for_database(options["timeout"])
+        except OperationalError as exc:
+            raise CommandError(f"Database unavailable: {exc}")
+
+        pending = startup.pending_migrations()
+        if pending:
+            self.stdout.write(f"{len(pending)} migrations pending")
+            call_command("migrate", interactive=False, stdout=self.stdout)
+        else:
+            names = startup.migration_files()
+            self.stdout.write(
+                f"Migrations up to date ({startup.fingerprint(names)}), "
+                f"skipping migrate"
+            )
+
+        removed = metrics.registry.clear_files()
+        if removed:
+            self.stdout.write(f"Removed {removed} stale metrics files")
+
+        timings = startup.warm_up()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Ready in {time.perf_counter() - started:.2f}s "
+                f"(imports {timings['imports_s']:.2f}s)"
+            )
+        )
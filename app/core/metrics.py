@@ -0,0 +1,262 @@
+"""
+In-process metrics registry rendered in the Prometheus text format.
+
+Each process keeps its samples in memory. When METRICS_MULTIPROC_DIR is
+set, every process also writes its samples to its own JSON file in that
+directory, at most once per METRICS_FLUSH_INTERVAL seconds. The /metrics
+view merges the files so the numbers cover every pre-forked worker. The
+directory should be emptied when the service is (re)started.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _escape(value):
+    """Escape a label value for the text exposition format"""
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\n", "\\n")
+        .replace('"', '\\"')
+    )
+
+
+def _sample_name(name, labels):
+    """Return the sample name with its labels, e.g. name{view="x"}"""
+    if not labels:
+        return name
+    pairs = ",".join(f'{key}="{_escape(value)}"' for key, value in labels)
+    return f"{name}{{{pairs}}}"
+
+
+def _format_value(value):
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+class Counter:
+    """A monotonically increasing value per label set"""
+
+    def __init__(self, registry, name, labelnames):
+        self.registry = registry
+        self.name = name
+        self.labelnames = labelnames
+
+    def inc(self, amount=1, **labels):
+        labels = tuple((key, labels[key]) for key in self.labelnames)
+        self.registry._add(self.name, _sample_name(self.name, labels), amount)
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per label set"""
+
+    def __init__(self, registry, name, labelnames, buckets):
+        self.registry = registry
+        self.name = name
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        labels = tuple((key, labels[key]) for key in self.labelnames)
+        samples = []
+        for bound in self.buckets:
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            samples.append(
+                (
+                    _sample_name(
+                        f"{self.name}_bucket", labels + (("le", le),)
+                    ),
+                    1 if value <= bound else 0,
+                )
+            )
+        samples.append((_sample_name(f"{self.name}_sum", labels), value))
+        samples.append((_sample_name(f"{self.name}_count", labels), 1))
+        self.registry._add_many(self.name, samples)
+
+
+class MetricsRegistry:
+    """Holds metric definitions and the samples of the current process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._definitions = {}
+        self._gauge_callbacks = {}
+        self._reset()
+        atexit.register(self.flush)
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._file_id = f"{self._pid}-{uuid.uuid4().hex[:8]}"
+        self._samples = {}
+        self._last_flush = 0.0
+
+    def counter(self, name, documentation, labelnames=()):
+        """Define and return a counter"""
+        self._definitions[name] = ("counter", documentation)
+        return Counter(self, name, tuple(labelnames))
+
+    def histogram(
+        self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS
+    ):
+        """Define and return a histogram"""
+        self._definitions[name] = ("histogram", documentation)
+        return Histogram(self, name, tuple(labelnames), buckets)
+
+    def gauge_callback(self, name, documentation, func):
+        """Define a gauge whose value is read from func when rendering
+
+        Callback gauges describe shared state, such as a queue in the
+        database, so they are evaluated by the scraped process only.
+        """
+        self._definitions[name] = ("gauge", documentation)
+        self._gauge_callbacks[name] = func
+
+    def _add(self, family, sample, amount):
+        self._add_many(family, ((sample, amount),))
+
+    def _check_fork(self):
+        if self._pid != os.getpid():
+            # Forked worker, the parent reports its own samples
+            self._reset()
+
+    def _add_many(self, family, samples):
+        with self._lock:
+            self._check_fork()
+            values = self._samples.setdefault(family, {})
+            for sample, amount in samples:
+                values[sample] = values.get(sample, 0) + amount
+        self._maybe_flush()
+
+    def _multiproc_dir(self):
+        return getattr(settings, "METRICS_MULTIPROC_DIR", None)
+
+    def _maybe_flush(self):
+        if not self._multiproc_dir():
+            return
+        interval = getattr(settings, "METRICS_FLUSH_INTERVAL", 1.0)
+        if time.monotonic() - self._last_flush >= interval:
+            self.flush()
+
+    def flush(self):
+        """Write this process' samples to the multiprocess directory"""
+        directory = self._multiproc_dir()
+        if not directory:
+            return
+        with self._lock:
+            self._check_fork()
+            self._last_flush = time.monotonic()
+            data = json.dumps(self._samples)
+            path = os.path.join(directory, f"{self._file_id}.json")
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as fh:
+            fh.write(data)
+        os.replace(tmp_path, path)
+
+    def clear_files(self):
+        """Remove the samples every process wrote to the directory"""
+        directory = self._multiproc_dir()
+        if not directory:
+            return 0
+        removed = 0
+        for filename in os.listdir(directory):
+            if filename.endswith((".json", ".tmp")):
+                os.remove(os.path.join(directory, filename))
+                removed += 1
+        return removed
+
+    def _collect(self):
+        """Return the samples of every process, merged per family"""
+        directory = self._multiproc_dir()
+        if not directory:
+            with self._lock:
+                return {
+                    family: dict(values)
+                    for family, values in self._samples.items()
+                }
+
+        self.flush()
+        merged = {}
+        for filename in sorted(os.listdir(directory)):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(directory, filename)) as fh:
+                    samples = json.load(fh)
+            except (OSError, ValueError):
+                continue
+            for family, values in samples.items():
+                target = merged.setdefault(family, {})
+                for sample, value in values.items():
+                    target[sample] = target.get(sample, 0) + value
+        return merged
+
+    def render(self):
+        """Render every metric in the Prometheus text exposition format"""
+        samples = self._collect()
+        for name, func in self._gauge_callbacks.items():
+            samples[name] = {name: func()}
+
+        lines = []
+        for name, (kind, documentation) in self._definitions.items():
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample, value in samples.get(name, {}).items():
+                lines.append(f"{sample} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+requests_total = registry.counter(
+    "api_requests_total",
+    "Requests handled per view action, method and status code.",
+    ("view", "method", "status"),
+)
+request_duration = registry.histogram(
+    "api_request_duration_seconds",
+    "Request latency per view action.",
+    ("view",),
+)
+db_queries_total = registry.counter(
+    "api_db_queries_total",
+    "Database queries run per view action.",
+    ("view",),
+)
+cache_requests_total = registry.counter(
+    "cache_requests_total",
+    "Cache lookups per cache and result (hit or miss); the hit ratio is "
+    "hit / (hit + miss).",
+    ("cache", "result"),
+)
+throttled_requests_total = registry.counter(
+    "throttled_requests_total",
+    "Requests refused by a rate limit, per throttle scope.",
+    ("scope",),
+)
+
+
+def record_cache_lookup(cache, hit):
+    """Count a cache lookup for the cache hit ratio metrics"""
+    cache_requests_total.inc(cache=cache, result="hit" if hit else "miss")
@@ -0,0 +1,289 @@
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.middleware.clickjacking import XFrameOptionsMiddleware
+from django.middleware.csrf import CsrfViewMiddleware
+from django.utils.cache import patch_vary_headers
+
+from core import compression
+from core import metrics as api_metrics
+from core.instrumentation import collect_metrics, current_metrics, view_label
+from core.profiling import ProfilingRules, profile_call
+from core.slow_queries import SlowQueryRecorder
+
+
+logger = logging.getLogger(__name__)
+
+
+def is_api_request(request):
+    """Return True when the request targets a token authenticated API route"""
+    return request.path_info.startswith(settings.API_URL_PREFIX)
+
+
+class ApiExemptMiddleware:
+    """Run the wrapped middleware for every request outside the API prefix
+
+    API views authenticate with tokens and only render JSON, so session,
+    CSRF, messages and clickjacking handling is pure overhead there. The
+    admin and any other non API route still get the full behaviour.
+    """
+
+    middleware_class = None
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.middleware = self.middleware_class(get_response)
+        self._process_view = getattr(self.middleware, "process_view", None)
+
+    def __call__(self, request):
+        if is_api_request(request):
+            return self.get_response(request)
+        return self.middleware(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if self._process_view is None or is_api_request(request):
+            return None
+        return self._process_view(request, view_func, view_args, view_kwargs)
+
+
+class ApiExemptSessionMiddleware(ApiExemptMiddleware):
+    middleware_class = SessionMiddleware
+
+
+class ApiExemptCsrfViewMiddleware(ApiExemptMiddleware):
+    middleware_class = CsrfViewMiddleware
+
+
+class ApiExemptAuthenticationMiddleware(ApiExemptMiddleware):
+    middleware_class = AuthenticationMiddleware
+
+
+class ApiExemptMessageMiddleware(ApiExemptMiddleware):
+    middleware_class = MessageMiddleware
+
+
+class ApiExemptXFrameOptionsMiddleware(ApiExemptMiddleware):
+    middleware_class = XFrameOptionsMiddleware
+
+
+class RequestTimingMiddleware:
+    """Report query counts and timings for a sample of requests
+
+    Sampled requests get a Server-Timing header and a structured log line,
+    and a warning is logged when a view runs more queries than its budget.
+    Requests that are not sampled only pay for one random() call.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.REQUEST_TIMING_SAMPLE_RATE
+        self.budgets = settings.REQUEST_QUERY_BUDGETS
+        self.default_budget = settings.REQUEST_QUERY_BUDGET_DEFAULT
+
+    def __call__(self, request):
+        if not self.sample_rate or random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        with collect_metrics() as metrics:
+            with connection.execute_wrapper(metrics.execute_wrapper):
+                response = self.get_response(request)
+        end = time.perf_counter()
+
+        timings = {
+            "db": metrics.db_time * 1000,
+            "serializer": metrics.serializer_time * 1000,
+            "view": (end - (metrics.view_start or end)) * 1000,
+            "total": (end - start) * 1000,
+        }
+        self._add_server_timing(response, metrics, timings)
+        self._log(request, response, metrics, timings)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = current_metrics()
+        if metrics is not None:
+            metrics.view = view_label(view_func, request.method)
+            metrics.view_start = time.perf_counter()
+
+    def _add_server_timing(self, response, metrics, timings):
+        entries = [
+            f'db;dur={timings["db"]:.2f};desc="{metrics.queries} queries"',
+            f'serializer;dur={timings["serializer"]:.2f}',
+            f'view;dur={timings["view"]:.2f}',
+            f'total;dur={timings["total"]:.2f}',
+        ]
+        if response.has_header("Server-Timing"):
+            entries.insert(0, response["Server-Timing"])
+        response["Server-Timing"] = ", ".join(entries)
+
+    def _log(self, request, response, metrics, timings):
+        fields = {
+            "view": metrics.view,
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "queries": metrics.queries,
+            **{f"{name}_ms": round(ms, 2) for name, ms in timings.items()},
+        }
+        line = " ".join(f"{key}={value}" for key, value in fields.items())
+        logger.info("request %s", line, extra={"request_metrics": fields})
+
+        budget = self.budgets.get(metrics.view, self.default_budget)
+        if budget is not None and metrics.queries > budget:
+            logger.warning(
+                "query budget exceeded view=%s queries=%d budget=%d",
+                metrics.view,
+                metrics.queries,
+                budget,
+                extra={"request_metrics": fields},
+            )
+
+
+class QueryCounter:
+    """Count queries, for connection.execute_wrapper"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    """Record request counts, latency and query counts per view action"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        queries = QueryCounter()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        view = getattr(request, "metrics_view", "unresolved")
+        api_metrics.requests_total.inc(
+            view=view, method=request.method, status=response.status_code
+        )
+        api_metrics.request_duration.observe(duration, view=view)
+        api_metrics.db_queries_total.inc(queries.count, view=view)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics_view = view_label(view_func, request.method)
+
+
+class ProfilingMiddleware:
+    """Profile a sampled fraction of the requests to selected view actions
+
+    Only installed when PROFILING_ENABLED is set. Which views are profiled
+    and how often is controlled by ProfilingRule rows, which only staff
+    can edit in the admin. It should be the last middleware so every other
+    process_view hook still runs for profiled requests.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.rules = ProfilingRules()
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view = view_label(view_func, request.method)
+        rule_id = self.rules.sample(view)
+        if rule_id is None:
+            return None
+
+        def render_view():
+            response = view_func(request, *view_args, **view_kwargs)
+            if callable(getattr(response, "render", None)):
+                response = response.render()
+            return response
+
+        return profile_call(rule_id, view, render_view)
+
+
+class SlowQueryMiddleware:
+    """Capture queries slower than SLOW_QUERY_THRESHOLD_MS
+
+    Slow queries are stored as SlowQuery rows, with the view and query
+    string parameters of the request that ran them, and can be browsed in
+    the admin. Disabled when the threshold is None.
+    """
+
+    def __init__(self, get_response):
+        if settings.SLOW_QUERY_THRESHOLD_MS is None:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.slow_query_recorder = SlowQueryRecorder(request)
+        with connection.execute_wrapper(request.slow_query_recorder):
+            return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.slow_query_recorder.view = view_label(
+            view_func, request.method
+        )
+
+
+class CompressionMiddleware:
+    """Compress responses with the preferred codec the client accepts
+
+    Like GZipMiddleware, but also offers brotli when it is installed and
+    only compresses text and JSON bodies of at least COMPRESSION_MIN_SIZE
+    bytes, where the saved bytes outweigh the CPU cost.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.codecs = compression.available_codecs()
+        self.min_size = settings.COMPRESSION_MIN_SIZE
+        self.content_types = tuple(settings.COMPRESSION_CONTENT_TYPES)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.has_header("Content-Encoding"):
+            return response
+        if not response.get("Content-Type", "").startswith(self.content_types):
+            return response
+        if not response.streaming and len(response.content) < self.min_size:
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        codec = compression.select_codec(
+            self.codecs, request.META.get("HTTP_ACCEPT_ENCODING", "")
+        )
+        if codec is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = codec.compress_stream(
+                response.streaming_content
+            )
+            del response["Content-Length"]
+        else:
+            compressed = codec.compress(response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response["Content-Length"] = str(len(compressed))
+
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        response["Content-Encoding"] = codec.name
+        return response
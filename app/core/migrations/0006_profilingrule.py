@@ -0,0 +1,26 @@
+# Generated by Django 3.2.6 on 2026-10-19 10:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_recipe_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfilingRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('view', models.CharField(help_text='View label, for example RecipeViewSet.list', max_length=255, unique=True)),
+                ('sample_rate', models.FloatField(default=0.01, help_text='Fraction of requests to profile, 0 to 1')),
+                ('enabled', models.BooleanField(default=True)),
+                ('expires_at', models.DateTimeField(blank=True, null=True)),
+                ('max_profiles', models.PositiveIntegerField(default=100)),
+                ('profiles_taken', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
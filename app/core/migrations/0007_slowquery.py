@@ -0,0 +1,30 @@
+# Generated by Django 3.2.6 on 2026-10-19 10:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_profilingrule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(db_index=True, max_length=32)),
+                ('normalized_sql', models.TextField()),
+                ('view', models.CharField(blank=True, max_length=255)),
+                ('filters', models.CharField(blank=True, help_text='Query string parameters of the request, sorted', max_length=255)),
+                ('source', models.CharField(blank=True, max_length=255)),
+                ('duration_ms', models.FloatField()),
+                ('explain', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name_plural': 'slow queries',
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 3.2.6 on 2026-10-19 11:32
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+def prefix_index(model_name, table, field, name):
+    # Django 3.2 puts the opclass of an expression inside its parentheses,
+    # which PostgreSQL rejects, so the index is created with plain SQL.
+    return migrations.RunSQL(
+        f'CREATE INDEX "{name}" ON "{table}" '
+        f'((UPPER("{field}")) text_pattern_ops);',
+        f'DROP INDEX "{name}";',
+        state_operations=[
+            migrations.AddIndex(
+                model_name=model_name,
+                index=models.Index(
+                    django.contrib.postgres.indexes.OpClass(
+                        django.db.models.functions.text.Upper(field),
+                        name='text_pattern_ops',
+                    ),
+                    name=name,
+                ),
+            ),
+        ],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_accountpurge'),
+    ]
+
+    operations = [
+        prefix_index(
+            'ingredient', 'core_ingredient', 'name',
+            'core_ingr_name_prefix_idx',
+        ),
+        prefix_index(
+            'recipe', 'core_recipe', 'title', 'core_recipe_title_prefix_idx',
+        ),
+        prefix_index('tag', 'core_tag', 'name', 'core_tag_name_prefix_idx'),
+        prefix_index(
+            'user', 'core_user', 'email', 'core_user_email_prefix_idx',
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 3.2.6 on 2026-10-19 11:37
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+def fill_arrays(apps, schema_editor):
+    # One statement per range of ids, each committed on its own
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('SELECT MIN(id), MAX(id) FROM core_recipe')
+        low, high = cursor.fetchone()
+        if low is None:
+            return
+        for start in range(low, high + 1, 10000):
+            cursor.execute(
+                'UPDATE core_recipe AS recipe SET '
+                'tag_ids = ARRAY(SELECT tag_id FROM core_recipe_tags '
+                'WHERE recipe_id = recipe.id ORDER BY tag_id), '
+                'ingredient_ids = ARRAY(SELECT ingredient_id '
+                'FROM core_recipe_ingredients '
+                'WHERE recipe_id = recipe.id ORDER BY ingredient_id) '
+                'WHERE recipe.id BETWEEN %s AND %s',
+                [start, start + 9999],
+            )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0009_search_prefix_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredient_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), default=list, editable=False, size=None),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='tag_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), default=list, editable=False, size=None),
+        ),
+        migrations.RunPython(fill_arrays, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['tag_ids'], name='core_recipe_tag_ids_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['ingredient_ids'], name='core_recipe_ingr_ids_gin'),
+        ),
+    ]
@@ -1,12 +1,16 @@
 import uuid
 import os
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
     PermissionsMixin,
 )
 from django.conf import settings
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db.models.functions import Upper
+from django.utils import timezone
 
 
 def recipe_image_file_path(instance, filename):
@@ -47,6 +51,15 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     USERNAME_FIELD = "email"
 
+    class Meta:
+        indexes = [
+            # Serves the case insensitive prefix searches of the admin
+            models.Index(
+                OpClass(Upper("email"), name="text_pattern_ops"),
+                name="core_user_email_prefix_idx",
+            ),
+        ]
+
 
 class Tag(models.Model):
     """Tags for a recipe"""
@@ -56,6 +69,14 @@ class Tag(models.Model):
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                OpClass(Upper("name"), name="text_pattern_ops"),
+                name="core_tag_name_prefix_idx",
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -68,10 +89,64 @@ class Ingredient(models.Model):
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                OpClass(Upper("name"), name="text_pattern_ops"),
+                name="core_ingr_name_prefix_idx",
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
 
+class RecipeManager(models.Manager):
+    def clone(self, recipes):
+        """Copy recipes with their tags and ingredients in bulk
+
+        The copies share the image file of their original. Returns the
+        copies in the order of recipes.
+        """
+        recipes = list(recipes)
+        with transaction.atomic(using=self.db):
+            clones = self.bulk_create(
+                self.model(
+                    user_id=recipe.user_id,
+                    title=recipe.title,
+                    time_minutes=recipe.time_minutes,
+                    price=recipe.price,
+                    link=recipe.link,
+                    image=recipe.image.name,
+                    tag_ids=recipe.tag_ids,
+                    ingredient_ids=recipe.ingredient_ids,
+                )
+                for recipe in recipes
+            )
+            clone_ids = {
+                recipe.pk: clone.pk for recipe, clone in zip(recipes, clones)
+            }
+            for relation in ("tags", "ingredients"):
+                through = getattr(self.model, relation).through
+                column = f"{relation[:-1]}_id"
+                links = through.objects.filter(
+                    recipe_id__in=clone_ids
+                ).values_list("recipe_id", column)
+                through.objects.bulk_create(
+                    through(recipe_id=clone_ids[recipe_id], **{column: pk})
+                    for recipe_id, pk in links
+                )
+            # bulk_create sends no post_save for the change events
+            from core.events import CREATED, notify_many
+
+            owners = {}
+            for clone in clones:
+                owners.setdefault(clone.user_id, []).append(clone.pk)
+            for user_id, pks in owners.items():
+                notify_many(user_id, "recipe", pks, CREATED, self.db)
+        return clones
+
+
 class Recipe(models.Model):
     """Recipe object"""
 
@@ -85,6 +160,156 @@ class Recipe(models.Model):
     ingredients = models.ManyToManyField("Ingredient")
     tags = models.ManyToManyField("Tag")
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    # Sorted copies of the tags and ingredients links for filtering, kept
+    # in sync by core.denormalization
+    tag_ids = ArrayField(
+        models.BigIntegerField(), default=list, editable=False
+    )
+    ingredient_ids = ArrayField(
+        models.BigIntegerField(), default=list, editable=False
+    )
+
+    objects = RecipeManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                OpClass(Upper("title"), name="text_pattern_ops"),
+                name="core_recipe_title_prefix_idx",
+            ),
+            GinIndex(fields=["tag_ids"], name="core_recipe_tag_ids_gin"),
+            GinIndex(
+                fields=["ingredient_ids"], name="core_recipe_ingr_ids_gin"
+            ),
+            # Serve the orderings of the list, forwards and backwards
+            models.Index(
+                fields=["user", "price", "id"], name="core_recipe_user_price"
+            ),
+            models.Index(
+                fields=["user", "time_minutes", "id"],
+                name="core_recipe_user_time",
+            ),
+            models.Index(
+                fields=["user", "title", "id"], name="core_recipe_user_title"
+            ),
+        ]
 
     def __str__(self):
         return self.title
+
+
+class ProfilingRule(models.Model):
+    """Profile a sampled fraction of the requests to one view action"""
+
+    view = models.CharField(
+        max_length=255,
+        unique=True,
+        help_text="View label, for example RecipeViewSet.list",
+    )
+    sample_rate = models.FloatField(
+        default=0.01, help_text="Fraction of requests to profile, 0 to 1"
+    )
+    enabled = models.BooleanField(default=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+    max_profiles = models.PositiveIntegerField(default=100)
+    profiles_taken = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.view
+
+
+class SlowQuery(models.Model):
+    """A query that ran longer than SLOW_QUERY_THRESHOLD_MS"""
+
+    fingerprint = models.CharField(max_length=32, db_index=True)
+    normalized_sql = models.TextField()
+    view = models.CharField(max_length=255, blank=True)
+    filters = models.CharField(
+        max_length=255,
+        blank=True,
+        help_text="Query string parameters of the request, sorted",
+    )
+    source = models.CharField(max_length=255, blank=True)
+    duration_ms = models.FloatField()
+    explain = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name_plural = "slow queries"
+
+    def __str__(self):
+        return f"{self.view} {self.duration_ms:.0f}ms"
+
+
+class AccountPurge(models.Model):
+    """Deletion of a user and their data, run in batches by a task"""
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATES = (
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    )
+
+    # Not a foreign key, the purge outlives the user row
+    user_id = models.BigIntegerField(db_index=True)
+    email = models.EmailField(max_length=255)
+    state = models.CharField(max_length=16, choices=STATES, default=PENDING)
+    deleted = models.JSONField(
+        default=dict, help_text="Rows deleted so far, by table"
+    )
+    files_deleted = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.email} ({self.state})"
+
+
+class Task(models.Model):
+    """Deferred call of a task function, run by the run_worker command"""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    FAILED = "failed"
+    STATES = (
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (FAILED, "Failed"),
+    )
+
+    name = models.CharField(
+        max_length=255, help_text="Dotted path of the task function"
+    )
+    kwargs = models.JSONField(default=dict)
+    state = models.CharField(max_length=16, choices=STATES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    available_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="When a worker may claim the task, including the "
+        "visibility timeout of a running task",
+    )
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Serves the claim query, failed tasks stay out of it
+            models.Index(
+                fields=["available_at"],
+                condition=models.Q(state__in=["queued", "running"]),
+                name="core_task_available_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.state})"
@@ -0,0 +1,277 @@
+"""
+Pagination without exact counts of large tables or deep offsets.
+
+Counting every matching row of a large table takes a scan that grows with
+the table. Above ESTIMATED_COUNT_THRESHOLD rows the planner's estimate is
+close enough to number the pages, so estimated_count() returns the table
+statistics from pg_class for a whole table, and the planner's row estimate
+from EXPLAIN for a filtered queryset. Smaller results are counted exactly.
+
+KeysetPagination pages by the values of the last row instead of an offset,
+so deep pages cost the same as the first one when an index matches the
+ordering.
+"""
+import base64
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+def table_estimate(model, using="default"):
+    """Return the planner's row estimate for a model's table, or None"""
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples FROM pg_class WHERE oid = %s::regclass",
+            [connection.ops.quote_name(model._meta.db_table)],
+        )
+        row = cursor.fetchone()
+    # Tables that were never analyzed have no estimate
+    if row is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+def plan_estimate(queryset):
+    """Return the planner's row estimate for a queryset, or None"""
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def _is_whole_table(queryset):
+    query = queryset.query
+    return not (
+        query.where
+        or query.distinct
+        or query.group_by
+        or query.combinator
+        or query.is_sliced
+    )
+
+
+def estimated_count(queryset, threshold=None):
+    """Return the number of rows of a queryset and whether it is estimated
+
+    The estimate is used when it reaches threshold, which defaults to
+    ESTIMATED_COUNT_THRESHOLD. Otherwise the rows are counted.
+    """
+    if threshold is None:
+        threshold = settings.ESTIMATED_COUNT_THRESHOLD
+    if _is_whole_table(queryset):
+        estimate = table_estimate(queryset.model, queryset.db)
+    else:
+        estimate = plan_estimate(queryset)
+    if estimate is not None and estimate >= threshold:
+        return estimate, True
+    return queryset.count(), False
+
+
+class EstimatedPage(Page):
+    """Page that knows whether rows follow it without a count"""
+
+    def __init__(self, object_list, number, paginator, has_more):
+        super().__init__(object_list, number, paginator)
+        self.has_more = has_more
+
+    def has_next(self):
+        return self.has_more
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that estimates the count of large querysets
+
+    An estimate can be above or below the real count, so it does not bound
+    the page numbers. Pages are read with one more row to tell whether a
+    next page exists, and only a page without rows is out of range.
+    """
+
+    count_is_estimate = False
+
+    @cached_property
+    def count(self):
+        if not hasattr(self.object_list, "query"):
+            return super().count
+        count, self.count_is_estimate = estimated_count(self.object_list)
+        return count
+
+    def validate_number(self, number):
+        if not (self.count and self.count_is_estimate):
+            return super().validate_number(number)
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(_("That page number is not an integer"))
+        if number < 1:
+            raise EmptyPage(_("That page number is less than 1"))
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.count_is_estimate:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page + 1
+        rows = list(self.object_list[bottom:top])
+        if not rows and number > 1:
+            raise EmptyPage(_("That page contains no results"))
+        return EstimatedPage(
+            rows[: self.per_page], number, self, len(rows) > self.per_page
+        )
+
+
+class EstimatedPageNumberPagination(PageNumberPagination):
+    """Opt-in page number pagination with estimated counts
+
+    Lists are only paginated when the page parameter is given, so clients
+    that read plain arrays keep working. Responses say whether the count
+    is an estimate in count_is_estimate.
+    """
+
+    django_paginator_class = EstimatedCountPaginator
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.page_query_param not in request.query_params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ("count", self.page.paginator.count),
+                    (
+                        "count_is_estimate",
+                        self.page.paginator.count_is_estimate,
+                    ),
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+
+class KeysetPagination(BasePagination):
+    """Opt-in keyset pagination over the ordering of the queryset
+
+    Lists are only paginated when the cursor parameter is given, empty for
+    the first page. Each page links to the next one with an opaque cursor
+    holding the ordering values of its last row. The ordering must end
+    with a unique field, and the rows must have the ordering fields loaded.
+    """
+
+    cursor_query_param = "cursor"
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+    invalid_cursor_message = "Invalid cursor"
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size < 1:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def decode_cursor(self, request):
+        """Return the values of the last row of the previous page, or None"""
+        cursor = request.query_params[self.cursor_query_param]
+        if not cursor:
+            return None
+        try:
+            return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
+    def convert_position(self, model, position):
+        """Return the cursor values converted by the ordering fields"""
+        if not isinstance(position, list) or len(position) != len(
+            self.ordering
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            return [
+                model._meta.get_field(field.lstrip("-")).to_python(value)
+                for field, value in zip(self.ordering, position)
+            ]
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, values):
+        data = json.dumps([str(value) for value in values])
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    def seek(self, ordering, position):
+        """Return a filter for the rows after position in ordering"""
+        condition = None
+        for index in reversed(range(len(ordering))):
+            field = ordering[index].lstrip("-")
+            lookup = "lt" if ordering[index].startswith("-") else "gt"
+            after = Q(**{f"{field}__{lookup}": position[index]})
+            if condition is not None:
+                after |= Q(**{field: position[index]}) & condition
+            condition = after
+        # The first field bounds an index range scan
+        field = ordering[0].lstrip("-")
+        lookup = "lte" if ordering[0].startswith("-") else "gte"
+        return Q(**{f"{field}__{lookup}": position[0]}) & condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param not in request.query_params:
+            return None
+        self.request = request
+        self.ordering = list(queryset.query.order_by)
+        position = self.decode_cursor(request)
+        if position is not None:
+            position = self.convert_position(queryset.model, position)
+            queryset = queryset.filter(self.seek(self.ordering, position))
+
+        page_size = self.get_page_size(request)
+        rows = list(queryset[: page_size + 1])
+        self.has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        self.last = rows[-1] if rows else None
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        values = [
+            getattr(self.last, field.lstrip("-")) for field in self.ordering
+        ]
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(values),
+        )
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict([("next", self.get_next_link()), ("results", data)])
+        )
@@ -0,0 +1,67 @@
+import cProfile
+import os
+import random
+import time
+import uuid
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core.models import ProfilingRule
+
+
+class ProfilingRules:
+    """In-process cache of the active profiling rules
+
+    The rules are reloaded from the database at most once every
+    PROFILING_RULES_REFRESH seconds, so they can be changed at runtime
+    from the admin or the profile_endpoint command without a redeploy.
+    """
+
+    def __init__(self):
+        self._rules = {}
+        self._loaded_at = None
+
+    def _load(self):
+        now = timezone.now()
+        active = ProfilingRule.objects.filter(
+            Q(expires_at__isnull=True) | Q(expires_at__gt=now),
+            enabled=True,
+            profiles_taken__lt=F("max_profiles"),
+        )
+        self._rules = {
+            rule.view: (rule.pk, rule.sample_rate)
+            for rule in active.only("pk", "view", "sample_rate")
+        }
+        self._loaded_at = time.monotonic()
+
+    def sample(self, view):
+        """Return the id of the rule if this request to view is sampled"""
+        if (
+            self._loaded_at is None
+            or time.monotonic() - self._loaded_at
+            > settings.PROFILING_RULES_REFRESH
+        ):
+            self._load()
+        rule = self._rules.get(view)
+        if rule is None or random.random() >= rule[1]:
+            return None
+        return rule[0]
+
+
+def profile_call(rule_id, view, func, *args, **kwargs):
+    """Run func under cProfile and store the stats as a pstats file"""
+    profiler = cProfile.Profile()
+    result = profiler.runcall(func, *args, **kwargs)
+
+    directory = os.path.join(settings.PROFILING_DIR, view)
+    os.makedirs(directory, exist_ok=True)
+    timestamp = timezone.now().strftime("%Y%m%dT%H%M%S")
+    profiler.dump_stats(
+        os.path.join(directory, f"{timestamp}-{uuid.uuid4().hex[:8]}.prof")
+    )
+    ProfilingRule.objects.filter(pk=rule_id).update(
+        profiles_taken=F("profiles_taken") + 1
+    )
+    return result
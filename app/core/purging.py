@@ -0,0 +1,197 @@
+"""
+Batched deletion of user accounts.
+
+Deleting a user through the ORM loads every related row into memory and
+removes them all in one long transaction. A purge instead deactivates the
+user and revokes their tokens at once. It then deletes their recipes, tags
+and ingredients with set based DELETE statements, a bounded batch per
+transaction, and records its progress on an AccountPurge row. A purge that
+stops half way can be run again and carries on with the rows that are left.
+Scheduling a purge queues purge_account, which runs it on a task worker
+and retries it until it finishes. A purger holds a PostgreSQL advisory lock
+on its purge while it runs, so a task claimed again after its visibility
+timeout, or the purge_accounts command, skips a purge that is running.
+"""
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from core.models import AccountPurge, Ingredient, Recipe, Tag
+from core.taskqueue import task
+
+
+# First key of the advisory locks on purges, the purge id is the second
+LOCK_NAMESPACE = 1
+
+
+def schedule_purge(user):
+    """Deactivate a user, revoke their tokens and queue their purge"""
+    with transaction.atomic():
+        get_user_model().objects.filter(pk=user.pk).update(is_active=False)
+        Token.objects.filter(user_id=user.pk).delete()
+        purge = AccountPurge.objects.filter(
+            user_id=user.pk, finished_at__isnull=True
+        ).first()
+        if purge is None:
+            purge = AccountPurge.objects.create(
+                user_id=user.pk, email=user.email
+            )
+        purge_account.enqueue(purge_id=purge.pk)
+    return purge
+
+
+def pending_purges():
+    """Return the purges that have not finished, oldest first"""
+    return AccountPurge.objects.filter(finished_at__isnull=True).order_by("id")
+
+
+def _delete_rows(model, column, values):
+    """Delete the rows of a model's table whose column is in values"""
+    quote = connection.ops.quote_name
+    placeholders = ", ".join(["%s"] * len(values))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {quote(model._meta.db_table)} "
+            f"WHERE {quote(column)} IN ({placeholders})",
+            list(values),
+        )
+        return cursor.rowcount
+
+
+class AccountPurger:
+    """Delete the data of an AccountPurge's user in batches
+
+    Image files are deleted just before the batch of recipes using them,
+    unless a recipe outside the batch shares the file, so a crash can leave
+    recipes without their image but never leaks files.
+    """
+
+    def __init__(self, purge, batch_size=1000, progress=None):
+        self.purge = purge
+        self.batch_size = batch_size
+        self.progress = progress
+        self.storage = Recipe._meta.get_field("image").storage
+
+    def run(self):
+        """Purge the user and return the finished AccountPurge
+
+        Returns None without purging when another purger holds the purge.
+        """
+        if not self._lock("pg_try_advisory_lock"):
+            return None
+        try:
+            self.purge.refresh_from_db()
+            if self.purge.finished_at is not None:
+                return self.purge
+            return self._run()
+        finally:
+            self._lock("pg_advisory_unlock")
+
+    def _lock(self, function):
+        if connection.vendor != "postgresql":
+            return True
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT {function}(%s, %s)", [LOCK_NAMESPACE, self.purge.pk]
+            )
+            return cursor.fetchone()[0]
+
+    def _run(self):
+        self._save(state=AccountPurge.RUNNING, error="")
+        try:
+            self._purge_recipes()
+            self._purge_owned(Tag, Recipe.tags.through, "tag_id")
+            self._purge_owned(
+                Ingredient, Recipe.ingredients.through, "ingredient_id"
+            )
+            # Only small tables are left, and the collector also catches
+            # rows created by requests that raced the deactivation
+            with transaction.atomic():
+                _, deleted = (
+                    get_user_model()
+                    .objects.filter(pk=self.purge.user_id)
+                    .delete()
+                )
+                self._record(deleted)
+        except Exception as exc:
+            self._save(state=AccountPurge.FAILED, error=repr(exc))
+            raise
+        self._save(state=AccountPurge.DONE, finished_at=timezone.now())
+        return self.purge
+
+    def _save(self, **fields):
+        for name, value in fields.items():
+            setattr(self.purge, name, value)
+        self.purge.save(update_fields=[*fields, "updated_at"])
+
+    def _record(self, counts, files=0):
+        """Add deleted rows to the purge, inside the batch's transaction"""
+        deleted = self.purge.deleted
+        for label, count in counts.items():
+            deleted[label] = deleted.get(label, 0) + count
+        self._save(
+            deleted=deleted, files_deleted=self.purge.files_deleted + files
+        )
+        if self.progress:
+            for label in counts:
+                self.progress(label, deleted[label])
+
+    def _next_batch(self, queryset, *fields):
+        rows = queryset.order_by("id").values_list("id", *fields)
+        return list(rows[: self.batch_size])
+
+    def _delete_batch(self, model, ids, links):
+        """Delete rows of model and their links as {through: column}"""
+        counts = {
+            through._meta.label: _delete_rows(through, column, ids)
+            for through, column in links.items()
+        }
+        counts[model._meta.label] = _delete_rows(model, "id", ids)
+        return counts
+
+    def _purge_recipes(self):
+        recipes = Recipe.objects.filter(user_id=self.purge.user_id)
+        while True:
+            with transaction.atomic():
+                rows = self._next_batch(recipes, "image")
+                if not rows:
+                    return
+                ids = [pk for pk, _ in rows]
+                images = {image for _, image in rows if image}
+                shared = (
+                    Recipe.objects.filter(image__in=images)
+                    .exclude(id__in=ids)
+                    .values_list("image", flat=True)
+                )
+                images.difference_update(shared)
+                for image in images:
+                    self.storage.delete(image)
+                counts = self._delete_batch(
+                    Recipe,
+                    ids,
+                    {
+                        Recipe.tags.through: "recipe_id",
+                        Recipe.ingredients.through: "recipe_id",
+                    },
+                )
+                self._record(counts, files=len(images))
+
+    def _purge_owned(self, model, through, column):
+        objects = model.objects.filter(user_id=self.purge.user_id)
+        while True:
+            with transaction.atomic():
+                ids = [pk for pk, in self._next_batch(objects)]
+                if not ids:
+                    return
+                self._record(self._delete_batch(model, ids, {through: column}))
+
+
+@task()
+def purge_account(purge_id):
+    """Run an account purge unless it already finished"""
+    purge = AccountPurge.objects.filter(
+        pk=purge_id, finished_at__isnull=True
+    ).first()
+    if purge is not None:
+        AccountPurger(purge).run()
@@ -0,0 +1,380 @@
+"""
+Synthetic dataset generation for load and scale testing.
+
+Rows are generated from a seeded random.Random so runs are reproducible,
+with Zipf-like skew for user activity and tag/ingredient popularity. They
+are written in batches with COPY on PostgreSQL and bulk_create elsewhere.
+"""
+import bisect
+import io
+import itertools
+import random
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, models
+
+from core.models import Ingredient, Recipe, Tag
+
+
+SEED_EMAIL = "seed{index}@example.com"
+SEED_PASSWORD = "seedpass123"
+
+TAG_NAMES = (
+    "Vegan",
+    "Vegetarian",
+    "Dessert",
+    "Breakfast",
+    "Quick",
+    "Gluten free",
+    "Main course",
+    "Side",
+    "Soup",
+    "Salad",
+    "Spicy",
+    "Healthy",
+    "Comfort food",
+    "Baking",
+    "Party",
+    "Budget",
+    "Seafood",
+    "Kids",
+    "Holiday",
+    "Slow cooker",
+    "Grill",
+    "Low carb",
+    "High protein",
+    "Snack",
+    "Drinks",
+)
+INGREDIENT_NAMES = (
+    "Salt",
+    "Olive oil",
+    "Garlic",
+    "Onion",
+    "Butter",
+    "Sugar",
+    "Flour",
+    "Eggs",
+    "Milk",
+    "Black pepper",
+    "Tomato",
+    "Lemon",
+    "Chicken",
+    "Rice",
+    "Ginger",
+    "Cinnamon",
+    "Basil",
+    "Parmesan",
+    "Potato",
+    "Carrot",
+    "Chili",
+    "Coconut milk",
+    "Beef",
+    "Prawns",
+    "Spinach",
+    "Mushrooms",
+    "Feta cheese",
+    "Chickpeas",
+    "Avocado",
+    "Honey",
+    "Soy sauce",
+    "Yoghurt",
+    "Oats",
+    "Lime",
+    "Paprika",
+    "Cumin",
+    "Tofu",
+    "Pasta",
+    "Bread",
+    "Cream",
+)
+TITLE_ADJECTIVES = (
+    "Classic",
+    "Spicy",
+    "Creamy",
+    "Roasted",
+    "Grilled",
+    "Quick",
+    "Crispy",
+    "Smoky",
+    "Fresh",
+    "Slow cooked",
+    "Homemade",
+    "Zesty",
+)
+TITLE_DISHES = (
+    "curry",
+    "cheesecake",
+    "risotto",
+    "stir fry",
+    "pasta bake",
+    "salad",
+    "soup",
+    "tacos",
+    "pancakes",
+    "stew",
+    "burger",
+    "noodles",
+    "pie",
+    "omelette",
+    "flatbread",
+)
+
+
+def zipf_cum_weights(count, exponent=1.1):
+    """Return cumulative Zipf weights for ranks 1..count"""
+    return list(
+        itertools.accumulate(
+            1 / pow(rank, exponent) for rank in range(1, count + 1)
+        )
+    )
+
+
+def next_id(model):
+    """Return the first free primary key of model"""
+    latest = model.objects.aggregate(latest=models.Max("pk"))["latest"]
+    return (latest or 0) + 1
+
+
+class CopyWriter:
+    """Write rows with PostgreSQL COPY"""
+
+    def write(self, model, columns, rows):
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write("\t".join(self._format(value) for value in row))
+            buffer.write("\n")
+        buffer.seek(0)
+        quote = connection.ops.quote_name
+        sql = "COPY {} ({}) FROM STDIN".format(
+            quote(model._meta.db_table),
+            ", ".join(quote(column) for column in columns),
+        )
+        with connection.cursor() as cursor:
+            cursor.copy_expert(sql, buffer)
+
+    def _format(self, value):
+        if value is None:
+            return "\\N"
+        if value is True:
+            return "t"
+        if value is False:
+            return "f"
+        if isinstance(value, list):
+            return "{" + ",".join(str(item) for item in value) + "}"
+        return str(value)
+
+
+class BulkCreateWriter:
+    """Write rows with bulk_create, for databases without COPY"""
+
+    def write(self, model, columns, rows):
+        model.objects.bulk_create(
+            (model(**dict(zip(columns, row))) for row in rows),
+            batch_size=1000,
+        )
+
+
+class DatasetSeeder:
+    """Generate users, tags, ingredients and recipes with their links"""
+
+    def __init__(
+        self,
+        recipes,
+        users,
+        tags_per_user=20,
+        ingredients_per_user=50,
+        seed=0,
+        batch_size=50000,
+        password=SEED_PASSWORD,
+    ):
+        self.recipes = recipes
+        self.users = users
+        self.tags_per_user = tags_per_user
+        self.ingredients_per_user = ingredients_per_user
+        self.batch_size = batch_size
+        self.password = password
+        self.rng = random.Random(seed)
+        if connection.vendor == "postgresql":
+            self.writer = CopyWriter()
+        else:
+            self.writer = BulkCreateWriter()
+
+    def run(self, progress=None):
+        """Write the whole dataset, calling progress(table, done, total)"""
+        progress = progress or (lambda table, done, total: None)
+        user_model = get_user_model()
+        self.first_user = next_id(user_model)
+        self.first_tag = next_id(Tag)
+        self.first_ingredient = next_id(Ingredient)
+        first_recipe = next_id(Recipe)
+
+        self._write_users(user_model, progress)
+        self._write_names(
+            Tag, self.first_tag, self.tags_per_user, TAG_NAMES, progress
+        )
+        self._write_names(
+            Ingredient,
+            self.first_ingredient,
+            self.ingredients_per_user,
+            INGREDIENT_NAMES,
+            progress,
+        )
+        self._write_recipes(first_recipe, progress)
+        self._reset_sequences(user_model)
+
+    def _batches(self, rows):
+        iterator = iter(rows)
+        while True:
+            batch = list(itertools.islice(iterator, self.batch_size))
+            if not batch:
+                return
+            yield batch
+
+    def _write_users(self, user_model, progress):
+        password = make_password(self.password)
+        rows = (
+            (
+                self.first_user + index,
+                SEED_EMAIL.format(index=self.first_user + index),
+                f"Seed user {self.first_user + index}",
+                password,
+                True,
+                False,
+                False,
+            )
+            for index in range(self.users)
+        )
+        columns = (
+            "id",
+            "email",
+            "name",
+            "password",
+            "is_active",
+            "is_staff",
+            "is_superuser",
+        )
+        done = 0
+        for batch in self._batches(rows):
+            self.writer.write(user_model, columns, batch)
+            done += len(batch)
+            progress(user_model._meta.db_table, done, self.users)
+
+    def _write_names(self, model, first_id, per_user, vocabulary, progress):
+        """Give every user per_user names, roughly in popularity order
+
+        Recipes link to a user's names with Zipf weights by position, so
+        names near the start of the vocabulary are popular across users.
+        """
+        total = self.users * per_user
+        names = [
+            name if cycle == 0 else f"{name} {cycle + 1}"
+            for cycle in range(per_user // len(vocabulary) + 1)
+            for name in vocabulary
+        ][:per_user]
+
+        def rows():
+            for user in range(self.users):
+                ranked = sorted(
+                    range(per_user),
+                    key=lambda rank: rank + self.rng.random() * 3,
+                )
+                for position, rank in enumerate(ranked):
+                    yield (
+                        first_id + user * per_user + position,
+                        names[rank],
+                        self.first_user + user,
+                    )
+
+        done = 0
+        for batch in self._batches(rows()):
+            self.writer.write(model, ("id", "name", "user_id"), batch)
+            done += len(batch)
+            progress(model._meta.db_table, done, total)
+
+    def _write_recipes(self, first_id, progress):
+        rng = self.rng
+        user_weights = zipf_cum_weights(self.users, exponent=0.8)
+        user_total = user_weights[-1]
+        tag_weights = zipf_cum_weights(self.tags_per_user)
+        ingredient_weights = zipf_cum_weights(self.ingredients_per_user)
+        tag_ranks = range(self.tags_per_user)
+        ingredient_ranks = range(self.ingredients_per_user)
+        tag_links = Recipe.tags.through
+        ingredient_links = Recipe.ingredients.through
+
+        done = 0
+        while done < self.recipes:
+            count = min(self.batch_size, self.recipes - done)
+            recipes, tags, ingredients = [], [], []
+            for recipe_id in range(first_id + done, first_id + done + count):
+                user = bisect.bisect(user_weights, rng.random() * user_total)
+                user = min(user, self.users - 1)
+                recipe = [
+                    recipe_id,
+                    self.first_user + user,
+                    f"{rng.choice(TITLE_ADJECTIVES)} "
+                    f"{rng.choice(TITLE_DISHES)} {recipe_id}",
+                    max(1, min(600, int(rng.lognormvariate(3.2, 0.7)))),
+                    f"{min(999.99, rng.lognormvariate(2.0, 0.8)):.2f}",
+                    "",
+                ]
+                tag_base = self.first_tag + user * self.tags_per_user
+                tag_ids = sorted(
+                    tag_base + rank
+                    for rank in set(
+                        rng.choices(
+                            tag_ranks,
+                            cum_weights=tag_weights,
+                            k=rng.randint(0, 4),
+                        )
+                    )
+                )
+                ingredient_base = (
+                    self.first_ingredient + user * self.ingredients_per_user
+                )
+                ingredient_ids = sorted(
+                    ingredient_base + rank
+                    for rank in set(
+                        rng.choices(
+                            ingredient_ranks,
+                            cum_weights=ingredient_weights,
+                            k=rng.randint(2, 10),
+                        )
+                    )
+                )
+                recipes.append((*recipe, tag_ids, ingredient_ids))
+                tags.extend((recipe_id, pk) for pk in tag_ids)
+                ingredients.extend((recipe_id, pk) for pk in ingredient_ids)
+
+            self.writer.write(
+                Recipe,
+                (
+                    "id",
+                    "user_id",
+                    "title",
+                    "time_minutes",
+                    "price",
+                    "link",
+                    "tag_ids",
+                    "ingredient_ids",
+                ),
+                recipes,
+            )
+            self.writer.write(tag_links, ("recipe_id", "tag_id"), tags)
+            self.writer.write(
+                ingredient_links, ("recipe_id", "ingredient_id"), ingredients
+            )
+            done += count
+            progress(Recipe._meta.db_table, done, self.recipes)
+
+    def _reset_sequences(self, user_model):
+        """Move the id sequences past the explicitly inserted ids"""
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [user_model, Tag, Ingredient, Recipe]
+        )
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
@@ -0,0 +1,141 @@
+import hashlib
+import logging
+import os
+import random
+import re
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+from core.models import SlowQuery
+
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slowquery")
+_pending = threading.BoundedSemaphore(100)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_PLACEHOLDER_LIST_RE = re.compile(r"\((?:%s,\s*)+%s\)")
+_NUMBER_RE = re.compile(r"\b\d+\b")
+
+
+def normalize_sql(sql):
+    """Return sql with literals and placeholder lists collapsed"""
+    sql = _WHITESPACE_RE.sub(" ", sql).strip()
+    sql = _PLACEHOLDER_LIST_RE.sub("(...)", sql)
+    return _NUMBER_RE.sub("?", sql)
+
+
+_CORE_DIR = os.path.dirname(os.path.abspath(__file__))
+_INSTRUMENTATION_FILES = {
+    os.path.join(_CORE_DIR, name)
+    for name in ("slow_queries.py", "middleware.py", "instrumentation.py")
+}
+
+
+def query_source():
+    """Return the innermost frame of project code that ran the query"""
+    base_dir = str(settings.BASE_DIR)
+    for frame in reversed(traceback.extract_stack()):
+        filename = os.path.abspath(frame.filename)
+        if (
+            filename.startswith(base_dir)
+            and filename not in _INSTRUMENTATION_FILES
+            and "site-packages" not in filename
+        ):
+            path = os.path.relpath(filename, base_dir)
+            return f"{path}:{frame.lineno} in {frame.name}"
+    return ""
+
+
+def explain(sql, params):
+    """Return the EXPLAIN (ANALYZE, BUFFERS) plan of a SELECT statement
+
+    ANALYZE runs the statement again, so it runs in a transaction or
+    savepoint that is always rolled back: NOTIFYs it sends are dropped
+    and the row and advisory locks it takes are released.
+    """
+    if connection.vendor != "postgresql":
+        return ""
+    if not sql.lstrip().upper().startswith("SELECT"):
+        return ""
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {sql}", params)
+        plan = "\n".join(row[0] for row in cursor.fetchall())
+        transaction.set_rollback(True)
+    return plan
+
+
+def record_slow_query(sql, params, duration_ms, view, filters, source):
+    """Store a slow query, with its plan for a sample of them"""
+    plan = ""
+    if random.random() < settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE:
+        try:
+            plan = explain(sql, params)
+        except Exception:
+            logger.exception("Could not explain slow query")
+    normalized = normalize_sql(sql)
+    SlowQuery.objects.create(
+        fingerprint=hashlib.md5(normalized.encode()).hexdigest(),
+        normalized_sql=normalized,
+        view=view or "",
+        filters=filters[:255],
+        source=source[:255],
+        duration_ms=duration_ms,
+        explain=plan,
+    )
+
+
+def _record_in_background(*args):
+    close_old_connections()
+    try:
+        record_slow_query(*args)
+    except Exception:
+        logger.exception("Could not record slow query")
+    finally:
+        close_old_connections()
+        _pending.release()
+
+
+class SlowQueryRecorder:
+    """Record queries slower than the threshold, for execute_wrapper
+
+    Recording and EXPLAIN run on a background thread with its own
+    database connection so the request is not slowed down further. When
+    the background queue is full, slow queries are dropped.
+    """
+
+    def __init__(self, request):
+        self.threshold = settings.SLOW_QUERY_THRESHOLD_MS / 1000
+        self.filters = ",".join(sorted(request.GET.keys()))
+        self.view = None
+        self._recording = False
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            if duration >= self.threshold and not many:
+                self._record(sql, params, duration * 1000)
+
+    def _record(self, sql, params, duration_ms):
+        if self._recording:
+            return
+        args = (sql, params, duration_ms, self.view, self.filters)
+        if not settings.SLOW_QUERY_ASYNC:
+            self._recording = True
+            try:
+                record_slow_query(*args, query_source())
+            finally:
+                self._recording = False
+            return
+        if not _pending.acquire(blocking=False):
+            return
+        _executor.submit(_record_in_background, *args, query_source())
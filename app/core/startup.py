@@ -0,0 +1,99 @@
+"""
+Fast service start.
+
+Running migrate on every start imports every migration module and builds
+the migration graph just to find out there is nothing to do. The startup
+command instead compares the names of the migration files on disk with
+the django_migrations table, one query without importing any migration,
+and only runs migrate when a file is not applied yet.
+
+warm_up() then imports the URLconf, which pulls in every view, serializer
+and model, and compiles the URL patterns, so the first request does not
+pay for them. The WSGI and ASGI entry points call it when STARTUP_WARM_UP
+is on. It does not open a database connection: connections belong to the
+thread that opens them, requests run on other threads, and a connection
+opened before a server forks its workers must not be shared by them.
+"""
+import hashlib
+import importlib.util
+import os
+import time
+
+from django.apps import apps
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.utils import OperationalError
+from django.urls import get_resolver
+
+
+def wait_for_database(timeout=60, interval=1, using=DEFAULT_DB_ALIAS):
+    """Connect to the database, retrying until timeout seconds passed"""
+    connection = connections[using]
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            connection.ensure_connection()
+            return
+        except OperationalError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(interval)
+
+
+def migration_files():
+    """Return the (app label, name) of every migration file on disk"""
+    names = set()
+    for config in apps.get_app_configs():
+        module_name, _ = MigrationLoader.migrations_module(config.label)
+        if module_name is None:
+            continue
+        try:
+            # Finds the package without running its __init__
+            spec = importlib.util.find_spec(module_name)
+        except ModuleNotFoundError:
+            continue
+        if spec is None or not spec.submodule_search_locations:
+            continue
+        for directory in spec.submodule_search_locations:
+            for filename in os.listdir(directory):
+                name, extension = os.path.splitext(filename)
+                # The same names MigrationLoader skips
+                if extension == ".py" and name[0] not in "_~":
+                    names.add((config.label, name))
+    return names
+
+
+def fingerprint(names):
+    """Return a short hash identifying a set of migrations"""
+    data = "\n".join(f"{app}.{name}" for app, name in sorted(names))
+    return hashlib.sha256(data.encode()).hexdigest()[:12]
+
+
+def pending_migrations(using=DEFAULT_DB_ALIAS):
+    """Return the migration files not recorded as applied in the database
+
+    Files that were squashed or replaced still count as pending until the
+    squashed migration is recorded, which only makes migrate run once
+    more. Migration packages shipped without .py sources are not seen.
+    """
+    recorder = MigrationRecorder(connections[using])
+    files = migration_files()
+    if not recorder.has_table():
+        return files
+    return files - set(recorder.applied_migrations())
+
+
+def warm_up():
+    """Import and compile what the first request needs, return timings"""
+    timings = {}
+    start = time.perf_counter()
+    resolver = get_resolver()
+    # Reading reverse_dict imports every view and compiles the patterns
+    resolver.reverse_dict
+    for config in apps.get_app_configs():
+        module_name = f"{config.name}.serializers"
+        if importlib.util.find_spec(module_name) is not None:
+            importlib.import_module(module_name)
+    timings["imports_s"] = time.perf_counter() - start
+    return timings
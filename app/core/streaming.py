@@ -0,0 +1,50 @@
+"""Streaming JSON list responses for very large, unpaginated lists"""
+from django.http import StreamingHttpResponse
+
+from core.renderers import FastJSONRenderer
+
+
+def stream_json_array(chunks, renderer=None):
+    """Yield a JSON array as bytes from an iterable of lists of items
+
+    The output is the same as rendering the concatenated lists at once,
+    but only one chunk is held in memory at a time.
+    """
+    renderer = renderer or FastJSONRenderer()
+    yield b"["
+    first = True
+    for chunk in chunks:
+        if not chunk:
+            continue
+        body = renderer.render(chunk)[1:-1]
+        yield body if first else b"," + body
+        first = False
+    yield b"]"
+
+
+class StreamingListMixin:
+    """Stream the list action as a JSON array when ?stream=1 is given
+
+    Meant for internal sync clients that read whole collections. The
+    serializer must be a read serializer whose child has iter_chunks,
+    which reads the queryset in chunks of stream_chunk_size rows. Queries
+    run while the response is sent, after the middleware has returned, so
+    they do not show up in the request metrics.
+    """
+
+    stream_param = "stream"
+    stream_chunk_size = 1000
+
+    def streaming_requested(self):
+        value = self.request.query_params.get(self.stream_param, "")
+        return value.lower() in ("1", "true")
+
+    def list(self, request, *args, **kwargs):
+        if not self.streaming_requested():
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = self.get_serializer(queryset, many=True)
+        chunks = serializer.child.iter_chunks(queryset, self.stream_chunk_size)
+        return StreamingHttpResponse(
+            stream_json_array(chunks), content_type="application/json"
+        )
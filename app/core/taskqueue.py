@@ -0,0 +1,233 @@
+"""
+Background tasks queued in PostgreSQL.
+
+Functions decorated with @task can be queued with func.enqueue(**kwargs),
+which inserts a Task row, in the caller's transaction if there is one. The
+run_worker command claims queued tasks with SELECT ... FOR UPDATE SKIP
+LOCKED, so any number of workers share the queue without a broker and
+without handing the same task to two of them.
+
+A claimed task is hidden from other workers for TASK_VISIBILITY_TIMEOUT
+seconds. If its worker dies, the task becomes visible again and is retried.
+A task that raises is retried after an exponential backoff until it used
+its attempts, then it stays in the table as failed. Tasks may run more
+than once, so they should be idempotent. Finished tasks are deleted.
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from core import metrics
+from core.models import Task
+
+
+logger = logging.getLogger(__name__)
+
+task_runs_total = metrics.registry.counter(
+    "task_runs_total",
+    "Task attempts per task and result (done, retry or failed).",
+    ("task", "result"),
+)
+task_duration = metrics.registry.histogram(
+    "task_duration_seconds",
+    "Task run time per task.",
+    ("task",),
+)
+
+
+def queue_depth():
+    """Return the number of tasks waiting for or held by a worker"""
+    return Task.objects.filter(state__in=(Task.QUEUED, Task.RUNNING)).count()
+
+
+metrics.registry.gauge_callback(
+    "task_queue_depth",
+    "Tasks queued or running, including retries waiting for their backoff.",
+    queue_depth,
+)
+
+
+class TaskFunction:
+    """A function that can be queued to run on a worker"""
+
+    def __init__(self, func, max_attempts=None):
+        self.func = func
+        self.name = f"{func.__module__}.{func.__qualname__}"
+        self.max_attempts = max_attempts
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def enqueue(self, delay=0, **kwargs):
+        """Queue a call with JSON serializable kwargs in delay seconds"""
+        return Task.objects.create(
+            name=self.name,
+            kwargs=kwargs,
+            max_attempts=self.max_attempts or settings.TASK_MAX_ATTEMPTS,
+            available_at=timezone.now() + timedelta(seconds=delay),
+        )
+
+
+def task(max_attempts=None):
+    """Decorator turning a module level function into a TaskFunction"""
+
+    def decorator(func):
+        return TaskFunction(func, max_attempts)
+
+    return decorator
+
+
+def retry_delay(attempts):
+    """Return the backoff in seconds before retrying a failed attempt"""
+    delay = settings.TASK_RETRY_BACKOFF * 2 ** (attempts - 1)
+    return min(delay, settings.TASK_RETRY_BACKOFF_MAX)
+
+
+class Worker:
+    """Claim and run queued tasks on concurrency threads
+
+    With burst, the threads stop when the queue has no task ready instead
+    of polling it every poll_interval seconds.
+    """
+
+    def __init__(
+        self,
+        concurrency=None,
+        visibility_timeout=None,
+        poll_interval=None,
+        burst=False,
+    ):
+        self.concurrency = concurrency or settings.TASK_WORKER_CONCURRENCY
+        self.visibility_timeout = timedelta(
+            seconds=visibility_timeout or settings.TASK_VISIBILITY_TIMEOUT
+        )
+        self.poll_interval = poll_interval or settings.TASK_POLL_INTERVAL
+        self.burst = burst
+        self.stopping = threading.Event()
+        self.processed = 0
+        self._lock = threading.Lock()
+
+    def stop(self):
+        """Stop claiming tasks, the running ones are finished first"""
+        self.stopping.set()
+
+    def run(self):
+        """Process tasks until stopped, return the number processed"""
+        if self.concurrency == 1:
+            self._loop()
+            return self.processed
+        threads = [
+            threading.Thread(target=self._thread, name=f"worker-{number}")
+            for number in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self.processed
+
+    def _thread(self):
+        try:
+            self._loop()
+        finally:
+            connection.close()
+
+    def _loop(self):
+        while not self.stopping.is_set():
+            try:
+                task = self.claim()
+            except DatabaseError:
+                # The database restarted, or is not migrated yet
+                logger.exception("Could not claim a task")
+                task = None
+            if task is None:
+                if self.burst:
+                    return
+                self.stopping.wait(self.poll_interval)
+                continue
+            self.execute(task)
+            with self._lock:
+                self.processed += 1
+
+    def claim(self):
+        """Lock the next ready task, hide it from other workers, return it"""
+        while True:
+            with transaction.atomic():
+                now = timezone.now()
+                task = (
+                    Task.objects.select_for_update(skip_locked=True)
+                    .filter(
+                        state__in=(Task.QUEUED, Task.RUNNING),
+                        available_at__lte=now,
+                    )
+                    .order_by("available_at")
+                    .first()
+                )
+                if task is None:
+                    return None
+                if task.attempts >= task.max_attempts:
+                    # Its last worker died past the visibility timeout
+                    task.state = Task.FAILED
+                    task.error = task.error or "Visibility timeout expired"
+                    task.save(update_fields=["state", "error", "updated_at"])
+                    task_runs_total.inc(task=task.name, result="failed")
+                    continue
+                task.state = Task.RUNNING
+                task.attempts += 1
+                task.available_at = now + self.visibility_timeout
+                task.save(
+                    update_fields=[
+                        "state",
+                        "attempts",
+                        "available_at",
+                        "updated_at",
+                    ]
+                )
+                return task
+
+    def execute(self, task):
+        """Run a claimed task and record its outcome"""
+        # Updates only apply while no other worker claimed the task again
+        claimed = Task.objects.filter(pk=task.pk, attempts=task.attempts)
+        start = time.perf_counter()
+        try:
+            func = import_string(task.name)
+            if not isinstance(func, TaskFunction):
+                raise TypeError(f"{task.name} is not a task")
+            func(**task.kwargs)
+        except Exception as exc:
+            task_duration.observe(time.perf_counter() - start, task=task.name)
+            error = repr(exc)
+            if task.attempts < task.max_attempts:
+                delay = retry_delay(task.attempts)
+                logger.warning(
+                    "Task %s failed, retrying in %ss: %s",
+                    task.name,
+                    delay,
+                    error,
+                )
+                claimed.update(
+                    state=Task.QUEUED,
+                    available_at=timezone.now() + timedelta(seconds=delay),
+                    error=error,
+                    updated_at=timezone.now(),
+                )
+                task_runs_total.inc(task=task.name, result="retry")
+            else:
+                logger.exception("Task %s failed", task.name)
+                claimed.update(
+                    state=Task.FAILED, error=error, updated_at=timezone.now()
+                )
+                task_runs_total.inc(task=task.name, result="failed")
+            return False
+        task_duration.observe(time.perf_counter() - start, task=task.name)
+        claimed.delete()
+        task_runs_total.inc(task=task.name, result="done")
+        return True
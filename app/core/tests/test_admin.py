@@ -1,7 +1,12 @@
+from unittest.mock import patch
+
 from django.contrib.auth import get_user_model
 from django.test import TestCase, Client
 from django.urls import reverse
 
+from core import hashing
+from core.models import Ingredient, Recipe, Tag
+
 
 class AdminSiteTests(TestCase):
     def setUp(self):
@@ -44,3 +49,84 @@ class AdminSiteTests(TestCase):
         response = self.client.get(url)
 
         self.assertEqual(response.status_code, 200)
+
+    def test_users_search(self):
+        """Test that users are searched by email prefix"""
+        other = get_user_model().objects.create_user(
+            email="other@mail.com", password="TestPass123"
+        )
+        url = reverse("admin:core_user_changelist")
+        response = self.client.get(url, {"q": "USER@"})
+
+        self.assertContains(response, self.user.email)
+        self.assertNotContains(response, other.email)
+
+    def test_recipes_listed_with_filters(self):
+        """Test that recipes are searched and filtered by buckets"""
+        quick = Recipe.objects.create(
+            user=self.user, title="Quick soup", time_minutes=10, price=3
+        )
+        Recipe.objects.create(
+            user=self.user, title="Slow roast", time_minutes=90, price=30
+        )
+        url = reverse("admin:core_recipe_changelist")
+
+        with self.assertNumQueries(5):
+            response = self.client.get(url, {"time": "quick", "q": "quick"})
+
+        self.assertContains(response, quick.title)
+        self.assertNotContains(response, "Slow roast")
+        response = self.client.get(url, {"price": "expensive"})
+        self.assertContains(response, "Slow roast")
+        self.assertNotContains(response, quick.title)
+
+    def test_recipe_change_page(self):
+        """Test that the recipe form does not render every tag"""
+        recipe = Recipe.objects.create(
+            user=self.user, title="Soup", time_minutes=10, price=3
+        )
+        recipe.tags.add(Tag.objects.create(user=self.user, name="Vegan"))
+        Ingredient.objects.create(user=self.user, name="Unused ingredient")
+        url = reverse("admin:core_recipe_change", args=[recipe.id])
+
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Vegan")
+        self.assertNotContains(response, "Unused ingredient")
+
+    def test_tags_autocomplete(self):
+        """Test that tags are found by name prefix for autocomplete"""
+        tag = Tag.objects.create(user=self.user, name="Vegan")
+        Tag.objects.create(user=self.user, name="Dessert")
+        url = reverse("admin:autocomplete")
+
+        response = self.client.get(
+            url,
+            {
+                "term": "veg",
+                "app_label": "core",
+                "model_name": "recipe",
+                "field_name": "tags",
+            },
+        )
+
+        self.assertEqual(
+            [result["id"] for result in response.json()["results"]],
+            [str(tag.id)],
+        )
+
+    def test_login_without_hashing_pool(self):
+        """Test that admin logins do not use the API hashing pool"""
+        client = Client()
+        with patch.object(
+            hashing.HashingExecutor,
+            "submit",
+            side_effect=hashing.HashingUnavailable(),
+        ):
+            response = client.post(
+                reverse("admin:login"),
+                {"username": "superuser@mail.com", "password": "TestPass123"},
+            )
+
+        self.assertEqual(response.status_code, 302)
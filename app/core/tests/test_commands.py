@@ -1,9 +1,19 @@
+import json
+from io import StringIO
 from unittest.mock import patch
 
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
 from django.test import TestCase
 
+from benchmarks import events as events_benchmark
+from benchmarks import json_codec as json_codec_benchmark
+from benchmarks import serializers as serializers_benchmark
+from benchmarks import startup as startup_benchmark
+from benchmarks import streaming as streaming_benchmark
+from core.models import Recipe
+
 
 class CommandTests(TestCase):
     def test_wait_for_db_ready(self):
@@ -22,3 +32,56 @@ class CommandTests(TestCase):
             call_command("wait_for_db")
 
             self.assertEqual(gi.call_count, 6)
+
+    def test_benchmark_middleware_suite(self):
+        """Test running the middleware benchmark suite"""
+        out = StringIO()
+        call_command("benchmark", "middleware", iterations=5, stdout=out)
+        results = json.loads(out.getvalue())["results"]
+
+        self.assertIn("saved_per_api_request_us", results)
+        self.assertEqual(results["api_only"]["api"]["iterations"], 5)
+
+    def test_benchmark_serializers_suite(self):
+        """Test that the serializer suite renders identical JSON"""
+        results = serializers_benchmark.run(iterations=1, sizes=(5,))
+
+        self.assertTrue(results[5]["recipes"]["read"]["identical_json"])
+        self.assertEqual(results[5]["recipes"]["read"]["queries"], 3)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_benchmark_json_codec_suite(self):
+        """Test that the JSON codec suite reports the bytes saved"""
+        results = json_codec_benchmark.run(iterations=1, recipes=5)
+
+        self.assertTrue(results["codec"]["identical_json"])
+        self.assertGreater(results["saved"]["bytes"]["gzip"], 0)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_benchmark_streaming_suite(self):
+        """Test that streamed and regular lists return the same bytes"""
+        results = streaming_benchmark.run(sizes=(3,))
+
+        self.assertEqual(
+            results[3]["streamed"]["bytes"], results[3]["regular"]["bytes"]
+        )
+
+    def test_benchmark_startup_suite(self):
+        """Test that the startup suite times cold and warm first requests"""
+        results = startup_benchmark.run(iterations=1)
+
+        self.assertEqual(results["startup_command"]["iterations"], 1)
+        self.assertIn("cold_first_request", results)
+        self.assertIn("warm_first_request", results)
+
+    def test_benchmark_events_suite(self):
+        """Test that the events suite reaches every stream"""
+        results = events_benchmark.run(iterations=2, streams=10)
+
+        self.assertEqual(results["fan_out"]["iterations"], 2)
+        self.assertGreater(results["idle_bytes_per_stream"], 0)
+
+    def test_benchmark_unknown_suite(self):
+        """Test that an unknown benchmark suite is reported"""
+        with self.assertRaises(CommandError):
+            call_command("benchmark", "nonexistent")
@@ -0,0 +1,128 @@
+import threading
+import time
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+
+from core import denormalization
+from core.models import Ingredient, Recipe, Tag
+
+
+class RecipeArrayTests(TestCase):
+    """Test the tag and ingredient id arrays of recipes"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "user@mail.com", "testpass"
+        )
+        self.recipe = Recipe.objects.create(
+            user=self.user, title="Soup", time_minutes=10, price=5
+        )
+        self.vegan = Tag.objects.create(user=self.user, name="Vegan")
+        self.quick = Tag.objects.create(user=self.user, name="Quick")
+        self.salt = Ingredient.objects.create(user=self.user, name="Salt")
+
+    def arrays(self, recipe):
+        recipe = Recipe.objects.get(id=recipe.id)
+        return recipe.tag_ids, recipe.ingredient_ids
+
+    def test_links_changed(self):
+        """Test adding, removing and clearing links updates the arrays"""
+        self.recipe.tags.add(self.quick, self.vegan)
+        self.recipe.ingredients.add(self.salt)
+
+        expected = sorted([self.vegan.id, self.quick.id])
+        self.assertEqual(self.recipe.tag_ids, expected)
+        self.assertEqual(self.arrays(self.recipe), (expected, [self.salt.id]))
+
+        self.recipe.tags.remove(self.vegan)
+        self.assertEqual(self.arrays(self.recipe)[0], [self.quick.id])
+
+        self.recipe.tags.clear()
+        self.recipe.ingredients.set([])
+        self.assertEqual(self.arrays(self.recipe), ([], []))
+
+    def test_reverse_links_changed(self):
+        """Test changing the recipes of a tag updates their arrays"""
+        other = Recipe.objects.create(
+            user=self.user, title="Salad", time_minutes=5, price=3
+        )
+        self.vegan.recipe_set.add(self.recipe, other)
+
+        self.assertEqual(self.arrays(other)[0], [self.vegan.id])
+
+        self.vegan.recipe_set.clear()
+        self.assertEqual(self.arrays(self.recipe)[0], [])
+        self.assertEqual(self.arrays(other)[0], [])
+
+    def test_linked_object_deleted(self):
+        """Test deleting a tag removes it from the arrays"""
+        self.recipe.tags.add(self.vegan, self.quick)
+
+        self.vegan.delete()
+
+        self.assertEqual(self.arrays(self.recipe)[0], [self.quick.id])
+
+    def test_backfill_command(self):
+        """Test the command finds and rebuilds stale arrays"""
+        self.recipe.tags.add(self.vegan)
+        self.recipe.ingredients.add(self.salt)
+        Recipe.objects.update(tag_ids=[], ingredient_ids=[])
+
+        self.assertEqual(denormalization.find_mismatches(), [self.recipe.id])
+        with self.assertRaisesMessage(CommandError, str(self.recipe.id)):
+            call_command("backfill_recipe_arrays", verify=True)
+
+        call_command("backfill_recipe_arrays", batch_size=1, stdout=StringIO())
+
+        self.assertEqual(
+            self.arrays(self.recipe), ([self.vegan.id], [self.salt.id])
+        )
+        out = StringIO()
+        call_command("backfill_recipe_arrays", verify=True, stdout=out)
+        self.assertIn("All recipe arrays match", out.getvalue())
+
+
+class ConcurrentLinkTests(TransactionTestCase):
+    """Test links changed by concurrent transactions"""
+
+    def test_concurrent_adds_kept(self):
+        """Test tags added to a recipe at once all end up in its array"""
+        user = get_user_model().objects.create_user("user@mail.com", "pass")
+        recipe = Recipe.objects.create(
+            user=user, title="Soup", time_minutes=10, price=5
+        )
+        tags = [
+            Tag.objects.create(user=user, name=name)
+            for name in ("Vegan", "Quick")
+        ]
+        first_added = threading.Event()
+
+        def add(tag, first):
+            if not first:
+                first_added.wait(5)
+            try:
+                with transaction.atomic():
+                    Recipe.objects.get(id=recipe.id).tags.add(tag)
+                    if first:
+                        # Commit after the other transaction added its tag
+                        first_added.set()
+                        time.sleep(1)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=add, args=(tags[0], True)),
+            threading.Thread(target=add, args=(tags[1], False)),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.tag_ids, sorted(tag.id for tag in tags))
@@ -0,0 +1,280 @@
+import json
+import select
+import time
+from unittest.mock import AsyncMock
+
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.authtoken.models import Token
+
+from core.events import RESET, Broadcaster, EventStream, Listener, route
+from core.models import Recipe, Tag
+
+
+def event(user_id, pk=1, action="updated"):
+    return {
+        "user": user_id,
+        "model": "recipe",
+        "pk": pk,
+        "action": action,
+    }
+
+
+class ChangeNotificationTests(TransactionTestCase):
+    """Test changes are sent with NOTIFY when they commit"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "user@mail.com", "testpass"
+        )
+        self.connection = Listener(Broadcaster())._connect()
+        self.addCleanup(self.connection.close)
+
+    def received(self, count):
+        """Wait for count notifications and return them"""
+        deadline = time.monotonic() + 5
+        self.connection.poll()
+        while len(self.connection.notifies) < count:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            select.select([self.connection], [], [], timeout)
+            self.connection.poll()
+        payloads = [
+            json.loads(notify.payload) for notify in self.connection.notifies
+        ]
+        self.connection.notifies.clear()
+        return [
+            (payload["model"], payload["pk"], payload["action"])
+            for payload in payloads
+        ]
+
+    def test_changes_notified(self):
+        """Test saving, linking and deleting send events"""
+        recipe = Recipe.objects.create(
+            user=self.user, title="Soup", time_minutes=5, price=1
+        )
+        tag = Tag.objects.create(user=self.user, name="Vegan")
+        recipe.tags.add(tag)
+        recipe.title = "Stew"
+        recipe.save()
+        recipe_id = recipe.id
+        recipe.delete()
+
+        self.assertEqual(
+            self.received(5),
+            [
+                ("recipe", recipe_id, "created"),
+                ("tag", tag.id, "created"),
+                ("recipe", recipe_id, "updated"),
+                ("recipe", recipe_id, "updated"),
+                ("recipe", recipe_id, "deleted"),
+            ],
+        )
+
+    def test_clones_notified(self):
+        """Test recipes copied in bulk send created events"""
+        recipe = Recipe.objects.create(
+            user=self.user, title="Soup", time_minutes=5, price=1
+        )
+        self.received(1)
+
+        (clone,) = Recipe.objects.clone([recipe])
+
+        self.assertEqual(self.received(1), [("recipe", clone.id, "created")])
+
+
+@override_settings(EVENTS_BUFFER_SIZE=3, EVENTS_QUEUE_SIZE=2)
+class BroadcasterTests(TestCase):
+    """Test fanning events out and resuming streams"""
+
+    def test_publish_to_user(self):
+        """Test events only reach the streams of their user"""
+        broadcaster = Broadcaster()
+        broadcaster.reset()
+        mine = broadcaster.subscribe(1)
+        other = broadcaster.subscribe(2)
+
+        broadcaster.publish(event(1, pk=7))
+
+        self.assertEqual(mine.queue.get_nowait()["pk"], 7)
+        self.assertTrue(other.queue.empty())
+
+    def test_replay(self):
+        """Test the missed events of a user are replayed while buffered"""
+        broadcaster = Broadcaster()
+        self.assertIsNone(broadcaster.replay(1, 0))
+        broadcaster.reset()
+        for user_id in (1, 0, 1):
+            broadcaster.publish(event(user_id))
+
+        self.assertEqual(
+            [missed["id"] for missed in broadcaster.replay(1, 1)], [2, 4]
+        )
+        self.assertIsNone(broadcaster.replay(1, 0))
+
+        broadcaster.publish(event(1))
+        self.assertIsNone(broadcaster.replay(1, 1))
+        self.assertEqual(
+            [missed["id"] for missed in broadcaster.replay(1, 2)], [4, 5]
+        )
+
+    def test_event_ids(self):
+        """Test ids of other broadcasters are not resumed"""
+        broadcaster = Broadcaster()
+
+        event_id = broadcaster.event_id(12)
+
+        self.assertEqual(broadcaster.parse_event_id(event_id), 12)
+        self.assertIsNone(Broadcaster().parse_event_id(event_id))
+        self.assertIsNone(broadcaster.parse_event_id("12"))
+
+    def test_slow_stream_reset(self):
+        """Test a stream that falls behind gets a reset"""
+        broadcaster = Broadcaster()
+        broadcaster.reset()
+        subscription = broadcaster.subscribe(1)
+
+        for _ in range(4):
+            broadcaster.publish(event(1))
+
+        self.assertEqual(subscription.queue.qsize(), 3)
+        self.assertIs(list(subscription.queue._queue)[-1], RESET)
+
+
+class EventStreamTests(TransactionTestCase):
+    """Test the Server-Sent Events endpoint"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "user@mail.com", "testpass"
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.stream = EventStream(listener=AsyncMock())
+        self.stream.broadcaster.reset()
+
+    def communicator(self, query="", headers=()):
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": "/api/events/",
+            "query_string": query.encode(),
+            "headers": list(headers),
+        }
+        return ApplicationCommunicator(self.stream, scope)
+
+    def auth(self):
+        return (b"authorization", f"Token {self.token.key}".encode())
+
+    async def open(self, communicator):
+        await communicator.send_input({"type": "http.request"})
+        start = await communicator.receive_output(1)
+        body = await communicator.receive_output(1)
+        return start, body["body"].decode()
+
+    async def close(self, communicator):
+        await communicator.send_input({"type": "http.disconnect"})
+        await communicator.wait(1)
+
+    async def test_token_required(self):
+        """Test streams need a valid token"""
+        communicator = self.communicator(query="token=invalid")
+
+        start, body = await self.open(communicator)
+
+        self.assertEqual(start["status"], 401)
+        self.assertIn("token", json.loads(body)["detail"])
+
+    async def test_stream_events(self):
+        """Test the user's events are streamed as they are published"""
+        communicator = self.communicator(headers=[self.auth()])
+        start, body = await self.open(communicator)
+        self.assertEqual(start["status"], 200)
+        self.assertIn(
+            (b"content-type", b"text/event-stream"), start["headers"]
+        )
+        self.assertEqual(body, "retry: 3000\n\n")
+
+        self.stream.broadcaster.publish(event(self.user.id + 1))
+        self.stream.broadcaster.publish(event(self.user.id, pk=7))
+        message = await communicator.receive_output(1)
+
+        event_id = self.stream.broadcaster.event_id(3)
+        self.assertEqual(
+            message["body"].decode(),
+            f"id: {event_id}\nevent: recipe\n"
+            'data: {"action": "updated", "id": 7}\n\n',
+        )
+        await self.close(communicator)
+        self.assertEqual(self.stream.broadcaster.subscriptions, {})
+
+    async def test_resume_stream(self):
+        """Test reconnecting with Last-Event-ID replays the missed events"""
+        broadcaster = self.stream.broadcaster
+        for _ in range(3):
+            broadcaster.publish(event(self.user.id))
+        communicator = self.communicator(
+            query=f"token={self.token.key}",
+            headers=[(b"last-event-id", broadcaster.event_id(2).encode())],
+        )
+
+        _, body = await self.open(communicator)
+
+        self.assertIn(f"id: {broadcaster.event_id(3)}\n", body)
+        self.assertIn(f"id: {broadcaster.event_id(4)}\n", body)
+        self.assertNotIn(f"id: {broadcaster.event_id(2)}\n", body)
+        self.assertNotIn("event: reset", body)
+        await self.close(communicator)
+
+    async def test_resume_too_old(self):
+        """Test a stream that cannot be resumed starts with a reset"""
+        broadcaster = self.stream.broadcaster
+        broadcaster.reset()
+        for last_id in (broadcaster.event_id(1), Broadcaster().event_id(2)):
+            communicator = self.communicator(
+                query=f"token={self.token.key}&last_event_id={last_id}"
+            )
+
+            _, body = await self.open(communicator)
+
+            self.assertIn(
+                f"id: {broadcaster.event_id(2)}\nevent: reset\n", body
+            )
+            await self.close(communicator)
+
+    async def test_events_sent_in_publish_order(self):
+        """Test events are sent in the order their commits are notified"""
+        communicator = self.communicator(headers=[self.auth()])
+        await self.open(communicator)
+
+        for pk in (11, 10):
+            self.stream.broadcaster.publish(event(self.user.id, pk))
+        bodies = [
+            (await communicator.receive_output(1))["body"].decode()
+            for _ in range(2)
+        ]
+
+        self.assertIn('"id": 11}', bodies[0])
+        self.assertIn('"id": 10}', bodies[1])
+        await self.close(communicator)
+
+    async def test_heartbeat(self):
+        """Test idle streams get keep-alive comments"""
+        communicator = self.communicator(headers=[self.auth()])
+        await self.open(communicator)
+
+        self.stream.broadcaster.heartbeat()
+        message = await communicator.receive_output(1)
+
+        self.assertEqual(message["body"], b": keep-alive\n\n")
+        await self.close(communicator)
+
+    async def test_route(self):
+        """Test other paths are handled by the wrapped application"""
+        application = AsyncMock()
+        scope = {"type": "http", "path": "/api/recipe/recipes/"}
+
+        await route(application)(scope, None, None)
+
+        application.assert_awaited_once_with(scope, None, None)
@@ -0,0 +1,63 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import identify_hasher
+from django.test import TestCase, override_settings
+
+from core import hashing
+
+
+def iterations(user):
+    """Return the PBKDF2 iterations of the stored hash of user"""
+    user.refresh_from_db()
+    return int(user.password.split("$")[1])
+
+
+class HashingExecutorTests(TestCase):
+    """Test the bounded hashing pool"""
+
+    def test_rejects_beyond_queue(self):
+        """Test that work beyond the workers and queue is refused"""
+        executor = hashing.HashingExecutor(workers=1, queue_size=1)
+        release = threading.Event()
+        futures = [executor.submit("check", release.wait) for _ in range(2)]
+
+        with self.assertRaises(hashing.HashingUnavailable):
+            executor.submit("check", release.wait)
+
+        release.set()
+        for future in futures:
+            future.result()
+
+        self.assertEqual(executor.submit("check", len, "ok").result(), 2)
+
+
+class PasswordCheckTests(TestCase):
+    """Test password checks and rehashing on login"""
+
+    @override_settings(PASSWORD_HASH_ITERATIONS=1000)
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "user@mail.com", "testpass"
+        )
+
+    def test_check_password(self):
+        """Test checking right, wrong and missing user passwords"""
+        self.assertTrue(hashing.check_password(self.user, "testpass"))
+        self.assertFalse(hashing.check_password(self.user, "wrong"))
+        self.assertFalse(hashing.check_password(None, "testpass"))
+
+    @override_settings(PASSWORD_HASH_ITERATIONS=2000)
+    def test_rehash_on_login(self):
+        """Test that a login upgrades hashes with other iterations"""
+        self.assertEqual(iterations(self.user), 1000)
+
+        self.assertFalse(hashing.check_password(self.user, "wrong"))
+        self.assertEqual(iterations(self.user), 1000)
+
+        self.assertTrue(hashing.check_password(self.user, "testpass"))
+        self.assertEqual(iterations(self.user), 2000)
+        self.assertEqual(
+            identify_hasher(self.user.password).algorithm, "pbkdf2_sha256"
+        )
+        self.assertTrue(self.user.check_password("testpass"))
@@ -0,0 +1,160 @@
+from io import BytesIO
+from unittest.mock import patch
+
+from PIL import Image
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+from recipe.views import TagViewSet
+
+
+TAGS_URL = reverse("recipe:tag-list")
+INGREDIENTS_URL = reverse("recipe:ingredient-list")
+RECIPES_URL = reverse("recipe:recipe-list")
+
+
+class IdempotencyKeyTests(TestCase):
+    """Test replaying POSTs that carry an Idempotency-Key"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            "user@mail.com", "testpass"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, url, payload, key="key-1", client=None):
+        return (client or self.client).post(
+            url, payload, format="json", HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def test_retry_replays_first_response(self):
+        """Test that a retry returns the stored response without a copy"""
+        payload = {
+            "title": "Curry",
+            "time_minutes": 30,
+            "price": "5.00",
+            "tags": [],
+            "ingredients": [],
+        }
+        first = self.post(RECIPES_URL, payload)
+        retry = self.post(RECIPES_URL, payload)
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertNotIn("Idempotent-Replayed", first)
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_without_key_not_deduplicated(self):
+        """Test that requests without a key are not affected"""
+        for _ in range(2):
+            self.client.post(TAGS_URL, {"name": "Vegan"})
+
+        self.assertEqual(Tag.objects.count(), 2)
+
+    def test_keys_scoped_per_user(self):
+        """Test that users do not see each other's stored responses"""
+        other = APIClient()
+        other.force_authenticate(
+            get_user_model().objects.create_user("other@mail.com", "pass")
+        )
+        self.post(TAGS_URL, {"name": "Vegan"})
+        response = self.post(TAGS_URL, {"name": "Vegan"}, client=other)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn("Idempotent-Replayed", response)
+        self.assertEqual(Tag.objects.count(), 2)
+
+    def test_key_reused_for_other_endpoint(self):
+        """Test that a key cannot be reused on another endpoint"""
+        self.post(TAGS_URL, {"name": "Vegan"})
+        response = self.post(INGREDIENTS_URL, {"name": "Salt"})
+
+        self.assertEqual(
+            response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+
+    def test_key_reused_with_other_body(self):
+        """Test that a key cannot be reused for a different request body"""
+        self.post(TAGS_URL, {"name": "Vegan"})
+        response = self.post(TAGS_URL, {"name": "Dessert"})
+
+        self.assertEqual(
+            response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+        self.assertEqual(Tag.objects.count(), 1)
+
+    def test_concurrent_duplicate_blocked(self):
+        """Test that a retry during the first request gets a conflict"""
+        responses = []
+
+        def perform_create(view, serializer):
+            responses.append(self.post(TAGS_URL, {"name": "Vegan"}))
+            serializer.save(user=self.user)
+
+        with patch.object(TagViewSet, "perform_create", perform_create):
+            first = self.post(TAGS_URL, {"name": "Vegan"})
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(responses[0].status_code, status.HTTP_409_CONFLICT)
+
+    def test_client_errors_replayed(self):
+        """Test that validation errors are stored like other responses"""
+        first = self.post(TAGS_URL, {})
+        retry = self.post(TAGS_URL, {})
+
+        self.assertEqual(retry.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+
+    def test_server_error_releases_key(self):
+        """Test that a failed request can be retried with the same key"""
+        with patch.object(
+            TagViewSet, "perform_create", side_effect=RuntimeError
+        ):
+            with self.assertRaises(RuntimeError):
+                self.post(TAGS_URL, {"name": "Vegan"})
+
+        response = self.post(TAGS_URL, {"name": "Vegan"})
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn("Idempotent-Replayed", response)
+
+    @override_settings(DATA_UPLOAD_MAX_MEMORY_SIZE=256)
+    def test_upload_over_memory_limit(self):
+        """Test that uploads larger than the body limit are fingerprinted"""
+        recipe = Recipe.objects.create(
+            user=self.user, title="Curry", time_minutes=30, price=5
+        )
+        url = reverse("recipe:recipe-upload-image", args=[recipe.id])
+
+        def post(color):
+            image = BytesIO()
+            Image.new("RGB", (100, 100), color).save(image, format="PNG")
+            upload = SimpleUploadedFile("image.png", image.getvalue())
+            self.assertGreater(upload.size, 256)
+            return self.client.post(
+                url, {"image": upload}, HTTP_IDEMPOTENCY_KEY="key-1"
+            )
+
+        first = post("red")
+        retry = post("red")
+        other = post("blue")
+        recipe.refresh_from_db()
+        recipe.image.delete()
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(
+            other.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
@@ -0,0 +1,91 @@
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import LiveServerTestCase, TestCase, override_settings
+
+from benchmarks.http_load import LoadTest, compare
+from core.seeding import SEED_PASSWORD
+
+
+def results(p95_ms, throughput_rps):
+    """Return minimal load test results for a single scenario"""
+    return {
+        "endpoints": {
+            "recipe_detail": {
+                "requests": 100,
+                "p95_ms": p95_ms,
+                "throughput_rps": throughput_rps,
+            }
+        }
+    }
+
+
+class LoadTestCommandTests(TestCase):
+    """Test the load test command and result comparison"""
+
+    def test_compare_within_tolerance(self):
+        """Test that small changes are not reported as regressions"""
+        self.assertEqual(compare(results(10, 100), results(10.5, 97), 10), [])
+
+    def test_compare_reports_regressions(self):
+        """Test that slower p95 or lower throughput is reported"""
+        regressions = compare(results(10, 100), results(20, 50), 10)
+
+        self.assertEqual(len(regressions), 2)
+        self.assertIn("recipe_detail: p95 10ms -> 20ms", regressions)
+
+    def test_requires_seeded_users(self):
+        """Test that the command refuses to run without seeded users"""
+        with self.assertRaises(CommandError):
+            call_command("loadtest", duration=0, stdout=StringIO())
+
+
+class LoadTestLiveServerTests(LiveServerTestCase):
+    """Test running the traffic mix against a live server"""
+
+    def setUp(self):
+        cache.clear()
+        # The image uploads of the traffic mix must not land in /vol
+        self.media_dir = tempfile.TemporaryDirectory()
+        media_root = override_settings(MEDIA_ROOT=self.media_dir.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+    def tearDown(self):
+        self.media_dir.cleanup()
+
+    def test_scenarios_succeed(self):
+        """Test that every scenario runs without errors"""
+        call_command("seed_dataset", recipes=20, users=2, stdout=StringIO())
+        load_test = LoadTest(
+            self.live_server_url,
+            [("seed1@example.com", SEED_PASSWORD)],
+            concurrency=2,
+            duration=2,
+        )
+        output = load_test.run()
+
+        self.assertGreater(output["throughput_rps"], 0)
+        for name, endpoint in output["endpoints"].items():
+            self.assertEqual(endpoint["errors"], 0, name)
+
+    @override_settings(THROTTLE_RATES={"recipe_list": "1/min"})
+    def test_throttled_counted_separately(self):
+        """Test that 429 responses are not reported as errors"""
+        call_command("seed_dataset", recipes=5, users=1, stdout=StringIO())
+        load_test = LoadTest(
+            self.live_server_url,
+            [("seed1@example.com", SEED_PASSWORD)],
+            concurrency=1,
+            duration=1,
+            mix={"recipe_list": 1},
+        )
+        output = load_test.run()
+
+        endpoint = output["endpoints"]["recipe_list"]
+        self.assertGreater(endpoint["throttled"], 0)
+        self.assertEqual(endpoint["errors"], 0)
+        self.assertEqual(output["throttled"], endpoint["throttled"])
@@ -0,0 +1,93 @@
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.metrics import MetricsRegistry
+
+
+METRICS_URL = reverse("metrics")
+
+
+class MetricsRegistryTests(TestCase):
+    """Test the in-process metrics registry"""
+
+    def test_render_counter_and_histogram(self):
+        """Test rendering counters and histograms in the text format"""
+        registry = MetricsRegistry()
+        counter = registry.counter("hits_total", "Hits.", ("view",))
+        histogram = registry.histogram(
+            "latency_seconds", "Latency.", ("view",), buckets=(0.1, 1)
+        )
+        counter.inc(view="a")
+        counter.inc(2, view="a")
+        histogram.observe(0.5, view="a")
+        output = registry.render()
+
+        self.assertIn("# TYPE hits_total counter", output)
+        self.assertIn('hits_total{view="a"} 3', output)
+        self.assertIn('latency_seconds_bucket{view="a",le="0.1"} 0', output)
+        self.assertIn('latency_seconds_bucket{view="a",le="1"} 1', output)
+        self.assertIn('latency_seconds_bucket{view="a",le="+Inf"} 1', output)
+        self.assertIn('latency_seconds_sum{view="a"} 0.5', output)
+        self.assertIn('latency_seconds_count{view="a"} 1', output)
+
+    def test_multiprocess_samples_are_merged(self):
+        """Test that samples written by several processes are summed"""
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(METRICS_MULTIPROC_DIR=directory):
+                workers = [MetricsRegistry(), MetricsRegistry()]
+                for count, registry in enumerate(workers, start=1):
+                    counter = registry.counter("jobs_total", "Jobs.")
+                    counter.inc(count)
+                    registry.flush()
+                output = workers[0].render()
+
+        self.assertIn("jobs_total 3", output)
+
+    def test_gauge_callback(self):
+        """Test that callback gauges are read when rendering"""
+        registry = MetricsRegistry()
+        registry.gauge_callback("queue_depth", "Depth.", lambda: 7)
+
+        self.assertIn("queue_depth 7", registry.render())
+
+
+class MetricsEndpointTests(TestCase):
+    """Test the /metrics endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "user@mail.com", "testpass"
+        )
+
+    def test_requests_counted_per_view_action(self):
+        """Test that API requests are counted per viewset action"""
+        self.client.force_authenticate(self.user)
+        self.client.get(reverse("recipe:recipe-list"))
+        response = self.client.get(METRICS_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertContains(
+            response,
+            'api_requests_total{view="RecipeViewSet.list",method="GET",'
+            'status="200"}',
+        )
+        self.assertContains(
+            response, 'api_db_queries_total{view="RecipeViewSet.list"}'
+        )
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_token_required_when_configured(self):
+        """Test that the metrics token is enforced when configured"""
+        response = self.client.get(METRICS_URL)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        response = self.client.get(
+            METRICS_URL, HTTP_AUTHORIZATION="Bearer secret"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
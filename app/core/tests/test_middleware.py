@@ -0,0 +1,186 @@
+import gzip
+from io import StringIO
+from unittest.mock import patch
+
+import brotli
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from app import settings_api
+from core import compression
+from core.middleware import CompressionMiddleware
+from core.models import Recipe
+
+
+RECIPES_URL = reverse("recipe:recipe-list")
+
+
+@override_settings(
+    MIDDLEWARE=settings_api.MIDDLEWARE,
+    SILENCED_SYSTEM_CHECKS=settings_api.SILENCED_SYSTEM_CHECKS,
+)
+class ApiOnlyMiddlewareTests(TestCase):
+    """Test the API-only middleware profile"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_superuser(
+            "admin@mail.com", "testpass"
+        )
+        self.client = APIClient()
+
+    def test_api_request_skips_browser_middleware(self):
+        """Test that API responses skip session and clickjacking work"""
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        response = self.client.get(RECIPES_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("X-Frame-Options", response)
+        self.assertNotIn("session", response.wsgi_request.__dict__)
+
+    def test_admin_keeps_browser_middleware(self):
+        """Test that the admin still gets sessions and clickjacking headers"""
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("admin:index"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("X-Frame-Options", response)
+        self.assertTrue(response.wsgi_request.user.is_authenticated)
+
+    def test_system_checks_pass(self):
+        """Test that the profile passes the system checks"""
+        call_command("check", stdout=StringIO())
+
+
+class RequestTimingMiddlewareTests(TestCase):
+    """Test the per-request timing instrumentation"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "user@mail.com", "testpass"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=0)
+    def test_unsampled_request_not_instrumented(self):
+        """Test that requests outside the sample get no timing header"""
+        response = self.client.get(RECIPES_URL)
+
+        self.assertNotIn("Server-Timing", response)
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=1)
+    def test_sampled_request_reports_timings(self):
+        """Test that sampled requests get a Server-Timing header and log"""
+        with self.assertLogs("core.middleware", level="INFO") as logs:
+            response = self.client.get(RECIPES_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertRegex(response["Server-Timing"], r"db;dur=[\d.]+;desc=")
+        for name in ("serializer", "view", "total"):
+            self.assertIn(f"{name};dur=", response["Server-Timing"])
+        self.assertIn("view=RecipeViewSet.list", logs.output[0])
+
+    @override_settings(
+        REQUEST_TIMING_SAMPLE_RATE=1,
+        REQUEST_QUERY_BUDGETS={"RecipeViewSet.list": 1},
+    )
+    def test_query_budget_exceeded_logged(self):
+        """Test that going over a view's query budget logs a warning"""
+        for i in range(3):
+            Recipe.objects.create(
+                user=self.user, title=f"Recipe {i}", time_minutes=5, price=1
+            )
+        with self.assertLogs("core.middleware", level="WARNING") as logs:
+            self.client.get(RECIPES_URL)
+
+        self.assertIn("query budget exceeded", logs.output[0])
+        self.assertIn("budget=1", logs.output[0])
+
+
+class CompressionMiddlewareTests(TestCase):
+    """Test response compression"""
+
+    body = b'{"title": "Sample recipe"}' * 100
+
+    def get(self, response, accept_encoding="gzip, deflate, br"):
+        middleware = CompressionMiddleware(lambda request: response)
+        request = RequestFactory().get(
+            "/", HTTP_ACCEPT_ENCODING=accept_encoding
+        )
+        return middleware(request)
+
+    def json_response(self, body=None):
+        response = HttpResponse(
+            body or self.body, content_type="application/json"
+        )
+        response["ETag"] = '"abc"'
+        return response
+
+    def test_brotli_preferred(self):
+        """Test that brotli is used when the client accepts it"""
+        response = self.get(self.json_response())
+
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(brotli.decompress(response.content), self.body)
+        self.assertEqual(
+            response["Content-Length"], str(len(response.content))
+        )
+        self.assertEqual(response["ETag"], 'W/"abc"')
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+    def test_gzip_fallback(self):
+        """Test gzip for clients that refuse brotli or when it is missing"""
+        response = self.get(self.json_response(), "gzip, br;q=0")
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.content), self.body)
+
+        with patch.object(compression, "brotli", None):
+            response = self.get(self.json_response())
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+
+    def test_small_response_not_compressed(self):
+        """Test that responses below the minimum size are left alone"""
+        response = self.get(self.json_response(b'{"id": 1}'))
+
+        self.assertNotIn("Content-Encoding", response)
+        self.assertEqual(response.content, b'{"id": 1}')
+
+    def test_unaccepted_or_binary_not_compressed(self):
+        """Test that identity clients and binary bodies are left alone"""
+        response = self.get(self.json_response(), "identity")
+
+        self.assertNotIn("Content-Encoding", response)
+        self.assertEqual(response.content, self.body)
+
+        image = HttpResponse(self.body, content_type="image/jpeg")
+
+        self.assertNotIn("Content-Encoding", self.get(image))
+
+    def test_streaming_response_compressed(self):
+        """Test that streaming responses are compressed chunk by chunk"""
+        chunks = [b"[", b'{"id": 1}', b",", b'{"id": 2}', b"]"]
+        for accept_encoding, decompress in (
+            ("gzip", gzip.decompress),
+            ("br", brotli.decompress),
+        ):
+            response = self.get(
+                StreamingHttpResponse(
+                    iter(chunks), content_type="application/json"
+                ),
+                accept_encoding,
+            )
+
+            self.assertEqual(response["Content-Encoding"], accept_encoding)
+            self.assertEqual(
+                decompress(b"".join(response.streaming_content)),
+                b"".join(chunks),
+            )
@@ -0,0 +1,96 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.paginator import EmptyPage
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from core.models import Tag
+from core.pagination import (
+    EstimatedCountPaginator,
+    estimated_count,
+    plan_estimate,
+    table_estimate,
+)
+
+
+@override_settings(ESTIMATED_COUNT_THRESHOLD=1000)
+class EstimatedCountPaginatorTests(TestCase):
+    """Test counting large tables from the planner's estimate"""
+
+    def setUp(self):
+        user = get_user_model().objects.create_user("user@mail.com", "pass")
+        for name in ("Vegan", "Dessert", "Quick"):
+            Tag.objects.create(user=user, name=name)
+
+    def test_table_estimate(self):
+        """Test the estimate of an analyzed table"""
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE core_tag")
+
+        self.assertEqual(table_estimate(Tag), 3)
+
+    @patch("core.pagination.table_estimate", return_value=5000)
+    def test_large_table_estimated(self, estimate):
+        """Test a whole large table is counted from the estimate"""
+        paginator = EstimatedCountPaginator(Tag.objects.order_by("id"), 10)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(paginator.count, 5000)
+        self.assertEqual(paginator.num_pages, 500)
+        self.assertTrue(paginator.count_is_estimate)
+
+    @override_settings(ESTIMATED_COUNT_THRESHOLD=1)
+    @patch("core.pagination.table_estimate", return_value=1)
+    def test_pages_beyond_low_estimate(self, estimate):
+        """Test the rows past an underestimated count can be paged"""
+        paginator = EstimatedCountPaginator(Tag.objects.order_by("id"), 1)
+
+        pages = [paginator.page(number) for number in (1, 2, 3)]
+
+        self.assertEqual(
+            [page.has_next() for page in pages], [True, True, False]
+        )
+        self.assertEqual(pages[2].object_list[0].name, "Quick")
+
+    @patch("core.pagination.table_estimate", return_value=5000)
+    def test_pages_past_rows_of_high_estimate(self, estimate):
+        """Test an overestimated count does not link to empty pages"""
+        paginator = EstimatedCountPaginator(Tag.objects.order_by("id"), 2)
+
+        self.assertTrue(paginator.page(1).has_next())
+        self.assertFalse(paginator.page(2).has_next())
+        with self.assertRaises(EmptyPage):
+            paginator.page(3)
+
+    @patch("core.pagination.table_estimate", return_value=500)
+    def test_small_table_counted(self, estimate):
+        """Test tables below the threshold are counted exactly"""
+        paginator = EstimatedCountPaginator(Tag.objects.order_by("id"), 10)
+
+        self.assertEqual(paginator.count, 3)
+        self.assertFalse(paginator.count_is_estimate)
+
+    def test_plan_estimate(self):
+        """Test the planner's estimate of a filtered queryset"""
+        queryset = Tag.objects.filter(name__startswith="V").order_by("id")
+
+        self.assertIsInstance(plan_estimate(queryset), int)
+
+    @patch("core.pagination.plan_estimate", return_value=5000)
+    @patch("core.pagination.table_estimate")
+    def test_filtered_queryset_estimated(self, table, plan):
+        """Test filtered querysets use the planner's estimate"""
+        queryset = Tag.objects.filter(name__startswith="V")
+
+        self.assertEqual(estimated_count(queryset), (5000, True))
+        table.assert_not_called()
+
+    @patch("core.pagination.plan_estimate", return_value=5000)
+    def test_threshold(self, plan):
+        """Test results below the threshold are counted exactly"""
+        queryset = Tag.objects.filter(name__startswith="V")
+
+        self.assertEqual(
+            estimated_count(queryset, threshold=10000), (1, False)
+        )
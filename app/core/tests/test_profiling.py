@@ -0,0 +1,106 @@
+import os
+import pstats
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import ProfilingRule
+
+
+RECIPES_URL = reverse("recipe:recipe-list")
+
+
+def profile_files(directory):
+    """Return every profile written under directory"""
+    return [
+        os.path.join(root, name)
+        for root, _, names in os.walk(directory)
+        for name in names
+    ]
+
+
+class ProfilingTests(TestCase):
+    """Test on-demand request profiling"""
+
+    def setUp(self):
+        self.profiling_dir = tempfile.TemporaryDirectory()
+        self.user = get_user_model().objects.create_user(
+            "user@mail.com", "testpass"
+        )
+
+    def tearDown(self):
+        self.profiling_dir.cleanup()
+
+    def get_recipes(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        return client.get(RECIPES_URL)
+
+    def test_sampled_request_is_profiled(self):
+        """Test that a request matching a rule writes a pstats file"""
+        ProfilingRule.objects.create(view="RecipeViewSet.list", sample_rate=1)
+        with override_settings(
+            PROFILING_ENABLED=True, PROFILING_DIR=self.profiling_dir.name
+        ):
+            response = self.get_recipes()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        files = profile_files(self.profiling_dir.name)
+        self.assertEqual(len(files), 1)
+        self.assertIn("RecipeViewSet.list", files[0])
+        self.assertTrue(pstats.Stats(files[0]).total_calls > 0)
+        rule = ProfilingRule.objects.get(view="RecipeViewSet.list")
+        self.assertEqual(rule.profiles_taken, 1)
+
+    def test_profiling_disabled_by_setting(self):
+        """Test that nothing is profiled unless the setting is enabled"""
+        ProfilingRule.objects.create(view="RecipeViewSet.list", sample_rate=1)
+        with override_settings(
+            PROFILING_ENABLED=False, PROFILING_DIR=self.profiling_dir.name
+        ):
+            self.get_recipes()
+
+        self.assertEqual(profile_files(self.profiling_dir.name), [])
+
+    def test_exhausted_rule_not_profiled(self):
+        """Test that rules stop once max_profiles have been taken"""
+        ProfilingRule.objects.create(
+            view="RecipeViewSet.list",
+            sample_rate=1,
+            max_profiles=1,
+            profiles_taken=1,
+        )
+        with override_settings(
+            PROFILING_ENABLED=True, PROFILING_DIR=self.profiling_dir.name
+        ):
+            self.get_recipes()
+
+        self.assertEqual(profile_files(self.profiling_dir.name), [])
+
+    def test_profile_endpoint_command(self):
+        """Test starting and stopping profiling from the command line"""
+        call_command(
+            "profile_endpoint",
+            "RecipeViewSet.list",
+            rate=0.5,
+            stdout=StringIO(),
+        )
+        rule = ProfilingRule.objects.get(view="RecipeViewSet.list")
+        self.assertTrue(rule.enabled)
+        self.assertEqual(rule.sample_rate, 0.5)
+        self.assertIsNotNone(rule.expires_at)
+
+        call_command(
+            "profile_endpoint",
+            "RecipeViewSet.list",
+            disable=True,
+            stdout=StringIO(),
+        )
+        rule.refresh_from_db()
+        self.assertFalse(rule.enabled)
@@ -0,0 +1,147 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+
+from core.models import AccountPurge, Ingredient, Recipe, Tag, Task
+from core.purging import LOCK_NAMESPACE, AccountPurger, schedule_purge
+from core.taskqueue import Worker
+
+
+def create_account(email, recipes=5):
+    """Create a user with tagged recipes and return it"""
+    user = get_user_model().objects.create_user(email, "testpass")
+    tags = [Tag.objects.create(user=user, name=f"Tag {n}") for n in range(3)]
+    ingredient = Ingredient.objects.create(user=user, name="Salt")
+    for number in range(recipes):
+        recipe = Recipe.objects.create(
+            user=user, title=f"Recipe {number}", time_minutes=5, price=1
+        )
+        recipe.tags.add(*tags)
+        recipe.ingredients.add(ingredient)
+    return user
+
+
+class AccountPurgeTests(TestCase):
+    """Test purging user accounts in batches"""
+
+    def setUp(self):
+        self.user = create_account("purged@mail.com")
+        self.other = create_account("kept@mail.com")
+        self.storage = Recipe._meta.get_field("image").storage
+        self.image = self.storage.save(
+            "upload/recipe/purge.jpg", ContentFile(b"x")
+        )
+        self.addCleanup(self.storage.delete, self.image)
+
+    def assertPurged(self, purge):
+        self.assertEqual(purge.state, AccountPurge.DONE)
+        self.assertIsNotNone(purge.finished_at)
+        self.assertFalse(
+            get_user_model().objects.filter(id=self.user.id).exists()
+        )
+        self.assertFalse(Recipe.objects.filter(user_id=self.user.id).exists())
+        self.assertFalse(Tag.objects.filter(user_id=self.user.id).exists())
+        self.assertEqual(Recipe.objects.filter(user=self.other).count(), 5)
+        self.assertEqual(Tag.objects.filter(user=self.other).count(), 3)
+        self.assertEqual(Recipe.tags.through.objects.count(), 15)
+        self.assertEqual(Recipe.ingredients.through.objects.count(), 5)
+
+    def test_purge_in_batches(self):
+        """Test a purge deletes the user's rows and reports progress"""
+        purge = schedule_purge(self.user)
+        progress = []
+
+        with self.assertNumQueries(65):
+            AccountPurger(purge, 2, lambda *args: progress.append(args)).run()
+
+        self.assertPurged(purge)
+        self.assertEqual(purge.deleted["core.Recipe"], 5)
+        self.assertEqual(purge.deleted["core.Recipe_tags"], 15)
+        self.assertEqual(purge.deleted["core.Tag"], 3)
+        self.assertEqual(purge.deleted["core.User"], 1)
+        self.assertIn(("core.Recipe", 4), progress)
+
+    def test_purge_deletes_unshared_images(self):
+        """Test images are deleted unless another recipe uses them"""
+        Recipe.objects.update(image=self.image)
+        purge = schedule_purge(self.user)
+
+        AccountPurger(purge, 2).run()
+        self.assertTrue(self.storage.exists(self.image))
+        self.assertEqual(purge.files_deleted, 0)
+
+        purge = schedule_purge(self.other)
+        AccountPurger(purge).run()
+        self.assertFalse(self.storage.exists(self.image))
+        self.assertEqual(purge.files_deleted, 1)
+
+    def test_resume_failed_purge(self):
+        """Test a purge that failed half way carries on when rerun"""
+        purge = schedule_purge(self.user)
+        with patch.object(
+            AccountPurger, "_purge_owned", side_effect=RuntimeError("down")
+        ):
+            with self.assertRaises(RuntimeError):
+                AccountPurger(purge, 2).run()
+
+        purge.refresh_from_db()
+        self.assertEqual(purge.state, AccountPurge.FAILED)
+        self.assertEqual(purge.deleted["core.Recipe"], 5)
+        self.assertTrue(Tag.objects.filter(user_id=self.user.id).exists())
+        self.assertEqual(schedule_purge(self.user), purge)
+
+        AccountPurger(purge, 2).run()
+        self.assertPurged(purge)
+        self.assertEqual(purge.deleted["core.Recipe"], 5)
+
+    def test_running_purge_skipped(self):
+        """Test a purge held by another purger is not run twice"""
+        purge = schedule_purge(self.user)
+        other = connection.get_new_connection(
+            connection.get_connection_params()
+        )
+        self.addCleanup(other.close)
+        with other.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_advisory_lock(%s, %s)", [LOCK_NAMESPACE, purge.pk]
+            )
+
+        self.assertIsNone(AccountPurger(purge).run())
+        self.assertTrue(Recipe.objects.filter(user_id=self.user.id).exists())
+        out = StringIO()
+        call_command("purge_accounts", stdout=out)
+        self.assertIn("Skipped purged@mail.com", out.getvalue())
+
+        # Closing the connection frees its locks only once the server
+        # process exits
+        with other.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_advisory_unlock(%s, %s)", [LOCK_NAMESPACE, purge.pk]
+            )
+        self.assertPurged(AccountPurger(purge).run())
+
+    def test_purge_accounts_command(self):
+        """Test the command queues and runs purges"""
+        out = StringIO()
+
+        call_command("purge_accounts", "purged@mail.com", stdout=out)
+
+        self.assertPurged(AccountPurge.objects.get(user_id=self.user.id))
+        self.assertIn("Purged purged@mail.com", out.getvalue())
+
+    def test_scheduled_purge_runs_on_worker(self):
+        """Test scheduling a purge queues a task that runs it"""
+        purge = schedule_purge(self.user)
+        task = Task.objects.get()
+        self.assertEqual(task.kwargs, {"purge_id": purge.id})
+
+        Worker(concurrency=1, burst=True).run()
+
+        purge.refresh_from_db()
+        self.assertPurged(purge)
+        self.assertFalse(Task.objects.exists())
@@ -0,0 +1,98 @@
+import datetime
+import decimal
+import io
+import uuid
+from collections import OrderedDict
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnList
+
+from core import parsers, renderers
+
+
+SAMPLE = ReturnList(
+    [
+        OrderedDict(
+            [
+                ("id", 1),
+                ("title", "Crème brûlée – ünïcode \u2028 line"),
+                ("price", decimal.Decimal("5.50")),
+                ("created", datetime.datetime(2021, 9, 1, 12, 30, 5, 123456)),
+                ("day", datetime.date(2021, 9, 1)),
+                ("uuid", uuid.UUID(int=1)),
+                ("lazy", gettext_lazy("Recipe")),
+                ("ratio", 0.1),
+                ("nested", {1: [None, True, False]}),
+            ]
+        )
+    ],
+    serializer=None,
+)
+
+
+class FastJSONRendererTests(TestCase):
+    """Test the orjson backed renderer"""
+
+    def test_matches_stdlib_renderer(self):
+        """Test that the output is byte-identical to JSONRenderer"""
+        self.assertEqual(
+            renderers.FastJSONRenderer().render(SAMPLE),
+            JSONRenderer().render(SAMPLE),
+        )
+
+    def test_indent_uses_stdlib_renderer(self):
+        """Test that indented output is still supported"""
+        rendered = renderers.FastJSONRenderer().render(
+            {"id": 1}, "application/json; indent=4"
+        )
+
+        self.assertEqual(rendered, b'{\n    "id": 1\n}')
+
+    def test_fallback_without_orjson(self):
+        """Test that the stdlib renderer is used when orjson is missing"""
+        with patch.object(renderers, "orjson", None):
+            rendered = renderers.FastJSONRenderer().render(SAMPLE)
+
+        self.assertEqual(rendered, JSONRenderer().render(SAMPLE))
+
+    def test_unsupported_values_use_stdlib_renderer(self):
+        """Test that values orjson cannot encode fall back to stdlib"""
+        data = {"big": 2**70}
+
+        self.assertEqual(
+            renderers.FastJSONRenderer().render(data),
+            JSONRenderer().render(data),
+        )
+
+
+class FastJSONParserTests(TestCase):
+    """Test the orjson backed parser"""
+
+    def test_parse(self):
+        """Test that JSON bodies parse like with JSONParser"""
+        body = '{"title": "Crème brûlée", "tags": [1, 2], "price": 5.5}'
+
+        self.assertEqual(
+            parsers.FastJSONParser().parse(io.BytesIO(body.encode())),
+            JSONParser().parse(io.BytesIO(body.encode())),
+        )
+
+    def test_parse_error(self):
+        """Test that invalid JSON raises a parse error"""
+        for body in (b'{"title": ', b'{"price": NaN}'):
+            with self.assertRaises(ParseError):
+                parsers.FastJSONParser().parse(io.BytesIO(body))
+
+    def test_non_utf8_uses_stdlib_parser(self):
+        """Test that bodies in other charsets are still decoded"""
+        body = '{"title": "Crème"}'.encode("latin-1")
+        data = parsers.FastJSONParser().parse(
+            io.BytesIO(body), parser_context={"encoding": "latin-1"}
+        )
+
+        self.assertEqual(data, {"title": "Crème"})
@@ -0,0 +1,78 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from core.models import Ingredient, Recipe, Tag
+from core.seeding import SEED_PASSWORD
+
+
+def snapshot():
+    """Return the seeded recipes with their tag and ingredient links"""
+    return [
+        (
+            recipe.id,
+            recipe.user.email,
+            recipe.title,
+            recipe.time_minutes,
+            recipe.price,
+            sorted(tag.name for tag in recipe.tags.all()),
+            sorted(ingredient.name for ingredient in recipe.ingredients.all()),
+        )
+        for recipe in Recipe.objects.order_by("id")
+    ]
+
+
+class SeedDatasetTests(TestCase):
+    """Test the seed_dataset command"""
+
+    def seed(self, **options):
+        options.setdefault("recipes", 60)
+        options.setdefault("users", 3)
+        call_command("seed_dataset", stdout=StringIO(), **options)
+
+    def test_seed_dataset(self):
+        """Test that the requested amounts of rows are created"""
+        self.seed(tags_per_user=5, ingredients_per_user=8)
+
+        self.assertEqual(get_user_model().objects.count(), 3)
+        self.assertEqual(Tag.objects.count(), 15)
+        self.assertEqual(Ingredient.objects.count(), 24)
+        self.assertEqual(Recipe.objects.count(), 60)
+        self.assertTrue(Recipe.ingredients.through.objects.exists())
+        for recipe in Recipe.objects.prefetch_related("tags", "ingredients"):
+            for item in [*recipe.tags.all(), *recipe.ingredients.all()]:
+                self.assertEqual(item.user_id, recipe.user_id)
+
+    def test_seeded_users_can_log_in(self):
+        """Test that seeded users share the seed password"""
+        self.seed(recipes=1, users=1)
+        user = get_user_model().objects.get()
+
+        self.assertTrue(user.check_password(SEED_PASSWORD))
+
+    def test_seed_is_reproducible(self):
+        """Test that the same seed generates the same dataset"""
+        self.seed(seed=42)
+        first = snapshot()
+        get_user_model().objects.all().delete()
+        self.seed(seed=42)
+
+        self.assertEqual(snapshot(), first)
+
+    def test_sequences_reset_after_seeding(self):
+        """Test that new rows get ids after the seeded ones"""
+        self.seed(recipes=5, users=1)
+        user = get_user_model().objects.get()
+        recipe = Recipe.objects.create(
+            user=user, title="New", time_minutes=5, price=1
+        )
+
+        self.assertEqual(recipe.id, 6)
+
+    def test_negative_amount_rejected(self):
+        """Test that negative amounts are rejected"""
+        with self.assertRaises(CommandError):
+            self.seed(recipes=-1)
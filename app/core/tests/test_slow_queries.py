@@ -0,0 +1,71 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import SlowQuery
+from core.slow_queries import explain, normalize_sql
+
+
+RECIPES_URL = reverse("recipe:recipe-list")
+
+
+class SlowQueryTests(TestCase):
+    """Test slow query capture"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "user@mail.com", "testpass"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_normalize_sql(self):
+        """Test that whitespace, placeholder lists and numbers collapse"""
+        sql = 'SELECT  "id"\n FROM "t" WHERE "id" IN (%s, %s, %s) LIMIT 21'
+
+        self.assertEqual(
+            normalize_sql(sql),
+            'SELECT "id" FROM "t" WHERE "id" IN (...) LIMIT ?',
+        )
+
+    @override_settings(
+        SLOW_QUERY_THRESHOLD_MS=0,
+        SLOW_QUERY_ASYNC=False,
+        SLOW_QUERY_EXPLAIN_SAMPLE_RATE=1,
+    )
+    def test_slow_queries_recorded_with_view_and_filters(self):
+        """Test that slow queries keep their view, filters and plan"""
+        self.client.get(RECIPES_URL, {"tags": "1", "ingredients": "2"})
+        recorded = SlowQuery.objects.filter(view="RecipeViewSet.list")
+
+        self.assertTrue(recorded.exists())
+        query = recorded.filter(normalized_sql__contains="core_recipe").last()
+        self.assertEqual(query.filters, "ingredients,tags")
+        self.assertEqual(len(query.fingerprint), 32)
+        if connection.vendor == "postgresql":
+            self.assertIn("actual time", query.explain)
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=60000, SLOW_QUERY_ASYNC=False)
+    def test_fast_queries_ignored(self):
+        """Test that queries under the threshold are not recorded"""
+        self.client.get(RECIPES_URL)
+
+        self.assertFalse(SlowQuery.objects.exists())
+
+    def test_explain_rolled_back(self):
+        """Test that statements run by EXPLAIN ANALYZE leave no locks"""
+        if connection.vendor != "postgresql":
+            self.skipTest("EXPLAIN is only run on PostgreSQL")
+
+        plan = explain("SELECT pg_advisory_xact_lock(%s)", [4242])
+
+        self.assertIn("actual time", plan)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT count(*) FROM pg_locks"
+                " WHERE locktype = 'advisory' AND objid = 4242"
+                " AND pid = pg_backend_pid()"
+            )
+            self.assertEqual(cursor.fetchone()[0], 0)
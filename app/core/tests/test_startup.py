@@ -0,0 +1,117 @@
+import asyncio
+import importlib
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.utils import OperationalError
+from django.test import TestCase, override_settings
+
+from core import startup
+
+
+COMMAND = "core.management.commands.startup"
+
+
+class StartupTests(TestCase):
+    """Test skipping migrate and warming up on start"""
+
+    def test_migration_files(self):
+        """Test migration files are listed without package modules"""
+        names = startup.migration_files()
+
+        self.assertIn(("core", "0001_initial"), names)
+        self.assertIn(("auth", "0001_initial"), names)
+        self.assertFalse(any(name.startswith("_") for _, name in names))
+
+    def test_no_pending_migrations(self):
+        """Test a migrated database has nothing pending"""
+        self.assertEqual(startup.pending_migrations(), set())
+
+    def test_unapplied_migration_pending(self):
+        """Test a migration missing from django_migrations is pending"""
+        MigrationRecorder.Migration.objects.filter(
+            app="core", name="0001_initial"
+        ).delete()
+
+        self.assertEqual(
+            startup.pending_migrations(), {("core", "0001_initial")}
+        )
+
+    def test_fingerprint(self):
+        """Test the fingerprint only depends on the set of migrations"""
+        names = [("core", "0001_initial"), ("auth", "0001_initial")]
+
+        self.assertEqual(
+            startup.fingerprint(names), startup.fingerprint(names[::-1])
+        )
+        self.assertNotEqual(
+            startup.fingerprint(names), startup.fingerprint(names[:1])
+        )
+
+    @patch("time.sleep", return_value=None)
+    def test_wait_for_database(self, sleep):
+        """Test waiting retries until the database accepts connections"""
+        with patch(
+            "django.db.backends.base.base.BaseDatabaseWrapper"
+            ".ensure_connection",
+            side_effect=[OperationalError] * 3 + [None],
+        ) as ensure:
+            startup.wait_for_database()
+
+        self.assertEqual(ensure.call_count, 4)
+        self.assertEqual(sleep.call_count, 3)
+
+    def test_warm_up(self):
+        """Test warming up reports the time of each phase"""
+        timings = startup.warm_up()
+
+        self.assertEqual(set(timings), {"imports_s"})
+
+    @override_settings(STARTUP_WARM_UP=True)
+    def test_asgi_loads_in_event_loop(self):
+        """Test the ASGI module loads inside a running loop, like uvicorn"""
+        from app import asgi
+
+        async def load():
+            return importlib.reload(asgi)
+
+        self.assertTrue(callable(asyncio.run(load()).application))
+
+    @patch(f"{COMMAND}.call_command")
+    def test_startup_skips_migrate(self, migrate):
+        """Test the command skips migrate when nothing is pending"""
+        out = StringIO()
+        call_command("startup", stdout=out)
+
+        migrate.assert_not_called()
+        self.assertIn("skipping migrate", out.getvalue())
+        self.assertIn("Ready in", out.getvalue())
+
+    @patch(f"{COMMAND}.call_command")
+    def test_startup_migrates_when_pending(self, migrate):
+        """Test the command runs migrate for pending migrations"""
+        with patch.object(
+            startup,
+            "pending_migrations",
+            return_value={("core", "9999_new")},
+        ):
+            call_command("startup", stdout=StringIO())
+
+        migrate.assert_called_once()
+        self.assertEqual(migrate.call_args[0], ("migrate",))
+
+    def test_startup_clears_metrics_files(self):
+        """Test the command removes the samples of previous processes"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(os.rmdir, directory)
+        for filename in ("1-a.json", "2-b.json.3.tmp"):
+            open(os.path.join(directory, filename), "w").close()
+
+        with override_settings(METRICS_MULTIPROC_DIR=directory):
+            call_command("startup", stdout=StringIO())
+
+        self.assertEqual(os.listdir(directory), [])
@@ -0,0 +1,22 @@
+from django.test import SimpleTestCase
+from rest_framework.renderers import JSONRenderer
+
+from core.streaming import stream_json_array
+
+
+class StreamJsonArrayTests(SimpleTestCase):
+    """Test writing a JSON array from chunks"""
+
+    def test_matches_rendered_list(self):
+        """Test that the streamed array renders like the whole list"""
+        chunks = [[{"id": 1}, {"id": 2}], [], [{"id": 3, "tags": [1, 2]}]]
+        items = [item for chunk in chunks for item in chunk]
+
+        self.assertEqual(
+            b"".join(stream_json_array(chunks)), JSONRenderer().render(items)
+        )
+
+    def test_empty(self):
+        """Test that no chunks stream an empty array"""
+        self.assertEqual(b"".join(stream_json_array([])), b"[]")
+        self.assertEqual(b"".join(stream_json_array([[], []])), b"[]")
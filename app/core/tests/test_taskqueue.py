@@ -0,0 +1,185 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from core import metrics
+from core.models import Task
+from core.taskqueue import Worker, queue_depth, retry_delay, task
+
+
+CALLS = []
+
+
+@task()
+def record(value):
+    """Remember the value it was called with"""
+    CALLS.append(value)
+
+
+@task(max_attempts=2)
+def fail():
+    """Always raise"""
+    raise RuntimeError("broken")
+
+
+def not_a_task():
+    pass
+
+
+class TaskQueueTests(TestCase):
+    """Test queueing and running tasks"""
+
+    def setUp(self):
+        CALLS.clear()
+
+    def run_worker(self):
+        return Worker(concurrency=1, burst=True).run()
+
+    def test_enqueue(self):
+        """Test a queued call is stored with its name and kwargs"""
+        queued = record.enqueue(delay=30, value=1)
+
+        self.assertEqual(queued.name, "core.tests.test_taskqueue.record")
+        self.assertEqual(queued.kwargs, {"value": 1})
+        self.assertEqual(queued.max_attempts, 5)
+        self.assertGreater(
+            queued.available_at, timezone.now() + timedelta(seconds=20)
+        )
+
+    def test_worker_runs_ready_tasks(self):
+        """Test ready tasks run in order and are deleted, delayed ones wait"""
+        record.enqueue(value=1)
+        record.enqueue(value=2)
+        record.enqueue(delay=60, value=3)
+
+        self.assertEqual(self.run_worker(), 2)
+
+        self.assertEqual(CALLS, [1, 2])
+        self.assertEqual(Task.objects.get().kwargs, {"value": 3})
+
+    def test_failed_task_retried_with_backoff(self):
+        """Test a failing task is queued again until it used its attempts"""
+        queued = fail.enqueue()
+
+        with self.assertLogs("core.taskqueue", "WARNING"):
+            self.run_worker()
+        queued.refresh_from_db()
+        self.assertEqual(queued.state, Task.QUEUED)
+        self.assertEqual(queued.attempts, 1)
+        self.assertIn("broken", queued.error)
+        self.assertGreater(
+            queued.available_at, timezone.now() + timedelta(seconds=5)
+        )
+
+        Task.objects.update(available_at=timezone.now())
+        with self.assertLogs("core.taskqueue", "ERROR"):
+            self.run_worker()
+        queued.refresh_from_db()
+        self.assertEqual(queued.state, Task.FAILED)
+        self.assertEqual(queued.attempts, 2)
+
+    @override_settings(TASK_RETRY_BACKOFF=10, TASK_RETRY_BACKOFF_MAX=60)
+    def test_retry_delay(self):
+        """Test the backoff doubles per attempt up to the maximum"""
+        self.assertEqual(
+            [retry_delay(attempts) for attempts in range(1, 6)],
+            [10, 20, 40, 60, 60],
+        )
+
+    def test_expired_task_claimed_again(self):
+        """Test a task whose worker died is retried after the timeout"""
+        past = timezone.now() - timedelta(seconds=1)
+        Task.objects.create(
+            name=record.name,
+            kwargs={"value": 1},
+            state=Task.RUNNING,
+            attempts=1,
+            available_at=past,
+        )
+        dead = Task.objects.create(
+            name=record.name,
+            kwargs={"value": 2},
+            state=Task.RUNNING,
+            attempts=5,
+            available_at=past,
+        )
+        running = Task.objects.create(
+            name=record.name,
+            kwargs={"value": 3},
+            state=Task.RUNNING,
+            attempts=1,
+            available_at=timezone.now() + timedelta(seconds=60),
+        )
+
+        self.run_worker()
+
+        self.assertEqual(CALLS, [1])
+        dead.refresh_from_db()
+        self.assertEqual(dead.state, Task.FAILED)
+        running.refresh_from_db()
+        self.assertEqual(running.state, Task.RUNNING)
+
+    def test_claim_hides_task(self):
+        """Test a claimed task is not claimed again before the timeout"""
+        record.enqueue(value=1)
+        worker = Worker(visibility_timeout=60)
+
+        claimed = worker.claim()
+
+        self.assertEqual(claimed.state, Task.RUNNING)
+        self.assertEqual(claimed.attempts, 1)
+        self.assertIsNone(worker.claim())
+
+    def test_only_task_functions_run(self):
+        """Test a name that is not a task function fails the task"""
+        queued = Task.objects.create(
+            name="core.tests.test_taskqueue.not_a_task", max_attempts=1
+        )
+
+        with self.assertLogs("core.taskqueue", "ERROR"):
+            self.run_worker()
+
+        queued.refresh_from_db()
+        self.assertEqual(queued.state, Task.FAILED)
+        self.assertIn("is not a task", queued.error)
+
+    def test_queue_depth_metric(self):
+        """Test the queue depth gauge counts unfinished tasks"""
+        record.enqueue(value=1)
+        record.enqueue(delay=60, value=2)
+        fail.enqueue()
+        Task.objects.filter(name=fail.name).update(state=Task.FAILED)
+
+        self.assertEqual(queue_depth(), 2)
+        self.assertIn("task_queue_depth 2", metrics.registry.render())
+
+    def test_run_worker_command(self):
+        """Test the command runs the queue until it is empty"""
+        record.enqueue(value=1)
+        out = StringIO()
+
+        call_command("run_worker", burst=True, concurrency=1, stdout=out)
+
+        self.assertEqual(CALLS, [1])
+        self.assertIn("stopped after 1 tasks", out.getvalue())
+
+
+class ConcurrentWorkerTests(TransactionTestCase):
+    """Test workers sharing the queue"""
+
+    def setUp(self):
+        CALLS.clear()
+
+    def test_each_task_runs_once(self):
+        """Test concurrent threads never run the same task twice"""
+        for value in range(40):
+            record.enqueue(value=value)
+
+        processed = Worker(concurrency=4, burst=True).run()
+
+        self.assertEqual(processed, 40)
+        self.assertEqual(sorted(CALLS), list(range(40)))
+        self.assertFalse(Task.objects.exists())
@@ -0,0 +1,157 @@
+from unittest.mock import Mock, patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from core.throttling import SlidingWindowThrottle
+
+
+TOKEN_URL = reverse("user:token")
+RECIPES_URL = reverse("recipe:recipe-list")
+
+
+def upload_url(recipe_id):
+    return reverse("recipe:recipe-upload-image", args=[recipe_id])
+
+
+class SampleThrottle(SlidingWindowThrottle):
+    scope = "sample"
+
+
+class SlidingWindowThrottleTests(TestCase):
+    """Test the sliding window estimate and retry delay"""
+
+    def setUp(self):
+        cache.clear()
+        self.request = Mock(user=None, META={"REMOTE_ADDR": "10.0.0.1"})
+
+    def allow(self, now):
+        with patch.object(SampleThrottle, "timer", Mock(return_value=now)):
+            throttle = SampleThrottle()
+            return throttle, throttle.allow_request(self.request, None)
+
+    @override_settings(THROTTLE_RATES={"sample": "10/min"})
+    def test_previous_window_slides_out(self):
+        """Test that the previous window counts for its overlapping part"""
+        for _ in range(10):
+            self.assertTrue(self.allow(60.0)[1])
+
+        self.assertFalse(self.allow(119.0)[1])
+        for _ in range(5):
+            self.assertTrue(self.allow(150.0)[1])
+
+        throttle, allowed = self.allow(150.0)
+
+        self.assertFalse(allowed)
+        self.assertEqual(throttle.wait(), 6)
+
+    @override_settings(THROTTLE_RATES={"sample": "10/min"})
+    def test_full_current_window_waits_for_next(self):
+        """Test the delay when the current window alone is over the limit"""
+        for _ in range(10):
+            self.allow(60.0)
+        throttle, allowed = self.allow(90.0)
+
+        self.assertFalse(allowed)
+        self.assertEqual(throttle.wait(), 36)
+
+    @override_settings(THROTTLE_RATES={})
+    def test_scope_without_rate_not_limited(self):
+        """Test that scopes missing from THROTTLE_RATES are not limited"""
+        for _ in range(100):
+            self.assertTrue(self.allow(60.0)[1])
+
+    @override_settings(THROTTLE_RATES={"sample": ""})
+    def test_empty_rate_not_limited(self):
+        """Test that an empty rate turns the scope's limit off"""
+        for _ in range(100):
+            self.assertTrue(self.allow(60.0)[1])
+
+
+class ApiThrottlingTests(TestCase):
+    """Test the rate limits of the API views"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "user@mail.com", "testpass"
+        )
+
+    @override_settings(THROTTLE_RATES={"login": "2/min"})
+    def test_login_limited_with_retry_after(self):
+        """Test that logins are limited per client with Retry-After"""
+        payload = {"email": "user@mail.com", "password": "testpass"}
+        for _ in range(2):
+            response = self.client.post(TOKEN_URL, payload)
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(
+            response.status_code, status.HTTP_429_TOO_MANY_REQUESTS
+        )
+        self.assertGreater(int(response["Retry-After"]), 0)
+
+    @override_settings(THROTTLE_RATES={"login": "2/min"})
+    def test_forwarded_for_ignored(self):
+        """Test that clients cannot pick their address with X-Forwarded-For"""
+        payload = {"email": "user@mail.com", "password": "testpass"}
+        statuses = [
+            self.client.post(
+                TOKEN_URL, payload, HTTP_X_FORWARDED_FOR=f"10.0.0.{n}"
+            ).status_code
+            for n in range(3)
+        ]
+
+        self.assertEqual(statuses[-1], status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(THROTTLE_RATES={"anon": "25/min"})
+    def test_login_cost_weighted(self):
+        """Test that a login counts as several anonymous requests"""
+        payload = {"email": "user@mail.com", "password": "wrong"}
+        statuses = [
+            self.client.post(TOKEN_URL, payload).status_code for _ in range(3)
+        ]
+
+        self.assertEqual(
+            statuses,
+            [
+                status.HTTP_400_BAD_REQUEST,
+                status.HTTP_400_BAD_REQUEST,
+                status.HTTP_429_TOO_MANY_REQUESTS,
+            ],
+        )
+
+    @override_settings(THROTTLE_RATES={"user": "25/min"})
+    def test_image_upload_cost_weighted_per_user(self):
+        """Test that uploads use up more of the user's limit than reads"""
+        recipe = Recipe.objects.create(
+            user=self.user, title="Sample", time_minutes=5, price=5
+        )
+        self.client.force_authenticate(self.user)
+        for _ in range(2):
+            self.client.post(upload_url(recipe.id), {"image": "notimage"})
+
+        response = self.client.post(upload_url(recipe.id), {"image": "x"})
+
+        self.assertEqual(
+            response.status_code, status.HTTP_429_TOO_MANY_REQUESTS
+        )
+        self.assertEqual(
+            self.client.get(RECIPES_URL).status_code, status.HTTP_200_OK
+        )
+
+        other = get_user_model().objects.create_user(
+            "other@mail.com", "testpass"
+        )
+        self.client.force_authenticate(other)
+        response = self.client.post(upload_url(recipe.id), {"image": "x"})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
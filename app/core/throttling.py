@@ -0,0 +1,154 @@
+"""
+Rate limiting with sliding window counters in the shared cache.
+
+Rates are read from the THROTTLE_RATES setting on every request, keyed by
+scope, and a scope without a rate is not limited. Views name their
+endpoint scope with throttle_scope, or throttle_scopes keyed by viewset
+action, and can make expensive requests count more than once against the
+user and anonymous limits with throttle_cost or throttle_costs.
+"""
+import math
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import SimpleRateThrottle
+
+from core import metrics
+
+
+def view_option(view, name, default=None):
+    """Return a per action option of a viewset, or the option of a view
+
+    For name "throttle_scope" this looks up the action of the request in
+    a throttle_scopes dict, falling back to a throttle_scope attribute.
+    """
+    by_action = getattr(view, f"{name}s", None) or {}
+    action = getattr(view, "action", None)
+    if action in by_action:
+        return by_action[action]
+    return getattr(view, name, default)
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """Approximate sliding window limit with counters in a shared cache
+
+    Each key has one counter per fixed window of the rate's duration. The
+    usage over the last duration is estimated as the current counter plus
+    the part of the previous counter that still overlaps the sliding
+    window. Counters change with atomic cache increments, so the limit
+    holds across worker processes sharing a memcached server, and a
+    refused request gives its increment back.
+    """
+
+    cache_format = "throttle:%(scope)s:%(ident)s"
+
+    def __init__(self):
+        self.cache = caches[settings.THROTTLE_CACHE]
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+
+    def get_rate(self):
+        return settings.THROTTLE_RATES.get(self.scope) or None
+
+    def get_cost(self, request, view):
+        """Return how many requests this request counts as"""
+        return 1
+
+    def get_ident(self, request):
+        """Return the user id, or the client address when anonymous"""
+        if request.user and request.user.is_authenticated:
+            return f"user-{request.user.pk}"
+        return super().get_ident(request)
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            "scope": self.scope,
+            "ident": self.get_ident(request),
+        }
+
+    def _increment(self, key, cost):
+        self.cache.add(key, 0, self.duration * 2)
+        try:
+            return self.cache.incr(key, cost)
+        except ValueError:
+            # The counter expired between add and incr
+            self.cache.set(key, cost, self.duration * 2)
+            return cost
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+
+        self.cost = self.get_cost(request, view)
+        position = self.timer() / self.duration
+        window = int(position)
+        self.elapsed = position - window
+        current_key = f"{key}:{window}"
+        self.current = self._increment(current_key, self.cost)
+        self.previous = self.cache.get(f"{key}:{window - 1}", 0)
+
+        if (
+            self.previous * (1 - self.elapsed) + self.current
+            <= self.num_requests
+        ):
+            return True
+        self.cache.decr(current_key, self.cost)
+        self.current -= self.cost
+        metrics.throttled_requests_total.inc(scope=self.scope)
+        return False
+
+    def wait(self):
+        """Return the seconds until a request of the same cost is allowed"""
+        limit, cost = self.num_requests, self.cost
+        if cost > limit:
+            return None
+        if self.current + cost <= limit:
+            # Allowed once enough of the previous window has slid out
+            needed = 1 - (limit - self.current - cost) / self.previous
+            return math.ceil((needed - self.elapsed) * self.duration)
+        # Allowed once the current window is the previous one
+        needed = max(0, 1 - (limit - cost) / self.current)
+        return math.ceil((1 - self.elapsed + needed) * self.duration)
+
+
+class UserThrottle(SlidingWindowThrottle):
+    """Limit the weighted requests of each authenticated user"""
+
+    scope = "user"
+
+    def get_cache_key(self, request, view):
+        if not request.user or not request.user.is_authenticated:
+            return None
+        return super().get_cache_key(request, view)
+
+    def get_cost(self, request, view):
+        return view_option(view, "throttle_cost", 1)
+
+
+class AnonThrottle(UserThrottle):
+    """Limit the weighted anonymous requests of each client address"""
+
+    scope = "anon"
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        return SlidingWindowThrottle.get_cache_key(self, request, view)
+
+
+class ScopedThrottle(SlidingWindowThrottle):
+    """Limit the requests to an endpoint scope per user or client address"""
+
+    def __init__(self):
+        # The scope, and so the rate, depends on the view
+        pass
+
+    def allow_request(self, request, view):
+        self.scope = view_option(view, "throttle_scope")
+        if not self.scope:
+            return True
+        super().__init__()
+        return super().allow_request(request, view)
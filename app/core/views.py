@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+
+from core.metrics import registry
+
+
+@require_GET
+def metrics(request):
+    """Expose the metrics registry in the Prometheus text format"""
+    token = settings.METRICS_TOKEN
+    if token:
+        expected = f"Bearer {token}"
+        provided = request.META.get("HTTP_AUTHORIZATION", "")
+        if not constant_time_compare(provided, expected):
+            return HttpResponseForbidden()
+
+    return HttpResponse(
+        registry.render(), content_type="text/plain; version=0.0.4"
+    )
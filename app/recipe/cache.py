@@ -0,0 +1,157 @@
+"""
+Cache of serialized recipes, by recipe id and version.
+
+Each recipe has a version token in the cache, replaced whenever the
+recipe is saved or deleted, its links change, or a linked tag or
+ingredient is renamed or deleted. Serialized recipes are stored under the
+id, the version and the fields and relations they show, so changes never
+overwrite entries; they make them unreachable. Versions are read before
+the database, and replaced again when the changing transaction commits,
+so an entry built from rows read before a commit is never served after
+it. Bulk operations that skip the model signals, such as
+QuerySet.update(), must call bump() themselves.
+
+Several worker processes need the shared cache of CACHE_LOCATION, or each
+process would keep entries the others cannot invalidate, so RECIPE_CACHE
+is empty, which disables the cache, unless CACHE_LOCATION is set.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+
+from core import metrics
+from core.models import Ingredient, Recipe, Tag
+
+
+def _cache():
+    return caches[settings.RECIPE_CACHE]
+
+
+def _version_key(pk):
+    return f"recipe:version:{pk}"
+
+
+def enabled():
+    """Return whether RECIPE_CACHE names a cache"""
+    return bool(settings.RECIPE_CACHE)
+
+
+def bump(pks, using=DEFAULT_DB_ALIAS):
+    """Make the cached entries of some recipes unreachable"""
+    pks = list(pks)
+    if not pks or not enabled():
+        return
+
+    def replace():
+        _cache().set_many(
+            {_version_key(pk): uuid.uuid4().hex for pk in pks}, None
+        )
+
+    replace()
+    if connections[using].in_atomic_block:
+        # Readers may have cached the old rows until the commit
+        transaction.on_commit(replace, using=using)
+
+
+class RecipeCache:
+    """Cached output of a read serializer, by recipe id
+
+    lookup() reads the versions that store() stores the entries under, so
+    call it before loading the recipes that were not found.
+    """
+
+    def __init__(self, serializer):
+        fields = ",".join(serializer.output_fields)
+        expand = ",".join(sorted(serializer.expand))
+        self.variant = f"{fields}:{expand}"
+        self.versions = {}
+
+    def _key(self, pk):
+        return f"recipe:detail:{pk}:{self.versions[pk]}:{self.variant}"
+
+    def lookup(self, pks):
+        """Return the cached entries of pks as {pk: entry}"""
+        cache = _cache()
+        pks = list(pks)
+        found = cache.get_many([_version_key(pk) for pk in pks])
+        missing = {}
+        for pk in pks:
+            version = found.get(_version_key(pk))
+            if version is None:
+                version = missing[_version_key(pk)] = uuid.uuid4().hex
+            self.versions[pk] = version
+        if missing:
+            cache.set_many(missing, None)
+
+        keys = {self._key(pk): pk for pk in pks}
+        entries = {
+            keys[key]: entry for key, entry in cache.get_many(keys).items()
+        }
+        for pk in pks:
+            metrics.record_cache_lookup("recipe", pk in entries)
+        return entries
+
+    def store(self, entries):
+        """Cache {pk: entry} for pks passed to lookup()"""
+        _cache().set_many(
+            {self._key(pk): entry for pk, entry in entries.items()},
+            settings.RECIPE_CACHE_TIMEOUT,
+        )
+
+
+def linked_recipes(instance):
+    """Return the recipes linked to a tag or ingredient"""
+    field = "tag_ids" if isinstance(instance, Tag) else "ingredient_ids"
+    return Recipe.objects.filter(**{f"{field}__contains": [instance.pk]})
+
+
+def _recipe_changed(sender, instance, using, **kwargs):
+    bump([instance.pk], using)
+
+
+def _linked_saved(sender, instance, created, raw, using, **kwargs):
+    if created or raw:
+        return
+    update_fields = kwargs["update_fields"]
+    if update_fields is not None and "name" not in update_fields:
+        return
+    bump(linked_recipes(instance).values_list("id", flat=True), using)
+
+
+def _linked_deleting(sender, instance, using, **kwargs):
+    # The arrays lose the id when it is deleted
+    bump(linked_recipes(instance).values_list("id", flat=True), using)
+
+
+def _links_changed(sender, instance, action, reverse, pk_set, using, **kwargs):
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            bump([instance.pk], using)
+    elif action == "pre_clear":
+        bump(linked_recipes(instance).values_list("id", flat=True), using)
+    elif action in ("post_add", "post_remove"):
+        bump(pk_set, using)
+
+
+def connect():
+    """Connect the handlers that replace the versions of changed recipes"""
+    post_save.connect(_recipe_changed, sender=Recipe, dispatch_uid="cache")
+    post_delete.connect(_recipe_changed, sender=Recipe, dispatch_uid="cache")
+    for model in (Tag, Ingredient):
+        uid = f"cache.{model._meta.label}"
+        post_save.connect(_linked_saved, sender=model, dispatch_uid=uid)
+        pre_delete.connect(_linked_deleting, sender=model, dispatch_uid=uid)
+    for through in (Recipe.tags.through, Recipe.ingredients.through):
+        m2m_changed.connect(
+            _links_changed,
+            sender=through,
+            dispatch_uid=f"cache.{through._meta.label}",
+        )
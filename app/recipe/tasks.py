@@ -0,0 +1,9 @@
+from core.models import Recipe
+from core.taskqueue import task
+
+
+@task()
+def delete_unused_image(name):
+    """Delete a recipe image file unless a recipe still uses it"""
+    if not Recipe.objects.filter(image=name).exists():
+        Recipe._meta.get_field("image").storage.delete(name)
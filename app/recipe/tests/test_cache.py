@@ -0,0 +1,158 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+
+
+RECIPES_URL = reverse("recipe:recipe-list")
+
+
+def detail_url(recipe_id):
+    return reverse("recipe:recipe-detail", args=[recipe_id])
+
+
+@override_settings(RECIPE_CACHE="default")
+class RecipeCacheTests(TestCase):
+    """Test serving recipes from the versioned recipe cache"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "user@mail.com", "testpass"
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name="Vegan")
+        self.ingredient = Ingredient.objects.create(
+            user=self.user, name="Salt"
+        )
+        self.recipe = Recipe.objects.create(
+            user=self.user, title="Soup", time_minutes=5, price=1
+        )
+        self.recipe.tags.add(self.tag)
+        self.recipe.ingredients.add(self.ingredient)
+        self.url = detail_url(self.recipe.id)
+
+    def assertCached(self, url, **params):
+        """Assert a GET is answered from the cache and return its data"""
+        with self.assertNumQueries(0):
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_detail_cached(self):
+        """Test a detail is served from the cache the second time"""
+        with self.assertNumQueries(3):
+            first = self.client.get(self.url).data
+
+        self.assertEqual(self.assertCached(self.url), first)
+        self.assertEqual(first["tags"], [{"id": self.tag.id, "name": "Vegan"}])
+
+    def test_fields_cached_separately(self):
+        """Test the fields and expand options have their own entries"""
+        self.client.get(self.url)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {"fields": "id,title"})
+
+        self.assertEqual(
+            response.data, {"id": self.recipe.id, "title": "Soup"}
+        )
+        self.assertEqual(
+            self.assertCached(self.url, fields="id,title"), response.data
+        )
+
+    def test_recipe_update_invalidates(self):
+        """Test saving a recipe or changing its links shows in the detail"""
+        self.client.get(self.url)
+
+        self.client.patch(self.url, {"title": "Stew"})
+        self.assertEqual(self.client.get(self.url).data["title"], "Stew")
+
+        self.recipe.tags.clear()
+        self.assertEqual(self.client.get(self.url).data["tags"], [])
+
+    def test_tag_changes_invalidate(self):
+        """Test renaming, linking and deleting tags shows in the detail"""
+        self.client.get(self.url)
+
+        self.tag.name = "Vegetarian"
+        self.tag.save()
+        tags = self.client.get(self.url).data["tags"]
+        self.assertEqual(tags, [{"id": self.tag.id, "name": "Vegetarian"}])
+
+        other = Tag.objects.create(user=self.user, name="Quick")
+        other.recipe_set.add(self.recipe)
+        self.assertEqual(len(self.client.get(self.url).data["tags"]), 2)
+
+        self.ingredient.delete()
+        self.assertEqual(self.client.get(self.url).data["ingredients"], [])
+
+    def test_other_user_not_served(self):
+        """Test a cached recipe is not served to another user"""
+        self.client.get(self.url)
+        other = get_user_model().objects.create_user(
+            "other@mail.com", "testpass"
+        )
+        self.client.force_authenticate(other)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_filters_bypass_cache(self):
+        """Test filter parameters are still applied to a cached recipe"""
+        self.client.get(self.url)
+
+        response = self.client.get(self.url, {"min_price": "2.00"})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_bumped_again_on_commit(self):
+        """Test versions are replaced again when the change commits"""
+        self.client.get(self.url)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.recipe.save()
+
+        self.assertEqual(len(callbacks), 1)
+
+    def test_page_from_cache(self):
+        """Test a page of the list is built from cached recipes"""
+        others = [
+            Recipe.objects.create(
+                user=self.user, title=f"Recipe {n}", time_minutes=5, price=1
+            )
+            for n in range(3)
+        ]
+        self.client.get(detail_url(others[0].id), {"expand": ""})
+
+        with self.assertNumQueries(5):
+            first = self.client.get(RECIPES_URL, {"page": 1}).data
+
+        # Only the count and the page rows are read
+        with self.assertNumQueries(3):
+            second = self.client.get(RECIPES_URL, {"page": 1}).data
+        self.assertEqual(second, first)
+
+        others[1].title = "Renamed"
+        others[1].save()
+        titles = [
+            recipe["title"]
+            for recipe in self.client.get(RECIPES_URL, {"page": 1}).data[
+                "results"
+            ]
+        ]
+        self.assertIn("Renamed", titles)
+
+    @override_settings(RECIPE_CACHE="")
+    def test_cache_disabled(self):
+        """Test an empty RECIPE_CACHE reads recipes every time"""
+        self.client.get(self.url)
+
+        with self.assertNumQueries(3):
+            self.client.get(self.url)
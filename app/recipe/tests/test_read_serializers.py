@@ -0,0 +1,87 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Prefetch
+from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Ingredient, Recipe, Tag
+from recipe import serializers
+
+
+def render(serializer):
+    """Render serializer output exactly like the API does"""
+    return JSONRenderer().render(serializer.data)
+
+
+class ReadSerializerTests(TestCase):
+    """Test that fast read serializers match the model serializers"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "user@mail.com", "testpass"
+        )
+        tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ("Vegan", "Dessert", "Quick")
+        ]
+        ingredients = [
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in ("Salt", "Flour")
+        ]
+        for i, price in enumerate(("5.00", "12.5", "0.99")):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=f"Recipe {i} – ünïcode",
+                time_minutes=10 + i,
+                price=price,
+                link="https://example.com" if i else "",
+            )
+            recipe.tags.set(tags[: i + 1])
+            recipe.ingredients.set(ingredients[:i])
+
+    def test_recipe_list_identical(self):
+        """Test that the recipe list renders to identical bytes"""
+        recipes = Recipe.objects.order_by("-id")
+
+        self.assertEqual(
+            render(serializers.RecipeReadSerializer(recipes, many=True)),
+            render(serializers.RecipeSerializer(recipes, many=True)),
+        )
+
+    def test_recipe_detail_identical(self):
+        """Test that recipe details render to identical bytes"""
+        # Unordered joins may return links in any order
+        recipes = Recipe.objects.prefetch_related(
+            Prefetch("tags", queryset=Tag.objects.order_by("id")),
+            Prefetch(
+                "ingredients", queryset=Ingredient.objects.order_by("id")
+            ),
+        )
+        for recipe in recipes:
+            self.assertEqual(
+                render(serializers.RecipeDetailReadSerializer(recipe)),
+                render(serializers.RecipeDetailSerializer(recipe)),
+            )
+
+    def test_tag_and_ingredient_lists_identical(self):
+        """Test that tag and ingredient lists render to identical bytes"""
+        pairs = (
+            (Tag, serializers.TagReadSerializer, serializers.TagSerializer),
+            (
+                Ingredient,
+                serializers.IngredientReadSerializer,
+                serializers.IngredientSerializer,
+            ),
+        )
+        for model, read_serializer, serializer in pairs:
+            queryset = model.objects.order_by("-name")
+            self.assertEqual(
+                render(read_serializer(queryset, many=True)),
+                render(serializer(queryset, many=True)),
+            )
+
+    def test_recipe_list_query_count(self):
+        """Test that listing recipes takes a fixed number of queries"""
+        recipes = Recipe.objects.order_by("-id")
+
+        with self.assertNumQueries(3):
+            serializers.RecipeReadSerializer(recipes, many=True).data
@@ -1,14 +1,21 @@
+import base64
+import json
 import tempfile
 import os
+from decimal import Decimal
+from unittest.mock import patch
+
 from PIL import Image
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Recipe, Tag, Ingredient
+from core.models import Recipe, Tag, Ingredient, Task
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
+from recipe.tasks import delete_unused_image
+from recipe.views import RecipeViewSet
 
 
 RECIPES_URL = reverse("recipe:recipe-list")
@@ -24,6 +31,15 @@ def detail_url(recipe_id):
     return reverse("recipe:recipe-detail", args=[recipe_id])
 
 
+def clone_url(recipe_id):
+    """Return recipe clone URL"""
+    return reverse("recipe:recipe-clone", args=[recipe_id])
+
+
+CLONE_BATCH_URL = reverse("recipe:recipe-clone-batch")
+FACETS_URL = reverse("recipe:recipe-facets")
+
+
 def sample_tag(user, name="Main course"):
     """Create and return a sample tag"""
     return Tag.objects.create(user=user, name=name)
@@ -109,6 +125,111 @@ class PrivateRecipeApiTests(TestCase):
 
         self.assertEqual(response.data, serializer.data)
 
+    def test_list_recipes_sparse_fields(self):
+        """Test listing only the requested recipe fields"""
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(sample_tag(user=self.user))
+
+        with self.assertNumQueries(1):
+            response = self.client.get(RECIPES_URL, {"fields": "title,id"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data, [{"id": recipe.id, "title": recipe.title}]
+        )
+
+    def test_list_recipes_expand_tags(self):
+        """Test nesting tags in the recipe list"""
+        recipe = sample_recipe(user=self.user)
+        tag = sample_tag(user=self.user)
+        recipe.tags.add(tag)
+        ingredient = sample_ingredient(user=self.user)
+        recipe.ingredients.add(ingredient)
+        response = self.client.get(
+            RECIPES_URL, {"fields": "id,tags,ingredients", "expand": "tags"}
+        )
+
+        self.assertEqual(
+            response.data,
+            [
+                {
+                    "id": recipe.id,
+                    "ingredients": [ingredient.id],
+                    "tags": [{"id": tag.id, "name": tag.name}],
+                }
+            ],
+        )
+
+    def test_view_recipe_detail_without_expansion(self):
+        """Test viewing a recipe detail with related ids only"""
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(sample_tag(user=self.user))
+        response = self.client.get(detail_url(recipe.id), {"expand": ""})
+        serializer = RecipeSerializer(recipe)
+
+        self.assertEqual(response.data, serializer.data)
+
+    def test_view_recipe_detail_sparse_fields(self):
+        """Test that unrequested relations of a detail are not loaded"""
+        recipe = sample_recipe(user=self.user)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                detail_url(recipe.id), {"fields": "id,price"}
+            )
+
+        self.assertEqual(response.data, {"id": recipe.id, "price": "5.00"})
+
+    def test_stream_recipes(self):
+        """Test that a streamed recipe list matches the regular list"""
+        for index in range(5):
+            recipe = sample_recipe(user=self.user, title=f"Recipe {index}")
+            recipe.tags.add(sample_tag(user=self.user, name=f"Tag {index}"))
+        params = {"fields": "id,title,tags", "expand": "tags"}
+        response = self.client.get(RECIPES_URL, params)
+
+        with patch.object(RecipeViewSet, "stream_chunk_size", 2):
+            streamed = self.client.get(RECIPES_URL, {**params, "stream": "1"})
+
+        self.assertTrue(streamed.streaming)
+        self.assertEqual(streamed["Content-Type"], "application/json")
+        self.assertEqual(
+            b"".join(streamed.streaming_content), response.content
+        )
+
+    def test_list_recipes_paginated(self):
+        """Test lists are paginated when a page is requested"""
+        for number in range(3):
+            sample_recipe(user=self.user, title=f"Recipe {number}")
+
+        response = self.client.get(RECIPES_URL, {"page": 2, "page_size": 2})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 3)
+        self.assertFalse(response.data["count_is_estimate"])
+        self.assertIsNone(response.data["next"])
+        self.assertEqual(
+            [recipe["title"] for recipe in response.data["results"]],
+            ["Recipe 0"],
+        )
+
+    @override_settings(ESTIMATED_COUNT_THRESHOLD=0)
+    def test_list_recipes_estimated_count(self):
+        """Test large lists report an estimated count"""
+        sample_recipe(user=self.user)
+
+        response = self.client.get(RECIPES_URL, {"page": 1})
+
+        self.assertTrue(response.data["count_is_estimate"])
+        self.assertEqual(len(response.data["results"]), 1)
+
+    def test_list_recipes_unknown_field(self):
+        """Test that unknown fields and expansions are rejected"""
+        for params in ({"fields": "id,secret"}, {"expand": "user"}):
+            response = self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_create_basic_recipe(self):
         """Test creating recipe"""
         payload = {
@@ -208,6 +329,219 @@ class PrivateRecipeApiTests(TestCase):
 
         self.assertEqual(len(tags), 0)
 
+    def test_recipe_facets(self):
+        """Test counting the filtered recipes per tag, ingredient and range"""
+        vegan = sample_tag(user=self.user, name="Vegan")
+        spicy = sample_tag(user=self.user, name="Spicy")
+        salt = sample_ingredient(user=self.user, name="Salt")
+        curry = sample_recipe(user=self.user, time_minutes=45, price="12.50")
+        curry.tags.add(vegan, spicy)
+        curry.ingredients.add(salt)
+        salad = sample_recipe(user=self.user, time_minutes=10, price="4.00")
+        salad.tags.add(vegan)
+        sample_recipe(user=self.user, time_minutes=90, price="30.00")
+        other = get_user_model().objects.create_user(
+            "other@mail.com", "testpass"
+        )
+        sample_recipe(user=other).tags.add(sample_tag(user=other))
+
+        with self.assertNumQueries(3):
+            response = self.client.get(FACETS_URL, {"tags": vegan.id})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(
+            response.data["tags"],
+            [
+                {"id": vegan.id, "name": "Vegan", "count": 2},
+                {"id": spicy.id, "name": "Spicy", "count": 1},
+            ],
+        )
+        self.assertEqual(
+            response.data["ingredients"],
+            [{"id": salt.id, "name": "Salt", "count": 1}],
+        )
+        self.assertEqual(
+            [bucket["count"] for bucket in response.data["time_minutes"]],
+            [1, 0, 1, 0],
+        )
+        self.assertEqual(
+            response.data["price"][0], {"min": None, "max": 5, "count": 1}
+        )
+        self.assertEqual(response.data["price"][2]["count"], 1)
+
+    def test_clone_recipe(self):
+        """Test cloning a recipe copies its fields, tags and ingredients"""
+        recipe = sample_recipe(
+            user=self.user, link="https://example.com", price="7.50"
+        )
+        recipe.tags.add(sample_tag(user=self.user))
+        recipe.ingredients.add(
+            sample_ingredient(user=self.user),
+            sample_ingredient(user=self.user, name="Salt"),
+        )
+        recipe.image = "uploads/recipe/shared.jpg"
+        recipe.save()
+        recipe.refresh_from_db()
+
+        response = self.client.post(clone_url(recipe.id))
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        clone = Recipe.objects.get(id=response.data["id"])
+        self.assertNotEqual(clone.id, recipe.id)
+        for field in ("title", "time_minutes", "price", "link", "user"):
+            self.assertEqual(getattr(clone, field), getattr(recipe, field))
+        self.assertEqual(clone.image.name, recipe.image.name)
+        self.assertEqual(clone.ingredient_ids, recipe.ingredient_ids)
+        self.assertCountEqual(clone.tags.all(), recipe.tags.all())
+        self.assertCountEqual(
+            clone.ingredients.all(), recipe.ingredients.all()
+        )
+        self.assertCountEqual(
+            response.data["ingredients"],
+            recipe.ingredients.values_list("id", flat=True),
+        )
+
+    def test_clone_recipe_of_other_user(self):
+        """Test recipes of other users cannot be cloned"""
+        other = get_user_model().objects.create_user(
+            "other@mail.com", "testpass"
+        )
+        recipe = sample_recipe(user=other)
+
+        response = self.client.post(clone_url(recipe.id))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_clone_recipes_batch(self):
+        """Test cloning several recipes with set-based inserts"""
+        tag = sample_tag(user=self.user)
+        ingredient = sample_ingredient(user=self.user)
+        recipes = [
+            sample_recipe(user=self.user, title=f"Recipe {number}")
+            for number in range(5)
+        ]
+        for recipe in recipes:
+            recipe.tags.add(tag)
+            recipe.ingredients.add(ingredient)
+        ids = [recipe.id for recipe in reversed(recipes)]
+
+        with self.assertNumQueries(11):
+            response = self.client.post(
+                CLONE_BATCH_URL, {"ids": ids}, format="json"
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [item["title"] for item in response.data],
+            [f"Recipe {number}" for number in reversed(range(5))],
+        )
+        clones = Recipe.objects.filter(
+            id__in=[item["id"] for item in response.data]
+        )
+        self.assertEqual(clones.filter(tags=tag).count(), 5)
+        self.assertEqual(clones.filter(ingredients=ingredient).count(), 5)
+
+    def test_clone_recipes_batch_unknown_ids(self):
+        """Test a batch clone with unknown recipes copies nothing"""
+        other = get_user_model().objects.create_user(
+            "other@mail.com", "testpass"
+        )
+        recipe = sample_recipe(user=self.user)
+        foreign = sample_recipe(user=other)
+
+        response = self.client.post(
+            CLONE_BATCH_URL, {"ids": [recipe.id, foreign.id]}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(str(foreign.id), response.data["ids"][0])
+        self.assertEqual(Recipe.objects.count(), 2)
+
+    def test_filter_recipes_by_price_and_time(self):
+        """Test the price and time range filters"""
+        cheap = sample_recipe(user=self.user, price="4.00", time_minutes=10)
+        sample_recipe(user=self.user, price="12.00", time_minutes=10)
+        sample_recipe(user=self.user, price="4.50", time_minutes=60)
+
+        response = self.client.get(
+            RECIPES_URL, {"min_price": "3", "max_price": "5", "max_time": 30}
+        )
+
+        self.assertEqual([item["id"] for item in response.data], [cheap.id])
+
+    def test_filter_recipes_invalid_range(self):
+        """Test invalid range filters are rejected"""
+        response = self.client.get(RECIPES_URL, {"min_price": "cheap"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("min_price", response.data)
+
+    def test_order_recipes(self):
+        """Test ordering by a field with the id breaking ties"""
+        first = sample_recipe(user=self.user, price="4.00", time_minutes=30)
+        second = sample_recipe(user=self.user, price="4.00", time_minutes=5)
+        third = sample_recipe(user=self.user, price="2.00", time_minutes=15)
+
+        by_price = self.client.get(RECIPES_URL, {"ordering": "price"})
+        by_time = self.client.get(RECIPES_URL, {"ordering": "-time_minutes"})
+        unknown = self.client.get(RECIPES_URL, {"ordering": "user"})
+
+        self.assertEqual(
+            [item["id"] for item in by_price.data],
+            [third.id, first.id, second.id],
+        )
+        self.assertEqual(
+            [item["id"] for item in by_time.data],
+            [first.id, third.id, second.id],
+        )
+        self.assertEqual(unknown.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_keyset_pagination(self):
+        """Test walking an ordered list page by page with cursors"""
+        prices = ["3.00", "1.00", "3.00", "2.00", "3.00", "1.00", "5.00"]
+        recipes = [sample_recipe(user=self.user, price=p) for p in prices]
+        expected = [
+            recipe.id
+            for recipe in sorted(
+                recipes, key=lambda r: (-Decimal(r.price), -r.id)
+            )
+        ]
+
+        seen = []
+        params = {"ordering": "-price", "cursor": "", "page_size": 2}
+        response = self.client.get(RECIPES_URL, params)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(item["id"] for item in response.data["results"])
+            if response.data["next"] is None:
+                break
+            response = self.client.get(response.data["next"])
+
+        self.assertEqual(seen, expected)
+
+    def test_keyset_pagination_invalid_cursor(self):
+        """Test a cursor that cannot be decoded is rejected"""
+        response = self.client.get(RECIPES_URL, {"cursor": "not-a-cursor"})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_keyset_pagination_invalid_cursor_values(self):
+        """Test a cursor with values of the wrong types is rejected"""
+        cases = (
+            ({}, ["abc"]),
+            ({}, [["x"]]),
+            ({"ordering": "price"}, ["1", "abc"]),
+        )
+        for params, values in cases:
+            cursor = base64.urlsafe_b64encode(json.dumps(values).encode())
+            response = self.client.get(
+                RECIPES_URL, {**params, "cursor": cursor.decode()}
+            )
+
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
 
 class RecipeImageUploadTests(TestCase):
     def setUp(self):
@@ -237,6 +571,28 @@ class RecipeImageUploadTests(TestCase):
         self.assertIn("image", response.data)
         self.assertTrue(os.path.exists(self.recipe.image.path))
 
+    def test_replace_image_queues_cleanup(self):
+        """Test replacing an image queues the deletion of the old file"""
+        url = image_upload_url(self.recipe.id)
+        paths = []
+        for _ in range(2):
+            with tempfile.NamedTemporaryFile(suffix=".jpg") as ntf:
+                Image.new("RGB", (10, 10)).save(ntf, format="JPEG")
+                ntf.seek(0)
+                self.client.post(url, {"image": ntf}, format="multipart")
+            self.recipe.refresh_from_db()
+            paths.append(self.recipe.image.name)
+
+        task = Task.objects.get()
+        self.assertEqual(task.name, "recipe.tasks.delete_unused_image")
+        self.assertEqual(task.kwargs, {"name": paths[0]})
+
+        storage = self.recipe.image.storage
+        delete_unused_image(**task.kwargs)
+        self.assertFalse(storage.exists(paths[0]))
+        delete_unused_image(name=paths[1])
+        self.assertTrue(storage.exists(paths[1]))
+
     def test_upload_image_bad_request(self):
         """Test uploading an invalid image"""
         url = image_upload_url(self.recipe.id)
@@ -285,3 +641,41 @@ class RecipeImageUploadTests(TestCase):
         self.assertIn(serializer1.data, response.data)
         self.assertIn(serializer2.data, response.data)
         self.assertNotIn(serializer3.data, response.data)
+
+    def test_filter_recipes_by_all_tags(self):
+        """Test returning recipes that have every one of the given tags"""
+        recipe1 = sample_recipe(user=self.user, title="Vegan curry")
+        recipe2 = sample_recipe(user=self.user, title="Vegan stew")
+        tag1 = sample_tag(user=self.user, name="Vegan")
+        tag2 = sample_tag(user=self.user, name="Spicy")
+        recipe1.tags.add(tag1, tag2)
+        recipe2.tags.add(tag1)
+
+        response = self.client.get(
+            RECIPES_URL, {"tags_all": f"{tag1.id},{tag2.id}"}
+        )
+
+        self.assertEqual(
+            [recipe["id"] for recipe in response.data], [recipe1.id]
+        )
+
+    def test_filter_recipes_by_invalid_ids(self):
+        """Test that ids that are not integers are a validation error"""
+        for param in ("tags", "tags_all", "ingredients_all"):
+            response = self.client.get(RECIPES_URL, {param: "1,x"})
+
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(param, response.data)
+
+    def test_filter_recipes_matching_several_tags_once(self):
+        """Test a recipe matching several of the tags is returned once"""
+        recipe = sample_recipe(user=self.user)
+        tag1 = sample_tag(user=self.user, name="Vegan")
+        tag2 = sample_tag(user=self.user, name="Spicy")
+        recipe.tags.add(tag1, tag2)
+
+        response = self.client.get(
+            RECIPES_URL, {"tags": f"{tag1.id},{tag2.id}"}
+        )
+
+        self.assertEqual([item["id"] for item in response.data], [recipe.id])
@@ -1,15 +1,24 @@
+from django.db.models import Count, Q
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import viewsets, mixins, status
 from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.permissions import IsAuthenticated
 
+from core.idempotency import IdempotencyMixin
+from core.pagination import KeysetPagination
 from core.models import Tag, Ingredient, Recipe
-from . import serializers
+from core.streaming import StreamingListMixin
+from . import cache, serializers
+from .tasks import delete_unused_image
 
 
 class BaseRecipeAttrViewSet(
-    viewsets.GenericViewSet, mixins.ListModelMixin, mixins.CreateModelMixin
+    IdempotencyMixin,
+    viewsets.GenericViewSet,
+    mixins.ListModelMixin,
+    mixins.CreateModelMixin,
 ):
     """Base viewset for user owned recipe attributes"""
 
@@ -31,6 +40,12 @@ class BaseRecipeAttrViewSet(
             .distinct()
         )
 
+    def get_serializer_class(self):
+        """Return the fast read-only serializer for listing"""
+        if self.action == "list":
+            return self.read_serializer_class
+        return self.serializer_class
+
     def perform_create(self, serializer):
         """Create a new object"""
         serializer.save(user=self.request.user)
@@ -41,6 +56,7 @@ class TagViewSet(BaseRecipeAttrViewSet):
 
     queryset = Tag.objects.all()
     serializer_class = serializers.TagSerializer
+    read_serializer_class = serializers.TagReadSerializer
 
 
 class IngredientViewSet(BaseRecipeAttrViewSet):
@@ -48,42 +64,171 @@ class IngredientViewSet(BaseRecipeAttrViewSet):
 
     queryset = Ingredient.objects.all()
     serializer_class = serializers.IngredientSerializer
+    read_serializer_class = serializers.IngredientReadSerializer
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    IdempotencyMixin, StreamingListMixin, viewsets.ModelViewSet
+):
     """Manage recipes in the database"""
 
     serializer_class = serializers.RecipeSerializer
     queryset = Recipe.objects.all().order_by("-id")
     authentication_classes = (TokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    throttle_scopes = {
+        "list": "recipe_list",
+        "upload_image": "image_upload",
+        "facets": "recipe_list",
+    }
+    throttle_costs = {"upload_image": 10, "clone_batch": 10}
+    link_filters = (("tags", "tag_ids"), ("ingredients", "ingredient_ids"))
+    range_filters = {
+        "min_price": "price__gte",
+        "max_price": "price__lte",
+        "max_time": "time_minutes__lte",
+    }
+    ordering_fields = ("price", "time_minutes", "title")
+    # Other parameters filter the queryset, so they bypass the cache
+    cached_detail_params = {"fields", "expand", "format"}
+    histogram_edges = {
+        "time_minutes": (15, 30, 60),
+        "price": (5, 10, 20),
+    }
+
+    def _params_to_ints(self, param):
+        """Convert the string IDs of a query parameter to integers"""
+        try:
+            return [
+                int(str_id)
+                for str_id in self.request.query_params[param].split(",")
+            ]
+        except ValueError:
+            raise ValidationError({param: ["Expected comma separated ids."]})
 
-    def _params_to_ints(self, qs):
-        """Convert a list of string IDs to a list of integers"""
-        return [int(str_id) for str_id in qs.split(",")]
+    def _params_to_names(self, param, allowed):
+        """Return the names listed in a query parameter, or None if absent"""
+        value = self.request.query_params.get(param)
+        if value is None:
+            return None
+        names = [name.strip() for name in value.split(",") if name.strip()]
+        unknown = sorted(set(names) - set(allowed))
+        if unknown:
+            raise ValidationError(
+                {param: [f"Unknown values: {', '.join(unknown)}"]}
+            )
+        return names
+
+    def get_read_options(self):
+        """Return the fields and expand options of list and detail requests"""
+        read_serializer = serializers.RecipeReadSerializer
+        return {
+            "fields": self._params_to_names(
+                "fields", read_serializer.output_fields
+            )
+            or None,
+            "expand": self._params_to_names(
+                "expand", read_serializer.relations
+            ),
+        }
+
+    def get_ordering(self):
+        """Return the ordering of the list, ending with the unique id"""
+        allowed = [
+            f"{prefix}{field}"
+            for field in self.ordering_fields
+            for prefix in ("", "-")
+        ]
+        ordering = self._params_to_names("ordering", allowed)
+        if not ordering:
+            return ["-id"]
+        # Sorting the id like the first field lets one index serve both
+        return [*ordering, "-id" if ordering[0].startswith("-") else "id"]
+
+    @property
+    def paginator(self):
+        """Use keyset pagination when the list is requested with a cursor"""
+        if not hasattr(self, "_paginator") and self.request is not None:
+            cursor_param = KeysetPagination.cursor_query_param
+            if cursor_param in self.request.query_params:
+                self._paginator = KeysetPagination()
+        return super().paginator
 
     def get_queryset(self):
         """Retrieve the recipes for the authenticated user"""
-        tags = self.request.query_params.get("tags")
-        ingredients = self.request.query_params.get("ingredients")
-        queryset = self.queryset
-        if tags:
-            tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
-        if ingredients:
-            ingredient_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
+        ranges = serializers.RecipeFilterSerializer(
+            data=self.request.query_params
+        )
+        ranges.is_valid(raise_exception=True)
+        queryset = self.queryset.filter(
+            **{
+                self.range_filters[name]: value
+                for name, value in ranges.validated_data.items()
+            }
+        ).order_by(*self.get_ordering())
+        for param, field in self.link_filters:
+            # ?tags= matches any of the tags, ?tags_all= all of them
+            for suffix, lookup in (("", "overlap"), ("_all", "contains")):
+                name = f"{param}{suffix}"
+                if self.request.query_params.get(name):
+                    queryset = queryset.filter(
+                        **{f"{field}__{lookup}": self._params_to_ints(name)}
+                    )
+        if self.action in ("list", "retrieve"):
+            fields = self.get_read_options()["fields"]
+            if fields is not None:
+                read_serializer = serializers.RecipeReadSerializer
+                queryset = queryset.only(
+                    "id",
+                    *(f for f in fields if f not in read_serializer.relations),
+                    *(field.lstrip("-") for field in queryset.query.order_by),
+                )
 
         return queryset.filter(user=self.request.user)
 
     def get_serializer_class(self):
         """Return appropriate serializer class"""
-        if self.action == "retrieve":
-            return serializers.RecipeDetailSerializer
+        if self.action == "list":
+            return serializers.RecipeReadSerializer
+        elif self.action == "retrieve":
+            return serializers.RecipeDetailReadSerializer
         elif self.action == "upload_image":
             return serializers.RecipeImageSerializer
+        elif self.action in ("clone", "clone_batch"):
+            return serializers.RecipeReadSerializer
         return self.serializer_class
 
+    def get_serializer(self, *args, **kwargs):
+        """Pass the fields and expand options to the read serializers"""
+        if self.action in ("list", "retrieve"):
+            kwargs.update(self.get_read_options())
+        return super().get_serializer(*args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Return a recipe, from the recipe cache when it has it"""
+        if not cache.enabled() or not (
+            set(request.query_params) <= self.cached_detail_params
+        ):
+            return super().retrieve(request, *args, **kwargs)
+        try:
+            pk = int(kwargs[self.lookup_field])
+        except ValueError:
+            raise NotFound()
+
+        serializer = self.get_serializer()
+        recipe_cache = cache.RecipeCache(serializer)
+        entry = recipe_cache.lookup([pk]).get(pk)
+        if entry is None:
+            # get_object() only finds recipes of the user
+            entry = {
+                "user": request.user.pk,
+                "data": serializer.to_representation(self.get_object()),
+            }
+            recipe_cache.store({pk: entry})
+        elif entry["user"] != request.user.pk:
+            raise NotFound()
+        return Response(entry["data"])
+
     def perform_create(self, serializer):
         """Create a new recipe"""
         serializer.save(user=self.request.user)
@@ -92,10 +237,87 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def upload_image(self, request, pk=None):
         """Upload an image to a recipe"""
         recipe = self.get_object()
+        previous = recipe.image.name
         serializer = self.get_serializer(recipe, data=request.data)
 
         if serializer.is_valid():
             serializer.save()
+            if previous and previous != recipe.image.name:
+                # Clones may share the replaced file
+                delete_unused_image.enqueue(name=previous)
             return Response(serializer.data, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    def _histogram_buckets(self, field):
+        """Return (min, max, filter) per bucket between histogram edges"""
+        bounds = (None, *self.histogram_edges[field], None)
+        for lower, upper in zip(bounds, bounds[1:]):
+            condition = Q()
+            if lower is not None:
+                condition &= Q(**{f"{field}__gte": lower})
+            if upper is not None:
+                condition &= Q(**{f"{field}__lt": upper})
+            yield lower, upper, condition
+
+    @action(methods=["GET"], detail=False)
+    def facets(self, request):
+        """Count the filtered recipes per tag, ingredient and range"""
+        recipes = self.filter_queryset(self.get_queryset()).order_by()
+        aggregates = {"count": Count("id")}
+        for field in self.histogram_edges:
+            for index, (_, _, condition) in enumerate(
+                self._histogram_buckets(field)
+            ):
+                aggregates[f"{field}_{index}"] = Count("id", filter=condition)
+        totals = recipes.aggregate(**aggregates)
+
+        data = {"count": totals["count"]}
+        ids = recipes.values("id")
+        for name, model in (("tags", Tag), ("ingredients", Ingredient)):
+            data[name] = list(
+                model.objects.filter(recipe__in=ids)
+                .values("id", "name")
+                .annotate(count=Count("recipe"))
+                .order_by("-count", "name")
+            )
+        for field in self.histogram_edges:
+            data[field] = [
+                {
+                    "min": lower,
+                    "max": upper,
+                    "count": totals[f"{field}_{index}"],
+                }
+                for index, (lower, upper, _) in enumerate(
+                    self._histogram_buckets(field)
+                )
+            ]
+        return Response(data)
+
+    @action(methods=["POST"], detail=True)
+    def clone(self, request, pk=None):
+        """Copy a recipe with its tags and ingredients"""
+        (recipe,) = Recipe.objects.clone([self.get_object()])
+        serializer = self.get_serializer(recipe)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(
+        methods=["POST"],
+        detail=False,
+        url_path="clone",
+        url_name="clone-batch",
+    )
+    def clone_batch(self, request):
+        """Copy a list of recipes with their tags and ingredients"""
+        ids = serializers.RecipeCloneSerializer(data=request.data)
+        ids.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(ids.validated_data["ids"]))
+        recipes = self.get_queryset().in_bulk(ids)
+        unknown = [pk for pk in ids if pk not in recipes]
+        if unknown:
+            raise ValidationError(
+                {"ids": [f"Unknown recipes: {', '.join(map(str, unknown))}"]}
+            )
+        clones = Recipe.objects.clone(recipes[pk] for pk in ids)
+        serializer = self.get_serializer(clones, many=True)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
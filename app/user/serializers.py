@@ -1,9 +1,12 @@
-from django.contrib.auth import get_user_model, authenticate
+from django.contrib.auth import get_user_model
 from django.utils.translation import ugettext_lazy as _
 from rest_framework import serializers
 
+from core.backends import PooledHashingBackend
+from core.instrumentation import TimedSerializerMixin
 
-class UserSerializer(serializers.ModelSerializer):
+
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for User model"""
 
     class Meta:
@@ -37,7 +40,7 @@ class AuthTokenSerializer(serializers.Serializer):
         """Validate and authenticate the user"""
         email = attrs.get("email")
         password = attrs.get("password")
-        user = authenticate(
+        user = PooledHashingBackend().authenticate(
             request=self.context.get("request"),
             username=email,
             password=password,
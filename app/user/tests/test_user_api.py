@@ -1,9 +1,14 @@
+from unittest.mock import patch
+
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from core import hashing
+
 CREATE_USER_URL = reverse("user:create")
 TOKEN_URL = reverse("user:token")
 ME_URL = reverse("user:me")
@@ -19,6 +24,8 @@ class PublicUsersAPITests(TestCase):
 
     def setUp(self):
         self.client = APIClient()
+        # Start without login and sign up throttle counters of other tests
+        cache.clear()
 
     def test_create_valid_user_success(self):
         """Test creatinge a user with valid payload"""
@@ -125,6 +132,22 @@ class PublicUsersAPITests(TestCase):
         self.assertNotIn("token", response.data)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_create_token_hashing_saturated(self):
+        """Test that logins are refused quickly when hashing is saturated"""
+        create_user(email="test@mail.com", password="TestPord123")
+        payload = {"email": "test@mail.com", "password": "TestPord123"}
+        with patch.object(
+            hashing.HashingExecutor,
+            "submit",
+            side_effect=hashing.HashingUnavailable(),
+        ):
+            response = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(
+            response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+        self.assertEqual(response["Retry-After"], "1")
+
     def test_retrive_user_unauthorized(self):
         """Test that authetication is required for users"""
         response = self.client.get(ME_URL)
@@ -180,3 +203,13 @@ class PrivateUserApiTests(TestCase):
         self.assertEqual(self.user.name, payload["name"])
         self.assertTrue(self.user.check_password(payload["password"]))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_delete_me_not_allowed(self):
+        """Test that users cannot delete their account through the API"""
+        response = self.client.delete(ME_URL)
+        self.user.refresh_from_db()
+
+        self.assertEqual(
+            response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED
+        )
+        self.assertTrue(self.user.is_active)
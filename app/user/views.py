@@ -9,6 +9,8 @@ class CreateUserView(generics.CreateAPIView):
     """Create a new user in the system"""
 
     serializer_class = UserSerializer
+    throttle_scope = "signup"
+    throttle_cost = 10
 
 
 class CreateTokenView(ObtainAuthToken):
@@ -16,6 +18,9 @@ class CreateTokenView(ObtainAuthToken):
 
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+    throttle_scope = "login"
+    throttle_cost = 10
 
 
 class ManageUserView(generics.RetrieveUpdateAPIView):